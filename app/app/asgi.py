@@ -2,6 +2,11 @@
 ASGI config for app project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Long-lived real-time endpoints such as the channel event stream are only
+served when the app runs under an ASGI server; `runserver` serves the
+WSGI app and never reaches them. docker-compose runs it with:
+
+    uvicorn app.asgi:application --host 0.0.0.0 --port 8000
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
@@ -13,4 +18,8 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from realtime.routing import RealtimeRouter  # noqa: E402
+
+application = RealtimeRouter(django_application)
@@ -45,6 +45,10 @@ INSTALLED_APPS = [
     'user',
     'channel',
     'message',
+    'membership',
+    'batch',
+    'bootstrap',
+    'realtime',
 ]
 
 MIDDLEWARE = [
@@ -53,6 +57,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -91,6 +96,89 @@ DATABASES = {
     }
 }
 
+# Read replicas, as a comma separated list of hosts in DB_REPLICA_HOSTS.
+# Read-only requests are spread over the healthy replicas; a client is
+# pinned to the primary for REPLICA_STICKY_SECONDS after it writes.
+
+DATABASE_REPLICAS = []
+
+for index, host in enumerate(
+    filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(','))
+):
+    alias = f'replica_{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+# Message shards, as a comma separated list of hosts in DB_SHARD_HOSTS.
+# Messages are stored on the shard picked by their channel id; users,
+# channels and memberships stay on `default`. Every shard holds the
+# full schema, so run `migrate --database shard_N` for each of them.
+# Each shard numbers its rows on its own, so several shards need
+# SNOWFLAKE_IDS for message ids to be unique.
+
+MESSAGE_SHARDS = []
+
+for index, host in enumerate(
+    filter(None, os.environ.get('DB_SHARD_HOSTS', '').split(','))
+):
+    alias = f'shard_{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+    }
+    MESSAGE_SHARDS.append(alias)
+
+# Replicas of the message shards, as the hosts of every shard in
+# DB_SHARD_REPLICA_HOSTS, comma separated, with the shards separated by
+# semicolons in the order of DB_SHARD_HOSTS. Read-only requests read a
+# shard's messages from one of its replicas like they read `default`
+# from DATABASE_REPLICAS.
+
+SHARD_REPLICAS = {}
+
+for shard, hosts in zip(
+    MESSAGE_SHARDS,
+    os.environ.get('DB_SHARD_REPLICA_HOSTS', '').split(';')
+):
+    SHARD_REPLICAS[shard] = []
+    for index, host in enumerate(filter(None, hosts.split(','))):
+        alias = f'{shard}_replica_{index}'
+        DATABASES[alias] = {
+            **DATABASES[shard],
+            'HOST': host,
+            'TEST': {'MIRROR': shard},
+        }
+        SHARD_REPLICAS[shard].append(alias)
+
+if not MESSAGE_SHARDS:
+    MESSAGE_SHARDS = ['default']
+
+DATABASE_ROUTERS = [
+    'core.routers.ShardRouter',
+    'core.routers.ReplicaRouter',
+]
+
+REPLICA_STICKY_SECONDS = 5
+REPLICA_HEALTH_CHECK_INTERVAL = 5
+
+# Cache
+# Memcached at MEMCACHED_LOCATION, shared by every process. It holds
+# state they all must agree on, such as the primary pins of clients that
+# just wrote and the version of the channel directory tries, so only a
+# single process may run without it.
+
+if os.environ.get('MEMCACHED_LOCATION'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': os.environ['MEMCACHED_LOCATION'],
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -143,4 +231,57 @@ REST_FRAMEWORK = {
 
 DATETIME_FORMAT = ['%d-%m-%Y %H:%M:%S.%f']
 
-
+# Message ids
+# With SNOWFLAKE_IDS, messages get time-ordered Snowflake ids generated
+# in-process instead of ids from the database sequence. Every process
+# writing messages then needs its own SNOWFLAKE_NODE_ID; there is no
+# default, as two processes sharing one would hand out the same ids.
+# SNOWFLAKE_CUTOVER_ID is the highest id the sequence handed out before
+# Snowflake ids were turned on; ids up to it carry no timestamp.
+# Lookups by id only skip the other months of a partitioned message
+# table with Snowflake ids, see core.partitions.
+
+SNOWFLAKE_IDS = os.environ.get('SNOWFLAKE_IDS', 'false') == 'true'
+SNOWFLAKE_NODE_ID = (
+    int(os.environ['SNOWFLAKE_NODE_ID'])
+    if os.environ.get('SNOWFLAKE_NODE_ID') else None
+)
+SNOWFLAKE_CUTOVER_ID = int(os.environ.get('SNOWFLAKE_CUTOVER_ID', 0))
+SNOWFLAKE_EPOCH_MS = 1672531200000
+
+# Real-time events
+# InMemoryPubSub only reaches subscribers in the same process. Use
+# realtime.pubsub.PostgresPubSub when running more than one process.
+
+PUBSUB_BACKEND = os.environ.get(
+    'PUBSUB_BACKEND',
+    'realtime.pubsub.InMemoryPubSub'
+)
+
+# Real-time gateway nodes as comma separated name=base_url pairs.
+# Channels are assigned to the nodes with a consistent-hash ring and
+# streams of a channel are redirected to its owner.
+
+REALTIME_NODE_ID = os.environ.get('REALTIME_NODE_ID', '')
+REALTIME_NODES = dict(
+    entry.split('=', 1)
+    for entry in os.environ.get('REALTIME_NODES', '').split(',')
+    if entry
+)
+
+
+
+# Message archive
+# Messages older than ARCHIVE_AFTER_DAYS are moved by the
+# archive_messages command into compressed segment files under
+# ARCHIVE_ROOT, in blocks of ARCHIVE_BLOCK_SIZE messages.
+
+ARCHIVE_ROOT = os.environ.get('ARCHIVE_ROOT', str(BASE_DIR / 'archive'))
+ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 90))
+ARCHIVE_BLOCK_SIZE = 2000
+
+# Cached channel lists
+# The ids of a user's channels are cached for CHANNEL_LIST_TIMEOUT
+# seconds or until one of the user's memberships changes.
+
+CHANNEL_LIST_TIMEOUT = 24 * 60 * 60
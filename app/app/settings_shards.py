@@ -0,0 +1,24 @@
+"""
+Settings running the app with two message shards.
+
+CI runs the tests with them as well, so the multi-shard tests run
+instead of being skipped. Both shards are databases next to the default
+one on the same server. Messages get Snowflake ids, as the sequences of
+two shards would hand out the same ids.
+"""
+
+from app.settings import *  # noqa: F401,F403
+from app.settings import DATABASES
+
+MESSAGE_SHARDS = []
+
+for index in range(2):
+    alias = f'shard_{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'NAME': f"{DATABASES['default']['NAME']}_{alias}",
+    }
+    MESSAGE_SHARDS.append(alias)
+
+SNOWFLAKE_IDS = True
+SNOWFLAKE_NODE_ID = 0
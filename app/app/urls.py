@@ -33,4 +33,8 @@ urlpatterns = [
     ),
     path('api/user/', include('user.urls')),
     path('api/channel/', include('channel.urls')),
+    path('api/membership/', include('membership.urls')),
+    path('api/realtime/', include('realtime.urls')),
+    path('api/batch/', include('batch.urls')),
+    path('api/bootstrap/', include('bootstrap.urls')),
 ]
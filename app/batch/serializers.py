@@ -0,0 +1,27 @@
+"""
+Serializers for the batch API.
+"""
+
+from django.utils.translation import gettext as _
+
+from rest_framework import serializers
+
+
+METHODS = ['GET', 'POST', 'PUT', 'PATCH', 'DELETE']
+
+
+class SubRequestSerializer(serializers.Serializer):
+    """Serializer for a request run as part of a batch."""
+
+    method = serializers.ChoiceField(choices=METHODS, default='GET')
+    path = serializers.CharField(max_length=2048)
+    body = serializers.JSONField(required=False)
+
+    def validate_path(self, value):
+        """Only API routes can be batched."""
+
+        if not value.startswith('/api/'):
+            raise serializers.ValidationError(
+                _('Path must start with /api/.')
+            )
+        return value
@@ -0,0 +1,172 @@
+"""
+Tests for the batch API.
+"""
+
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import Channel, Message
+
+
+BATCH_URL = reverse('batch:batch')
+
+
+def create_user(username):
+    return get_user_model().objects.create(
+        username=username,
+        email=f'{username}@example.com',
+        password='pass123'
+    )
+
+
+class PublicBatchAPITests(TestCase):
+    """Test unauthenticated batch requests."""
+
+    def test_auth_required(self):
+        """Test auth is required to run a batch."""
+
+        res = APIClient().post(BATCH_URL, [], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class BatchAPITests(TestCase):
+    """Test running several requests at once."""
+
+    databases = '__all__'
+
+    def setUp(self):
+        self.user = create_user('user')
+        self.client = APIClient()
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.channel = Channel.objects.create(
+            creator=self.user,
+            name='Channel'
+        )
+        self.messages_path = reverse(
+            'channel:channel-messages',
+            args=[self.channel.id]
+        )
+
+    def test_batch_runs_requests_in_order(self):
+        """Test reads and writes run in order as the batch's user."""
+
+        res = self.client.post(BATCH_URL, [
+            {'path': reverse('user:me')},
+            {'path': reverse('channel:channel-list')},
+            {
+                'method': 'POST',
+                'path': self.messages_path,
+                'body': {'text': 'Hello'},
+            },
+            {'path': f'{self.messages_path}?from_seq=1'},
+        ], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [result['status'] for result in res.data],
+            [200, 200, 201, 200]
+        )
+        self.assertEqual(res.data[0]['body']['username'], 'user')
+        self.assertEqual(res.data[1]['body'][0]['id'], self.channel.id)
+        self.assertEqual(res.data[3]['body'][0]['text'], 'Hello')
+        self.assertTrue(
+            Message.objects.for_channel(self.channel.id).filter(
+                text='Hello'
+            ).exists()
+        )
+
+    def test_batch_authenticates_and_checks_membership_once(self):
+        """Test the token and the membership are looked up once for
+        sub-requests of the same channel."""
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.post(BATCH_URL, [
+                {'path': self.messages_path},
+                {'path': f'{self.messages_path}?from_seq=1'},
+            ], format='json')
+
+        sql = [query['sql'] for query in queries]
+        self.assertEqual([r['status'] for r in res.data], [200, 200])
+        self.assertEqual(
+            len([q for q in sql if 'authtoken_token' in q]),
+            1
+        )
+        self.assertEqual(
+            len([q for q in sql if 'FROM "core_membership"' in q]),
+            1
+        )
+
+    def test_batch_reports_failed_sub_requests(self):
+        """Test failed sub-requests are reported without failing the
+        batch."""
+
+        other = Channel.objects.create(
+            creator=create_user('other'),
+            name='Other'
+        )
+
+        res = self.client.post(BATCH_URL, [
+            {'path': '/api/unknown/'},
+            {'path': reverse('channel:channel-messages', args=[other.id])},
+            {'method': 'POST', 'path': BATCH_URL, 'body': []},
+        ], format='json')
+
+        self.assertEqual(
+            [result['status'] for result in res.data],
+            [404, 403, 400]
+        )
+
+    def test_batch_reports_errors_of_sub_requests(self):
+        """Test a sub-request raising an error is rolled back and
+        reported with status 500 without failing the batch."""
+
+        with patch(
+            'channel.views.outbox.enqueue',
+            side_effect=RuntimeError
+        ), self.assertLogs('batch.views', level='ERROR'):
+            res = self.client.post(BATCH_URL, [
+                {'path': reverse('user:me')},
+                {'method': 'POST', 'path': self.messages_path, 'body': []},
+                {
+                    'method': 'POST',
+                    'path': self.messages_path,
+                    'body': {'text': 'Hello'},
+                },
+            ], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [result['status'] for result in res.data],
+            [200, 500, 500]
+        )
+        self.assertFalse(
+            Message.objects.for_channel(self.channel.id).exists()
+        )
+
+    def test_batch_invalid_requests_error(self):
+        """Test paths outside the API and oversized batches fail."""
+
+        outside = self.client.post(
+            BATCH_URL,
+            [{'path': '/admin/'}],
+            format='json'
+        )
+        oversized = self.client.post(
+            BATCH_URL,
+            [{'path': reverse('user:me')}] * 21,
+            format='json'
+        )
+
+        self.assertEqual(outside.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(oversized.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,143 @@
+"""
+Views for the batch API.
+"""
+
+import io
+import json
+import logging
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpRequest, QueryDict, StreamingHttpResponse
+from django.urls import Resolver404, resolve
+
+from rest_framework import status
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from batch import serializers
+from core.request_cache import clear, request_cache
+
+
+logger = logging.getLogger(__name__)
+
+MAX_REQUESTS = 20
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class BatchView(APIView):
+    """Run several API requests in a single round trip."""
+
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    serializer_class = serializers.SubRequestSerializer
+
+    def post(self, request):
+        """Run a list of sub-requests in order and return their statuses
+        and bodies in the same order.
+
+        Sub-requests are passed to the views of their path in-process,
+        as the user authenticated for the batch, and share a request
+        cache of memberships and channel lists. A failed sub-request
+        does not stop the others; one raising an error is rolled back
+        and reported with status 500."""
+
+        serializer = self.serializer_class(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        if len(serializer.validated_data) > MAX_REQUESTS:
+            return Response(
+                {'detail': f'At most {MAX_REQUESTS} requests at once.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        with request_cache():
+            results = [
+                self.dispatch_sub_request(request, item)
+                for item in serializer.validated_data
+            ]
+        return Response(results)
+
+    def build_sub_request(self, request, item, path, query_string):
+        """Return an HttpRequest for a sub-request, carrying the user
+        the batch was authenticated as."""
+
+        body = b''
+        if 'body' in item:
+            body = json.dumps(item['body']).encode()
+
+        sub = HttpRequest()
+        sub.method = item['method']
+        sub.path = sub.path_info = path
+        sub.META = {
+            key: value for key, value in request.META.items()
+            if not key.startswith('wsgi.')
+        }
+        sub.META.update({
+            'REQUEST_METHOD': sub.method,
+            'PATH_INFO': path,
+            'QUERY_STRING': query_string,
+            'CONTENT_TYPE': 'application/json',
+            'CONTENT_LENGTH': str(len(body)),
+        })
+        sub.GET = QueryDict(query_string)
+        sub._stream = io.BytesIO(body)
+        sub._read_started = False
+        sub.user = request.user
+        # Picked up by DRF's Request instead of authenticating again.
+        sub._force_auth_user = request.user
+        sub._force_auth_token = request.auth
+        return sub
+
+    def dispatch_sub_request(self, request, item):
+        path, _, query_string = item['path'].partition('?')
+        try:
+            match = resolve(path)
+        except Resolver404:
+            return {
+                'status': status.HTTP_404_NOT_FOUND,
+                'body': {'detail': 'Not found.'},
+            }
+        if match.view_name == 'batch:batch':
+            return {
+                'status': status.HTTP_400_BAD_REQUEST,
+                'body': {'detail': 'Batches cannot be nested.'},
+            }
+
+        sub = self.build_sub_request(request, item, path, query_string)
+        sub.resolver_match = match
+        try:
+            with ExitStack() as stack:
+                if item['method'] not in SAFE_METHODS:
+                    # Roll back the writes of a failing sub-request.
+                    for alias in {'default', *settings.MESSAGE_SHARDS}:
+                        stack.enter_context(transaction.atomic(using=alias))
+                response = match.func(sub, *match.args, **match.kwargs)
+        except Exception:
+            logger.exception(
+                'Batched request %s %s failed.',
+                item['method'],
+                path
+            )
+            response = Response(
+                {'detail': 'Internal server error.'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        finally:
+            if item['method'] not in SAFE_METHODS:
+                clear()
+
+        if isinstance(response, StreamingHttpResponse):
+            return {
+                'status': status.HTTP_400_BAD_REQUEST,
+                'body': {'detail': 'Streaming responses cannot be batched.'},
+            }
+        if hasattr(response, 'data'):
+            body = response.data
+        else:
+            if hasattr(response, 'render'):
+                response.render()
+            body = response.content.decode() or None
+        return {'status': response.status_code, 'body': body}
@@ -0,0 +1,26 @@
+"""
+Serializers for the bootstrap API.
+"""
+
+from rest_framework import serializers
+
+from channel.serializers import ChannelSerializer
+
+
+class BootstrapChannelSerializer(ChannelSerializer):
+    """Serializer for a channel of the user with their membership."""
+
+    permissions = serializers.IntegerField()
+    unread_count = serializers.IntegerField()
+    last_message_at = serializers.DateTimeField()
+    # Serialized by the view, which mixes in archived messages.
+    last_message = serializers.DictField(allow_null=True)
+
+    class Meta(ChannelSerializer.Meta):
+        fields = ChannelSerializer.Meta.fields + [
+            'permissions',
+            'unread_count',
+            'last_message_at',
+            'last_message',
+        ]
+        read_only_fields = fields
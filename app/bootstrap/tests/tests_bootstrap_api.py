@@ -0,0 +1,197 @@
+"""
+Tests for the bootstrap API.
+"""
+
+import tempfile
+from contextlib import ExitStack
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import archive
+from core.models import Channel, Membership, Message
+from core.sharding import shard_for_channel
+
+
+BOOTSTRAP_URL = reverse('bootstrap:bootstrap')
+
+
+def create_user(username):
+    return get_user_model().objects.create(
+        username=username,
+        email=f'{username}@example.com',
+        password='pass123'
+    )
+
+
+class BootstrapAPITests(TestCase):
+    """Test loading the initial state of a client."""
+
+    databases = '__all__'
+
+    def setUp(self):
+        self.user = create_user('user')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def bootstrap(self):
+        """Run a bootstrap and return it with its queries by
+        database."""
+
+        with ExitStack() as stack:
+            contexts = {
+                alias: stack.enter_context(
+                    CaptureQueriesContext(connections[alias])
+                )
+                for alias in {'default', *settings.MESSAGE_SHARDS}
+            }
+            res = self.client.get(BOOTSTRAP_URL)
+        return res, {
+            alias: context.captured_queries
+            for alias, context in contexts.items()
+        }
+
+    def post(self, channel, count, sender=None):
+        # On a shard of its own, the channel row gets its last sequence
+        # number once the shard commits.
+        with self.captureOnCommitCallbacks(
+            using=shard_for_channel(channel.id),
+            execute=True
+        ):
+            for i in range(count):
+                Message.objects.create(
+                    sender=sender or self.user,
+                    channel=channel,
+                    text=f'{channel.name} {i}'
+                )
+
+    def test_auth_required(self):
+        """Test auth is required to bootstrap."""
+
+        res = APIClient().get(BOOTSTRAP_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_bootstrap_state(self):
+        """Test channels come most recently active first with unread
+        counts and last messages, and the latest messages of the most
+        active ones."""
+
+        other = create_user('other')
+        Channel.objects.create(creator=self.user, name='Quiet')
+        old = Channel.objects.create(creator=self.user, name='Old')
+        busy = Channel.objects.create(creator=other, name='Busy')
+        Membership.objects.create(
+            channel=busy,
+            member=self.user,
+            inviter=other
+        )
+        self.post(old, 2)
+        self.post(busy, 5, sender=other)
+        Membership.objects.filter(
+            channel=busy,
+            member=self.user
+        ).update(last_read_seq=3)
+
+        res = self.client.get(BOOTSTRAP_URL, {'channels': 1, 'messages': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['user']['username'], 'user')
+        channels = res.data['channels']
+        self.assertEqual(
+            [c['name'] for c in channels],
+            ['Busy', 'Old', 'Quiet']
+        )
+        self.assertEqual(
+            [c['permissions'] for c in channels],
+            [Membership.READ, Membership.ADMIN, Membership.ADMIN]
+        )
+        # The user's own messages are never unread.
+        self.assertEqual([c['unread_count'] for c in channels], [2, 0, 0])
+        self.assertEqual(channels[0]['last_message']['text'], 'Busy 4')
+        self.assertEqual(channels[1]['last_message']['text'], 'Old 1')
+        self.assertIsNone(channels[2]['last_message'])
+        recent = res.data['recent_messages']
+        self.assertEqual([r['channel'] for r in recent], [busy.id])
+        self.assertEqual(
+            [m['text'] for m in recent[0]['messages']],
+            ['Busy 3', 'Busy 4']
+        )
+
+    def test_last_messages_past_deleted_messages(self):
+        """Test a channel whose newest messages were deleted still gets
+        its last messages."""
+
+        channel = Channel.objects.create(creator=self.user, name='Gaps')
+        self.post(channel, 30)
+        Message.objects.for_channel(channel.id).filter(seq__gt=5).delete()
+
+        res = self.client.get(BOOTSTRAP_URL, {'messages': 2})
+
+        self.assertEqual(
+            res.data['channels'][0]['last_message']['text'],
+            'Gaps 4'
+        )
+        self.assertEqual(
+            [m['text'] for m in res.data['recent_messages'][0]['messages']],
+            ['Gaps 3', 'Gaps 4']
+        )
+
+    def test_last_messages_from_archive(self):
+        """Test a channel whose messages were all archived gets its last
+        messages from the archive."""
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        settings_override = override_settings(ARCHIVE_ROOT=tmp.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(archive.open_segment.cache_clear)
+        channel = Channel.objects.create(creator=self.user, name='Old')
+        self.post(channel, 3)
+        archive.archive_channel(channel.id, date.today() + timedelta(days=1))
+
+        res = self.client.get(BOOTSTRAP_URL, {'messages': 2})
+
+        self.assertEqual(
+            res.data['channels'][0]['last_message']['text'],
+            'Old 2'
+        )
+        self.assertEqual(
+            [m['text'] for m in res.data['recent_messages'][0]['messages']],
+            ['Old 1', 'Old 2']
+        )
+
+    def test_bootstrap_constant_queries(self):
+        """Test the number of queries does not grow with channels."""
+
+        self.post(Channel.objects.create(creator=self.user, name='A'), 3)
+        _, few = self.bootstrap()
+
+        for i in range(5):
+            self.post(
+                Channel.objects.create(creator=self.user, name=f'B{i}'),
+                3
+            )
+        res, many = self.bootstrap()
+
+        self.assertEqual(len(res.data['channels']), 6)
+        self.assertEqual(len(few['default']), len(many['default']))
+        # Every shard holding channels is read with the same queries.
+        self.assertEqual(
+            {len(queries) for queries in many.values()} - {0},
+            {len(queries) for queries in few.values()} - {0}
+        )
+        self.assertTrue(any(
+            'ROW_NUMBER()' in query['sql']
+            for queries in many.values()
+            for query in queries
+        ))
@@ -0,0 +1,14 @@
+"""
+URL mappings for the bootstrap API.
+"""
+
+from django.urls import path
+
+from bootstrap import views
+
+
+app_name = 'bootstrap'
+
+urlpatterns = [
+    path('', views.BootstrapView.as_view(), name='bootstrap'),
+]
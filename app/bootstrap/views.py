@@ -0,0 +1,139 @@
+"""
+Views for the bootstrap API.
+"""
+
+from datetime import datetime, timezone
+
+from rest_framework import status
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from bootstrap import serializers
+from core import archive, sharding
+from core.models import Membership, Message
+from message.serializers import MessageSerializer
+from user.serializers import UserSerializer
+
+
+RECENT_CHANNELS = 10
+MAX_RECENT_CHANNELS = 50
+RECENT_MESSAGES = 20
+MAX_RECENT_MESSAGES = 100
+
+NEVER = datetime.min.replace(tzinfo=timezone.utc)
+
+
+class BootstrapView(APIView):
+    """Everything a client shows on start, in one request."""
+
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def _limit(self, request, name, default, maximum):
+        value = request.query_params.get(name)
+        if value is None:
+            return default
+        if not value.isdigit():
+            raise ValueError(f'{name} must be a non-negative integer.')
+        return min(int(value), maximum)
+
+    def get(self, request):
+        """Return the user's profile, their channels with permissions,
+        unread counts and last messages, most recently active first,
+        and the latest `messages` messages of the `channels` most
+        recently active channels, oldest first.
+
+        This takes one query for the memberships and their channels and
+        one per shard for the messages, numbering the messages of every
+        channel with ROW_NUMBER() to keep the latest ones. Unread
+        counts come from the channel's and the member's sequence
+        numbers without counting messages. A channel whose newest
+        messages were archived gets them from its newest segment."""
+
+        try:
+            recent_count = self._limit(
+                request,
+                'channels',
+                RECENT_CHANNELS,
+                MAX_RECENT_CHANNELS
+            )
+            message_count = self._limit(
+                request,
+                'messages',
+                RECENT_MESSAGES,
+                MAX_RECENT_MESSAGES
+            )
+        except ValueError as error:
+            return Response(
+                {'detail': str(error)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        memberships = sorted(
+            Membership.objects.filter(
+                member=request.user,
+                channel__deleted_at__isnull=True
+            ).select_related('channel'),
+            key=lambda m: (m.channel.last_message_at or NEVER, m.channel_id),
+            reverse=True
+        )
+        channels = []
+        limits = {}
+        recent_ids = set()
+        for membership in memberships:
+            channel = membership.channel
+            channel.permissions = membership.permissions
+            channel.unread_count = max(
+                channel.last_message_seq - membership.last_read_seq,
+                0
+            )
+            channels.append(channel)
+            if not channel.last_message_seq:
+                continue
+            count = 1
+            if len(recent_ids) < recent_count:
+                recent_ids.add(channel.id)
+                count = max(message_count, 1)
+            limits[channel.id] = (channel.last_message_seq, count)
+
+        def fetch(alias, ids):
+            return Message.objects.on_shard(alias).latest_per_channel(
+                {channel_id: limits[channel_id] for channel_id in ids}
+            )
+
+        latest = {}
+        for messages in sharding.scatter_gather(fetch, list(limits)):
+            for message in messages:
+                latest.setdefault(message.channel_id, []).append(message)
+
+        recent = []
+        for channel in channels:
+            messages = []
+            if channel.id in limits:
+                last_seq, count = limits[channel.id]
+                messages = MessageSerializer(
+                    latest.get(channel.id, []),
+                    many=True
+                ).data
+                if len(messages) < min(count, last_seq):
+                    messages += archive.latest_messages(
+                        channel.id,
+                        count - len(messages)
+                    )
+            channel.last_message = messages[0] if messages else None
+            if channel.id in recent_ids:
+                recent.append({
+                    'channel': channel.id,
+                    'messages': messages[:message_count][::-1],
+                })
+
+        return Response({
+            'user': UserSerializer(request.user).data,
+            'channels': serializers.BootstrapChannelSerializer(
+                channels,
+                many=True
+            ).data,
+            'recent_messages': recent,
+        })
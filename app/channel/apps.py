@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ChannelConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'channel'
+
+    def ready(self):
+        from channel import signals  # noqa
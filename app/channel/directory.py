@@ -0,0 +1,347 @@
+"""
+Search of the channel directory.
+
+On PostgreSQL with the pg_trgm extension, channel names and
+descriptions are matched through their trigram GIN indexes: a name
+matches when it is similar to the query or contains a word similar to
+it, a description when it contains such a word. Elsewhere, or when the
+extension is missing, an in-process trie of the words of every channel
+is searched instead, matching words that start with the words of the
+query or are one edit away from them.
+
+Every process builds its trie once and then keeps it up to date: saving
+or deleting channels bumps a version in the shared cache and records
+the ids of the changed channels under it, and a search first reloads
+the channels recorded since the version its trie was built at. When
+those records are gone from the cache, the trie is rebuilt.
+
+Either way only the best DIRECTORY_CANDIDATES matches by similarity are
+considered, and those are ranked by similarity with a bonus for their
+number of members, kept on the channel as `member_count`.
+"""
+
+import math
+import re
+import threading
+import time
+from functools import partial
+
+from django.core.cache import cache
+from django.db import connections, router, transaction
+
+from core.models import Channel
+
+
+DIRECTORY_CANDIDATES = 100
+POPULARITY_WEIGHT = 0.05
+VERSION_KEY = 'channel_directory_version'
+# Changes kept for other processes to catch up with, and the most a
+# process applies before it rebuilds its trie instead.
+CHANGES_TIMEOUT = 60 * 60
+MAX_CHANGES = 1000
+
+WORD = re.compile(r'\w+')
+
+_trigram_support = {}
+
+
+def has_trigram(connection):
+    """Return whether the database has the pg_trgm extension."""
+
+    if connection.vendor != 'postgresql':
+        return False
+    if connection.alias not in _trigram_support:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"
+            )
+            _trigram_support[connection.alias] = cursor.fetchone() is not None
+    return _trigram_support[connection.alias]
+
+
+def words(text):
+    return WORD.findall(text.lower())
+
+
+def trigrams(text):
+    """Return the trigrams of a text the way pg_trgm splits it."""
+
+    result = set()
+    for word in words(text):
+        padded = f'  {word} '
+        result.update(
+            padded[i:i + 3] for i in range(len(padded) - 2)
+        )
+    return result
+
+
+def similarity(query, text):
+    """Return the share of trigrams the query and the text have in
+    common, like pg_trgm's similarity()."""
+
+    a, b = trigrams(query), trigrams(text)
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class TrieNode:
+    __slots__ = ('children', 'ids')
+
+    def __init__(self):
+        self.children = {}
+        self.ids = set()
+
+
+class PrefixTrie:
+    """Trie of words mapping them to the ids of the channels using
+    them."""
+
+    def __init__(self):
+        self.root = TrieNode()
+
+    def insert(self, word, channel_id):
+        node = self.root
+        for char in word:
+            node = node.children.setdefault(char, TrieNode())
+        node.ids.add(channel_id)
+
+    def remove(self, word, channel_id):
+        """Remove a channel from a word, and the nodes left empty."""
+
+        path = [self.root]
+        for char in word:
+            node = path[-1].children.get(char)
+            if node is None:
+                return
+            path.append(node)
+        path[-1].ids.discard(channel_id)
+        for depth in range(len(word), 0, -1):
+            if path[depth].ids or path[depth].children:
+                break
+            del path[depth - 1].children[word[depth - 1]]
+
+    def _collect(self, node, result):
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            result.update(node.ids)
+            stack.extend(node.children.values())
+
+    def prefixed(self, prefix):
+        """Return the ids of the words starting with `prefix`."""
+
+        node = self.root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return set()
+        result = set()
+        self._collect(node, result)
+        return result
+
+    def fuzzy(self, word, max_edits=1):
+        """Return the ids of the words at most `max_edits` edits away
+        from `word`, walking the trie with a row of the Levenshtein
+        table per node."""
+
+        result = set()
+        first_row = list(range(len(word) + 1))
+        stack = [
+            (child, char, first_row)
+            for char, child in self.root.children.items()
+        ]
+        while stack:
+            node, char, previous = stack.pop()
+            row = [previous[0] + 1]
+            for column in range(1, len(word) + 1):
+                row.append(min(
+                    row[column - 1] + 1,
+                    previous[column] + 1,
+                    previous[column - 1] + (word[column - 1] != char)
+                ))
+            if row[-1] <= max_edits:
+                result.update(node.ids)
+            if min(row) <= max_edits:
+                stack.extend(
+                    (child, next_char, row)
+                    for next_char, child in node.children.items()
+                )
+        return result
+
+
+class TrieIndex:
+    """Words of the active channels and the text to rank them by."""
+
+    def __init__(self, channels):
+        self.trie = PrefixTrie()
+        self.texts = {}
+        for channel_id, name, description in channels:
+            self.add(channel_id, name, description)
+
+    def add(self, channel_id, name, description):
+        self.texts[channel_id] = (name, description)
+        for word in set(words(f'{name} {description}')):
+            self.trie.insert(word, channel_id)
+
+    def discard(self, channel_id):
+        name, description = self.texts.pop(channel_id, ('', ''))
+        for word in set(words(f'{name} {description}')):
+            self.trie.remove(word, channel_id)
+
+    def search(self, query):
+        """Return (similarity, id) pairs of the channels matching every
+        word of the query."""
+
+        matches = None
+        for word in words(query):
+            found = self.trie.prefixed(word)
+            if len(word) > 3:
+                found |= self.trie.fuzzy(word)
+            matches = found if matches is None else matches & found
+        return [
+            (self.score(query, channel_id), channel_id)
+            for channel_id in matches or ()
+        ]
+
+    def score(self, query, channel_id):
+        name, description = self.texts[channel_id]
+        return max(
+            [similarity(query, name)] + [
+                similarity(query, word) for word in words(description)
+            ]
+        )
+
+
+_index = None
+_index_version = None
+_index_lock = threading.Lock()
+
+
+def get_version():
+    cache.add(VERSION_KEY, time.time_ns(), None)
+    return cache.get(VERSION_KEY)
+
+
+def changes_key(version):
+    return f'channel_directory_changes:{version}'
+
+
+def _record(channel_ids):
+    try:
+        version = cache.incr(VERSION_KEY)
+    except ValueError:
+        # No version, so every trie is rebuilt anyway.
+        return
+    cache.set(changes_key(version), channel_ids, CHANGES_TIMEOUT)
+
+
+def invalidate(channel_ids, using=None):
+    """Record that channels changed, so every process updates them in
+    its trie on its next fallback search.
+
+    Like the channel lists, the change is recorded right away and again
+    once the current transaction commits, so no process keeps a row
+    it read before the commit."""
+
+    channel_ids = list(channel_ids)
+    if channel_ids:
+        _record(channel_ids)
+        transaction.on_commit(partial(_record, channel_ids), using=using)
+
+
+def _load(channel_ids=None):
+    queryset = Channel.objects.active()
+    if channel_ids is not None:
+        queryset = queryset.filter(id__in=channel_ids)
+    return queryset.values_list('id', 'name', 'description').iterator()
+
+
+def _apply_changes(index, old_version, version):
+    """Update an index from `old_version` to `version` and return True,
+    or return False when it has to be rebuilt."""
+
+    if not 0 < version - old_version <= MAX_CHANGES:
+        return False
+    keys = [changes_key(v) for v in range(old_version + 1, version + 1)]
+    changes = cache.get_many(keys)
+    if len(changes) != len(keys):
+        return False
+
+    channel_ids = set().union(*changes.values())
+    for channel_id in channel_ids:
+        index.discard(channel_id)
+    for channel_id, name, description in _load(channel_ids):
+        index.add(channel_id, name, description)
+    return True
+
+
+def get_index():
+    """Return the trie index of the channels, updated with the channels
+    that changed since it was built."""
+
+    global _index, _index_version
+
+    version = get_version()
+    with _index_lock:
+        if _index is not None and _index_version != version and \
+                not _apply_changes(_index, _index_version, version):
+            _index = None
+        if _index is None:
+            _index = TrieIndex(_load())
+        _index_version = version
+        return _index
+
+
+def escape_like(value):
+    return re.sub(r'([\\%_])', r'\\\1', value)
+
+
+def trigram_candidates(connection, query):
+    """Return the best (similarity, id) pairs matching the query,
+    using the trigram indexes."""
+
+    table = connection.ops.quote_name(Channel._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT GREATEST(similarity(name, %s), '
+            'word_similarity(%s, name), '
+            'word_similarity(%s, description)) AS score, id '
+            f'FROM {table} '
+            'WHERE deleted_at IS NULL AND ('
+            'name %% %s OR %s <%% name OR %s <%% description '
+            'OR name ILIKE %s) '
+            'ORDER BY score DESC, id LIMIT %s',
+            [query] * 6 + [
+                f'%{escape_like(query)}%',
+                DIRECTORY_CANDIDATES
+            ]
+        )
+        return cursor.fetchall()
+
+
+def search(query, limit):
+    """Return the channels best matching the query, best first."""
+
+    connection = connections[router.db_for_read(Channel) or 'default']
+    if has_trigram(connection):
+        candidates = trigram_candidates(connection, query)
+    else:
+        candidates = sorted(
+            get_index().search(query),
+            key=lambda pair: (-pair[0], pair[1])
+        )[:DIRECTORY_CANDIDATES]
+    if not candidates:
+        return []
+
+    scores = {channel_id: score for score, channel_id in candidates}
+    channels = Channel.objects.active().in_bulk(list(scores))
+
+    def rank(channel):
+        popularity = math.log10(1 + channel.member_count)
+        return scores[channel.pk] + POPULARITY_WEIGHT * popularity
+
+    return sorted(
+        channels.values(),
+        key=lambda channel: (-rank(channel), channel.pk)
+    )[:limit]
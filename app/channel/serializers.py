@@ -1,14 +1,77 @@
 """Serializers for channels API.
 """
 
-from core.models import Channel
+from django.utils.translation import gettext as _
+
+from core.models import Channel, Membership
 from rest_framework import serializers
 
 
 class ChannelSerializer(serializers.ModelSerializer):
-    """Serializer for channels."""
+    """Serializer for channels.
+
+    Only admins of a channel may change its `retention_days`, as
+    shortening it deletes history for every member."""
 
     class Meta:
         model = Channel
-        fields = ['id', 'name', 'description']
-        read_only_fields = ['id']
+        fields = [
+            'id',
+            'name',
+            'description',
+            'last_message_seq',
+            'retention_days',
+        ]
+        read_only_fields = ['id', 'last_message_seq']
+
+    def validate_retention_days(self, value):
+        if self.instance is None or value == self.instance.retention_days:
+            return value
+        is_admin = Membership.objects.filter(
+            channel=self.instance,
+            member=self.context['request'].user,
+            permissions__gte=Membership.ADMIN
+        ).exists()
+        if not is_admin:
+            raise serializers.ValidationError(
+                _('Only channel admins can change the retention.')
+            )
+        return value
+
+
+class DirectoryChannelSerializer(serializers.ModelSerializer):
+    """Serializer for channels found in the directory."""
+
+    member_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Channel
+        fields = ['id', 'name', 'description', 'member_count']
+        read_only_fields = fields
+
+
+class MemberSerializer(serializers.ModelSerializer):
+    """Serializer for members of a channel."""
+
+    id = serializers.IntegerField(source='member_id')
+    username = serializers.CharField(source='member.username')
+
+    class Meta:
+        model = Membership
+        fields = ['id', 'username', 'permissions', 'join_date']
+
+
+class ProvisionChannelSerializer(serializers.Serializer):
+    """Serializer for a channel to provision.
+
+    Names are checked against the existing channels in one query by the
+    view, so there is no per-item unique validator."""
+
+    name = serializers.CharField(max_length=255)
+    description = serializers.CharField(required=False, allow_blank=True)
+
+
+class ReadMarkerSerializer(serializers.Serializer):
+    """Serializer for the last message a member has read."""
+
+    seq = serializers.IntegerField(min_value=0)
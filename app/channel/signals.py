@@ -0,0 +1,17 @@
+"""
+Signal handlers of the channel app.
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from channel import directory
+from core.models import Channel
+
+
+@receiver(post_save, sender=Channel)
+@receiver(post_delete, sender=Channel)
+def channel_changed(sender, instance, using, **kwargs):
+    """Update the channel in the directory tries."""
+
+    directory.invalidate([instance.pk], using=using)
@@ -2,10 +2,15 @@
 Tests for channel API
 """
 
+from contextlib import ExitStack, contextmanager
 from datetime import date
+from unittest.mock import patch
 
+from django.core.cache import cache
+from django.db import connections
 from django.urls import reverse
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 
 from rest_framework import status
@@ -13,14 +18,26 @@ from rest_framework.test import APIClient
 
 from core.models import (
     Channel,
+    ChannelDeletion,
+    Membership,
     Message,
+    OutboxEvent,
+    Reaction,
 )
 
+from core.sharding import shard_for_channel
+from channel import directory
 from channel.serializers import ChannelSerializer
 
 CHANNELS_URL = reverse('channel:channel-list')
 MESS_URL = 'channel:channel-messages'
 PATCH_MSG_URL = 'channel:channel-patch-messages'
+THREAD_URL = 'channel:channel-thread'
+REACTIONS_URL = 'channel:channel-reactions'
+SYNC_URL = reverse('channel:channel-sync')
+MEMBERS_URL = 'channel:channel-members'
+PROVISION_URL = reverse('channel:channel-provision')
+DIRECTORY_URL = reverse('channel:directory-list')
 
 
 def create_channel(creator, **params):
@@ -43,6 +60,22 @@ def create_user(**params):
     return get_user_model().objects.create(**params)
 
 
+@contextmanager
+def capture_queries(*aliases):
+    """Collect the queries run on some databases. A database named
+    twice, like a single shard on `default`, is only counted once."""
+
+    queries = []
+    with ExitStack() as stack:
+        contexts = [
+            stack.enter_context(CaptureQueriesContext(connections[alias]))
+            for alias in dict.fromkeys(aliases)
+        ]
+        yield queries
+    for context in contexts:
+        queries.extend(context.captured_queries)
+
+
 class PublicChannelAPITests(TestCase):
     """Test unauthenticated API requests."""
 
@@ -60,7 +93,10 @@ class PublicChannelAPITests(TestCase):
 class PrivateChannelsAPITests(TestCase):
     """Test authenticated API requests."""
 
+    databases = '__all__'
+
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
         self.user = create_user(
             username='User',
@@ -105,6 +141,56 @@ class PrivateChannelsAPITests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data, serializer.data)
 
+    def test_list_channels_pages(self):
+        """Test listing channels newest first, page by page."""
+
+        channels = [
+            create_channel(creator=self.user, name=f'Channel {i}')
+            for i in range(5)
+        ]
+
+        ids = []
+        params = {'limit': 2}
+        while True:
+            res = self.client.get(CHANNELS_URL, params)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(res.data['results']), 2)
+            ids.extend(channel['id'] for channel in res.data['results'])
+            if res.data['next'] is None:
+                break
+            params['before'] = res.data['next']
+
+        self.assertEqual(ids, [c.id for c in reversed(channels)])
+
+    def test_list_channels_cached_until_membership_changes(self):
+        """Test the channel list is read from the cache and refreshed
+        when the user joins a channel."""
+
+        other_user = create_user(
+            username='User2',
+            email='email1@example.com',
+            password='pas123'
+        )
+        own = create_channel(creator=self.user)
+        channel = create_channel(creator=other_user, name='Channel2')
+        self.client.get(CHANNELS_URL)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(CHANNELS_URL)
+        self.assertEqual(len(res.data), 1)
+
+        Membership.objects.create(
+            channel=channel,
+            member=self.user,
+            inviter=other_user
+        )
+        res = self.client.get(CHANNELS_URL)
+
+        self.assertEqual(
+            [c['id'] for c in res.data],
+            [channel.id, own.id]
+        )
+
     def test_create_channel(self):
         """Test creating a channel through the API."""
 
@@ -189,6 +275,36 @@ class PrivateChannelsAPITests(TestCase):
         channel.refresh_from_db()
         self.assertEqual(channel.creator, self.user)
 
+    def test_retention_changed_by_admins_only(self):
+        """Test members below admin cannot change the retention."""
+
+        other_user = create_user(
+            username='User2',
+            email='email1@example.com',
+            password='pas123'
+        )
+        channel = create_channel(creator=other_user)
+        Membership.objects.create(
+            channel=channel,
+            member=self.user,
+            inviter=other_user,
+            permissions=Membership.WRITE
+        )
+        url = reverse('channel:channel-detail', args=[channel.id])
+        admin_client = APIClient()
+        admin_client.force_authenticate(other_user)
+
+        denied = self.client.patch(url, {'retention_days': 1})
+        renamed = self.client.patch(url, {'name': 'Renamed'})
+        allowed = admin_client.patch(url, {'retention_days': 30})
+
+        self.assertEqual(denied.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('retention_days', denied.data)
+        self.assertEqual(renamed.status_code, status.HTTP_200_OK)
+        self.assertEqual(allowed.status_code, status.HTTP_200_OK)
+        channel.refresh_from_db()
+        self.assertEqual(channel.retention_days, 30)
+
     def test_delete_channel(self):
         """Test delete channel successfully"""
 
@@ -202,7 +318,14 @@ class PrivateChannelsAPITests(TestCase):
         res = self.client.delete(url)
 
         self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
-        self.assertFalse(Channel.objects.filter(id=channel.id).exists())
+        self.assertFalse(Channel.objects.active().filter(id=channel.id))
+        self.assertTrue(
+            ChannelDeletion.objects.filter(channel_id=channel.id).exists()
+        )
+        res = self.client.get(CHANNELS_URL)
+        self.assertEqual(res.data, [])
+        res = self.client.get(reverse(MESS_URL, args=[channel.id]))
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
 
     def test_delete_channel_other_users_channel_error(self):
         """Test trying to delete another user's channel returns error."""
@@ -247,6 +370,460 @@ class PrivateChannelsAPITests(TestCase):
         self.assertEqual(message.sender, self.user)
         self.assertEqual(len(res.data), 1)
 
+    def test_post_message_returns_seq(self):
+        """Test posting a message returns its channel sequence number."""
+
+        channel = create_channel(creator=self.user)
+
+        res1 = self.client.post(
+            reverse(MESS_URL, args=[channel.id]),
+            {'text': 'First'},
+            format='json'
+        )
+        res2 = self.client.post(
+            reverse(MESS_URL, args=[channel.id]),
+            {'text': 'Second'},
+            format='json'
+        )
+
+        self.assertEqual(res1.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res1.data['seq'], 1)
+        self.assertEqual(res2.data['seq'], 2)
+
+    def test_post_message_writes_outbox_event(self):
+        """Test posting a message stores a message.created event."""
+
+        channel = create_channel(creator=self.user)
+
+        res = self.client.post(
+            reverse(MESS_URL, args=[channel.id]),
+            {'text': 'Hello'},
+            format='json'
+        )
+
+        shard = shard_for_channel(channel.id)
+        event = OutboxEvent.objects.using(shard).get()
+        self.assertEqual(event.event_type, 'message.created')
+        self.assertEqual(event.payload['id'], res.data['id'])
+
+    def test_list_channel_messages_seq_range(self):
+        """Test listing only the messages of a sequence range."""
+
+        channel = create_channel(creator=self.user)
+        for i in range(5):
+            Message.objects.create(
+                sender=self.user,
+                channel=channel,
+                text=f'Message {i}'
+            )
+
+        res = self.client.get(
+            reverse(MESS_URL, args=[channel.id]),
+            {'from_seq': 2, 'to_seq': 4}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([m['seq'] for m in res.data], [2, 3, 4])
+
+    def test_list_channel_messages_after_id(self):
+        """Test listing only the messages newer than a message id."""
+
+        channel = create_channel(creator=self.user)
+        messages = [
+            Message.objects.create(
+                sender=self.user,
+                channel=channel,
+                text=f'Message {i}'
+            )
+            for i in range(3)
+        ]
+
+        res = self.client.get(
+            reverse(MESS_URL, args=[channel.id]),
+            {'after': messages[0].id}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [m['id'] for m in res.data],
+            [str(messages[1].id), str(messages[2].id)]
+        )
+
+    def test_list_channel_messages_invalid_seq_error(self):
+        """Test an invalid sequence number returns an error."""
+
+        channel = create_channel(creator=self.user)
+
+        res = self.client.get(
+            reverse(MESS_URL, args=[channel.id]),
+            {'from_seq': 'abc'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_sync_lists_new_messages_of_all_channels(self):
+        """Test syncing returns the newer messages of every channel."""
+
+        other_user = create_user(
+            username='Other',
+            email='other@example.com',
+            password='pass123'
+        )
+        first = create_channel(creator=self.user)
+        second = create_channel(creator=self.user, name='Channel2')
+        foreign = create_channel(creator=other_user, name='Foreign')
+        old = Message.objects.create(
+            sender=self.user,
+            channel=first,
+            text='Old'
+        )
+        new = [
+            Message.objects.create(
+                sender=self.user,
+                channel=channel,
+                text='New'
+            )
+            for channel in (second, first)
+        ]
+        Message.objects.create(
+            sender=other_user,
+            channel=foreign,
+            text='Foreign'
+        )
+
+        res = self.client.get(SYNC_URL, {'since': old.id})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [m['id'] for m in res.data],
+            [str(m.id) for m in new]
+        )
+
+    def test_sync_ignores_stale_channel_list(self):
+        """Test syncing stops at once for a channel the user left, even
+        while the cached channel list still holds it."""
+
+        other_user = create_user(
+            username='Other',
+            email='other@example.com',
+            password='pass123'
+        )
+        channel = create_channel(creator=other_user)
+        membership = Membership.objects.create(
+            channel=channel,
+            member=self.user,
+            inviter=other_user
+        )
+        Message.objects.create(
+            sender=other_user,
+            channel=channel,
+            text='Secret'
+        )
+        self.client.get(CHANNELS_URL)
+
+        with patch('core.signals.channel_lists.bump'):
+            membership.delete()
+        res = self.client.get(SYNC_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [])
+
+    def test_provision_channels(self):
+        """Test staff can create many channels and see taken names."""
+
+        self.user.is_staff = True
+        self.user.save()
+        create_channel(creator=self.user, name='Taken')
+        payload = [
+            {'name': 'Taken'},
+            {'name': 'First', 'description': 'One'},
+            {'name': 'Second'},
+        ]
+
+        res = self.client.post(PROVISION_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [channel['name'] for channel in res.data['created']],
+            ['First', 'Second']
+        )
+        self.assertEqual(res.data['existing'], ['Taken'])
+        self.assertEqual(
+            Membership.objects.filter(
+                member=self.user,
+                permissions=Membership.ADMIN
+            ).count(),
+            3
+        )
+
+    def test_provision_channels_requires_staff(self):
+        """Test users that are not staff cannot provision channels."""
+
+        res = self.client.post(
+            PROVISION_URL,
+            [{'name': 'First'}],
+            format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def add_members(self, channel, count, permissions=Membership.READ):
+        users = [
+            create_user(
+                username=f'member{permissions}_{i}',
+                email=f'member{permissions}_{i}@example.com',
+                password='pass123'
+            )
+            for i in range(count)
+        ]
+        Membership.objects.bulk_create([
+            Membership(
+                channel=channel,
+                member=user,
+                inviter=self.user,
+                permissions=permissions
+            )
+            for user in users
+        ])
+        return users
+
+    def test_list_members_keyset_pages(self):
+        """Test members are listed admins first, page by page."""
+
+        channel = create_channel(creator=self.user)
+        writers = self.add_members(channel, 2, Membership.WRITE)
+        readers = self.add_members(channel, 4)
+        url = reverse(MEMBERS_URL, args=[channel.id])
+
+        ids = []
+        params = {'limit': 3}
+        while True:
+            res = self.client.get(url, params)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(res.data['results']), 3)
+            ids.extend(member['id'] for member in res.data['results'])
+            if res.data['next'] is None:
+                break
+            params['cursor'] = res.data['next']
+
+        self.assertEqual(
+            ids,
+            [self.user.id] + [u.id for u in writers + readers]
+        )
+
+    def test_list_members_filters(self):
+        """Test filtering members by permissions and username prefix."""
+
+        channel = create_channel(creator=self.user)
+        writers = self.add_members(channel, 2, Membership.WRITE)
+        self.add_members(channel, 2)
+        url = reverse(MEMBERS_URL, args=[channel.id])
+
+        by_level = self.client.get(url, {'permissions': Membership.WRITE})
+        by_prefix = self.client.get(url, {'username': 'member1_'})
+
+        self.assertEqual(
+            [m['id'] for m in by_level.data['results']],
+            [u.id for u in writers]
+        )
+        self.assertEqual(
+            [m['username'] for m in by_prefix.data['results']],
+            ['member1_0', 'member1_1']
+        )
+
+    def test_list_members_invalid_cursor_error(self):
+        """Test an invalid cursor returns an error."""
+
+        channel = create_channel(creator=self.user)
+
+        res = self.client.get(
+            reverse(MEMBERS_URL, args=[channel.id]),
+            {'cursor': 'abc'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_mark_channel_read(self):
+        """Test the read marker moves forward up to the last message."""
+
+        channel = create_channel(creator=self.user)
+        other = create_user(
+            username='other',
+            email='other@example.com',
+            password='pass123'
+        )
+        with self.captureOnCommitCallbacks(
+            using=shard_for_channel(channel.id),
+            execute=True
+        ):
+            for text in ['One', 'Two', 'Three']:
+                Message.objects.create(
+                    sender=other,
+                    channel=channel,
+                    text=text
+                )
+        url = reverse('channel:channel-read', args=[channel.id])
+
+        seqs = []
+        for seq in [2, 1, 100]:
+            res = self.client.post(url, {'seq': seq})
+            self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+            seqs.append(Membership.objects.get(
+                channel=channel,
+                member=self.user
+            ).last_read_seq)
+
+        self.assertEqual(seqs, [2, 2, 3])
+
+    def test_reply_in_thread(self):
+        """Test replies, also to replies, join the thread of their root,
+        which counts them and lists them in one query."""
+
+        channel = create_channel(creator=self.user)
+        url = reverse(MESS_URL, args=[channel.id])
+        root = self.client.post(url, {'text': 'Root'}, format='json').data
+        reply = self.client.post(
+            url,
+            {'text': 'Reply', 'parent': root['id']},
+            format='json'
+        ).data
+        self.client.post(
+            url,
+            {'text': 'Nested', 'parent': reply['id']},
+            format='json'
+        )
+
+        with capture_queries('default', shard_for_channel(channel.id)) as q:
+            res = self.client.get(
+                reverse(THREAD_URL, args=[channel.id, root['id']])
+            )
+        from_reply = self.client.get(
+            reverse(THREAD_URL, args=[channel.id, reply['id']])
+        )
+        history = self.client.get(url)
+
+        self.assertEqual(len(q), 3)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['root']['id'], root['id'])
+        self.assertEqual(res.data['root']['reply_count'], 2)
+        self.assertIsNotNone(res.data['root']['last_reply_at'])
+        self.assertEqual(
+            [(m['text'], m['parent']) for m in res.data['replies']],
+            [('Reply', root['id']), ('Nested', reply['id'])]
+        )
+        self.assertEqual(
+            {m['thread_root'] for m in res.data['replies']},
+            {root['id']}
+        )
+        self.assertEqual(from_reply.data, res.data)
+        self.assertEqual(history.data[0]['reply_count'], 2)
+
+    def test_reply_to_other_channel_error(self):
+        """Test replying to a message of another channel fails."""
+
+        channel = create_channel(creator=self.user)
+        other = create_channel(creator=self.user, name='Other')
+        message = Message.objects.create(
+            sender=self.user,
+            channel=other,
+            text='Elsewhere'
+        )
+
+        res = self.client.post(
+            reverse(MESS_URL, args=[channel.id]),
+            {'text': 'Reply', 'parent': message.id},
+            format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('parent', res.data)
+
+    def test_toggle_reactions(self):
+        """Test reactions are counted per emoji on the message and a
+        second toggle removes them."""
+
+        other_user = create_user(
+            username='User2',
+            email='email1@example.com',
+            password='pas123'
+        )
+        channel = create_channel(creator=self.user)
+        Membership.objects.create(
+            channel=channel,
+            member=other_user,
+            inviter=self.user,
+            permissions=Membership.WRITE
+        )
+        message = Message.objects.create(
+            sender=self.user,
+            channel=channel,
+            text='Hello'
+        )
+        url = reverse(REACTIONS_URL, args=[channel.id, message.id])
+        other_client = APIClient()
+        other_client.force_authenticate(other_user)
+
+        first = self.client.post(url, {'emoji': '👍'}, format='json')
+        other_client.post(url, {'emoji': '👍'}, format='json')
+        self.client.post(url, {'emoji': '🎉'}, format='json')
+        removed = self.client.post(url, {'emoji': '🎉'}, format='json')
+        history = self.client.get(reverse(MESS_URL, args=[channel.id]))
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertTrue(first.data['reacted'])
+        self.assertEqual(first.data['reaction_counts'], {'👍': 1})
+        self.assertFalse(removed.data['reacted'])
+        self.assertEqual(removed.data['reaction_counts'], {'👍': 2})
+        self.assertEqual(history.data[0]['reaction_counts'], {'👍': 2})
+        self.assertEqual(
+            Reaction.objects.using(shard_for_channel(channel.id)).filter(
+                message=message
+            ).count(),
+            2
+        )
+
+    def test_reaction_removed_concurrently_counted_once(self):
+        """Test removing a reaction another request already removed
+        leaves the counts alone."""
+
+        channel = create_channel(creator=self.user)
+        message = Message.objects.create(
+            sender=self.user,
+            channel=channel,
+            text='Hello'
+        )
+        Reaction.objects.toggle(message, self.user.id, '👍')
+        url = reverse(REACTIONS_URL, args=[channel.id, message.id])
+
+        # The other removal deletes the row between the INSERT and the
+        # DELETE of this one.
+        with patch(
+            'django.db.models.query.QuerySet.delete',
+            return_value=(0, {})
+        ):
+            res = self.client.post(url, {'emoji': '👍'}, format='json')
+
+        self.assertFalse(res.data['reacted'])
+        self.assertEqual(res.data['reaction_counts'], {'👍': 1})
+
+    def test_reaction_invalid_emoji_error(self):
+        """Test reacting with an invalid emoji returns an error."""
+
+        channel = create_channel(creator=self.user)
+        message = Message.objects.create(
+            sender=self.user,
+            channel=channel,
+            text='Hello'
+        )
+
+        res = self.client.post(
+            reverse(REACTIONS_URL, args=[channel.id, message.id]),
+            {'emoji': 'a"b'},
+            format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_update_your_message_channel(self):
         """Test updating your message from a channel."""
 
@@ -309,3 +886,154 @@ class PrivateChannelsAPITests(TestCase):
 
         res = self.client.patch(url, payload, format='json')
         self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_presence_lists_online_and_typing_members(self):
+        """Test members marking themselves online and typing are listed."""
+
+        channel = create_channel(creator=self.user)
+        url = reverse('channel:channel-presence', args=[channel.id])
+
+        with patch('realtime.presence.publish_delta'):
+            res_touch = self.client.post(url)
+            self.client.post(
+                reverse('channel:channel-typing', args=[channel.id])
+            )
+            res = self.client.get(url)
+
+        expected = [{'id': self.user.id, 'username': self.user.username}]
+        self.assertEqual(res_touch.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['online'], expected)
+        self.assertEqual(res.data['typing'], expected)
+
+    def test_presence_requires_membership(self):
+        """Test presence of another user's channel is forbidden."""
+
+        other_user = create_user(
+            username='User2',
+            email='email1@example.com',
+            password='pas123'
+        )
+        channel = create_channel(creator=other_user)
+
+        res = self.client.get(
+            reverse('channel:channel-presence', args=[channel.id])
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class ChannelDirectoryAPITests(TestCase):
+    """Test searching the channel directory."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(
+            username='User',
+            email='email@example.com',
+            password='pass123'
+        )
+        self.client.force_authenticate(self.user)
+
+    def search(self, query):
+        res = self.client.get(DIRECTORY_URL, {'q': query})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [channel['name'] for channel in res.data]
+
+    def test_search_matches_prefixes_and_typos(self):
+        """Test words of names and descriptions match by prefix and with
+        a typo, and deleted channels are left out."""
+
+        create_channel(self.user, name='Python Developers')
+        create_channel(
+            self.user,
+            name='Snakes',
+            description='All about pythons'
+        )
+        create_channel(self.user, name='Gardening')
+        create_channel(self.user, name='Python Old').mark_deleted()
+
+        self.assertEqual(
+            set(self.search('pyth')),
+            {'Python Developers', 'Snakes'}
+        )
+        self.assertEqual(self.search('devleopers'), [])
+        self.assertEqual(self.search('develoers'), ['Python Developers'])
+        self.assertEqual(self.search('cooking'), [])
+
+    def test_search_ranks_by_similarity_and_members(self):
+        """Test closer names rank first and members break ties."""
+
+        quiet = create_channel(self.user, name='Chess Club')
+        busy = create_channel(self.user, name='Chess Crew')
+        create_channel(self.user, name='Chess')
+        Membership.objects.bulk_create([
+            Membership(
+                channel=busy,
+                member=create_user(
+                    username=f'member{i}',
+                    email=f'member{i}@example.com'
+                ),
+                inviter=self.user
+            )
+            for i in range(20)
+        ])
+        Channel.objects.recount_members([busy.id])
+
+        res = self.client.get(DIRECTORY_URL, {'q': 'chess'})
+
+        self.assertEqual(
+            [c['name'] for c in res.data],
+            ['Chess', busy.name, quiet.name]
+        )
+        self.assertEqual(res.data[1]['member_count'], 21)
+
+    def test_trie_updated_with_changed_channels(self):
+        """Test the trie reloads only the channels changed since it was
+        built, and is rebuilt when the changes left the cache."""
+
+        renamed = create_channel(self.user, name='Chess Club')
+        deleted = create_channel(self.user, name='Chess Crew')
+        directory.get_index()
+
+        renamed.name = 'Go Club'
+        renamed.save()
+        deleted.mark_deleted()
+        created = create_channel(self.user, name='Chess Masters')
+        with patch.object(directory, 'TrieIndex') as rebuild:
+            index = directory.get_index()
+
+        rebuild.assert_not_called()
+        self.assertEqual(
+            {channel_id for _, channel_id in index.search('chess')},
+            {created.id}
+        )
+        self.assertEqual(
+            {channel_id for _, channel_id in index.search('club')},
+            {renamed.id}
+        )
+
+        renamed.save()
+        cache.delete(directory.changes_key(directory.get_version()))
+        self.assertIsNot(directory.get_index(), index)
+
+    def test_provisioned_channels_found(self):
+        """Test channels created in bulk are added to the trie with their
+        creator counted."""
+
+        directory.get_index()
+
+        Channel.objects.bulk_provision([
+            Channel(creator=self.user, name='Chess Club'),
+        ])
+        res = self.client.get(DIRECTORY_URL, {'q': 'chess'})
+
+        self.assertEqual([c['name'] for c in res.data], ['Chess Club'])
+        self.assertEqual(res.data[0]['member_count'], 1)
+
+    def test_search_requires_query(self):
+        """Test searching without a query returns an error."""
+
+        res = self.client.get(DIRECTORY_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -12,6 +12,7 @@ from rest_framework.routers import DefaultRouter
 
 router = DefaultRouter()
 router.register('channels', views.ChannelViewSet)
+router.register('directory', views.DirectoryViewSet, basename='directory')
 
 app_name = 'channel'
 urlpatterns = [
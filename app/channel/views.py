@@ -2,17 +2,30 @@
 Views for the channel API.
 """
 
+import bisect
+import heapq
+from functools import partial
+from operator import attrgetter
+
+from django.db import transaction
+from django.db.models import Q
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+
 from rest_framework import status
 from rest_framework import viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.authentication import TokenAuthentication
 
 
+from core import archive, channel_lists, outbox, sharding
 from core.models import (
     Channel,
+    Membership,
     Message,
+    Reaction,
 )
 from core.permissions import (
     HasReadPermissions,
@@ -20,8 +33,22 @@ from core.permissions import (
     IsMessageOwner
 )
 
-from channel import serializers
-from message.serializers import MessageSerializer
+from channel import directory, serializers
+from message.serializers import MessageSerializer, ReactionSerializer
+from realtime import hashring
+from realtime.presence import registry as presence
+from realtime.pubsub import publish_message
+
+
+SYNC_LIMIT = 500
+THREAD_LIMIT = 500
+CHANNELS_FETCH_SIZE = 500
+MAX_CHANNELS_LIMIT = 500
+MAX_PROVISION = 1000
+MEMBERS_LIMIT = 100
+MAX_MEMBERS_LIMIT = 500
+DIRECTORY_LIMIT = 20
+MAX_DIRECTORY_LIMIT = 50
 
 
 class ChannelViewSet(viewsets.ModelViewSet):
@@ -38,14 +65,184 @@ class ChannelViewSet(viewsets.ModelViewSet):
         """Retrieve channels an user is member of."""
 
         return self.queryset.filter(
-            members__in=[self.request.user]
+            members__in=[self.request.user],
+            deleted_at__isnull=True
         ).order_by('-id')
 
+    def _fetch_channels(self, ids):
+        """Return the channels with the given ids in the same order,
+        read by primary key in pages of CHANNELS_FETCH_SIZE."""
+
+        channels = []
+        for start in range(0, len(ids), CHANNELS_FETCH_SIZE):
+            page = ids[start:start + CHANNELS_FETCH_SIZE]
+            rows = Channel.objects.active().in_bulk(page)
+            channels.extend(rows[pk] for pk in page if pk in rows)
+        return channels
+
+    def list(self, request):
+        """List the channels of the user, newest first.
+
+        The ids come from the user's cached channel list. Without
+        `limit` every channel is returned; with it the response is a
+        page of `results` and `next` is the `before` parameter of the
+        following page."""
+
+        try:
+            limit = self._int_param(request, 'limit')
+            before = self._int_param(request, 'before')
+        except ValueError as error:
+            return Response(
+                {'detail': str(error)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        ids = channel_lists.channel_ids(request.user.id)
+        end = len(ids) if before is None else bisect.bisect_left(ids, before)
+
+        if limit is None:
+            channels = self._fetch_channels(ids[:end][::-1])
+            return Response(self.get_serializer(channels, many=True).data)
+
+        limit = max(min(limit, MAX_CHANNELS_LIMIT), 1)
+        start = max(end - limit, 0)
+        page = ids[start:end][::-1]
+        serializer = self.get_serializer(
+            self._fetch_channels(page),
+            many=True
+        )
+        return Response({
+            'results': serializer.data,
+            'next': page[-1] if start else None,
+        })
+
+    def get_permissions(self):
+        """Posting shares the messages route but needs write access."""
+
+        if self.action == 'post_messages':
+            return [IsAuthenticated(), HasWritePermissions()]
+        return super().get_permissions()
+
     def perform_create(self, serializer):
         """Create a new channel."""
 
         serializer.save(creator=self.request.user)
 
+    @action(
+        methods=['post'],
+        detail=False,
+        permission_classes=[IsAdminUser],
+        serializer_class=serializers.ProvisionChannelSerializer
+    )
+    def provision(self, request):
+        """Create many channels owned by the requesting user at once.
+
+        Takes a list of channels. Names that are taken, including by
+        deleted channels not purged yet, are returned in `existing`
+        instead of failing the request."""
+
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        if len(serializer.validated_data) > MAX_PROVISION:
+            return Response(
+                {'detail': f'At most {MAX_PROVISION} channels at once.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        requested = {
+            item['name']: item for item in serializer.validated_data
+        }
+        existing = set(Channel.objects.filter(
+            name__in=list(requested)
+        ).values_list('name', flat=True))
+        channels = Channel.objects.bulk_provision(
+            Channel(
+                creator=request.user,
+                name=name,
+                description=item.get('description', '')
+            )
+            for name, item in requested.items() if name not in existing
+        )
+
+        return Response(
+            {
+                'created': serializers.ChannelSerializer(
+                    channels,
+                    many=True
+                ).data,
+                'existing': sorted(existing),
+            },
+            status=status.HTTP_201_CREATED
+        )
+
+    def perform_destroy(self, instance):
+        """Mark the channel deleted; purge_channels deletes its messages
+        and memberships in the background."""
+
+        instance.mark_deleted()
+
+    def _owner_redirect(self, request, pk):
+        """Return a redirect to the gateway node owning the channel,
+        or None when this node owns it."""
+
+        location = hashring.redirect_location(
+            pk,
+            request.path,
+            request.META.get('QUERY_STRING', '')
+        )
+        if location is None:
+            return None
+        return Response(
+            status=status.HTTP_307_TEMPORARY_REDIRECT,
+            headers={'Location': location}
+        )
+
+    def _int_param(self, request, name):
+        """Return a non-negative integer query parameter or None."""
+
+        value = request.query_params.get(name)
+        if value is None:
+            return None
+        if not value.isdigit():
+            raise ValueError(f'{name} must be a non-negative integer.')
+        return int(value)
+
+    @action(
+        methods=['get'],
+        detail=False,
+        serializer_class=MessageSerializer
+    )
+    def sync(self, request):
+        """Messages newer than the message id `since` in every channel
+        of the user, oldest first and at most SYNC_LIMIT of them.
+
+        The shards holding the user's channels are queried at the same
+        time and their results merged by id. The channels come from the
+        memberships, not the cached channel list, as they decide which
+        messages the user may read."""
+
+        try:
+            since = self._int_param(request, 'since') or 0
+        except ValueError as error:
+            return Response(
+                {'detail': str(error)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        channel_ids = channel_lists.member_channel_ids(request.user.id)
+
+        def fetch(alias, ids):
+            return list(Message.objects.on_shard(alias).filter(
+                channel__in=ids
+            ).newer_than(since).order_by('id')[:SYNC_LIMIT])
+
+        results = sharding.scatter_gather(fetch, channel_ids)
+        messages = list(heapq.merge(*results, key=attrgetter('id')))
+        serializer = MessageSerializer(
+            messages[:SYNC_LIMIT],
+            many=True,
+            context={'request': request}
+        )
+        return Response(serializer.data)
+
     @action(
         methods=['get'],
         detail=True,
@@ -53,21 +250,59 @@ class ChannelViewSet(viewsets.ModelViewSet):
         serializer_class=MessageSerializer
     )
     def messages(self, request, pk=None):
-        """View for messages app."""
-        queryset = Message.objects.all().filter(channel=pk).order_by('id')
+        """View for messages app.
+
+        `from_seq` and `to_seq` limit the result to an inclusive range
+        of channel sequence numbers, so clients can fetch exactly the
+        messages they detected as missing. `after` limits it to the
+        messages newer than a message id. Adding `wait` turns the
+        request into a long-poll, served by the ASGI app, which takes
+        the last sequence number seen as `after_seq` instead.
+
+        Messages moved to the archive are read from their segments and
+        come before the ones still in the message table. The segments
+        are only read when the requested range reaches back past the
+        last archived message, and the table only past it, which also
+        gives PostgreSQL a sent_date to skip the older partitions by."""
+        queryset = Message.objects.for_channel(pk).order_by('id')
+
+        try:
+            from_seq = self._int_param(request, 'from_seq')
+            to_seq = self._int_param(request, 'to_seq')
+            after = self._int_param(request, 'after')
+        except ValueError as error:
+            return Response(
+                {'detail': str(error)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if from_seq is not None:
+            queryset = queryset.filter(seq__gte=from_seq)
+        if to_seq is not None:
+            queryset = queryset.filter(seq__lte=to_seq)
+        segment = archive.last_segment(pk)
+        reaches_archive = False
+        if segment is not None and (after is None or after < segment.last_id):
+            queryset = queryset.newer_than(segment.last_id)
+            reaches_archive = from_seq is None or \
+                from_seq <= segment.last_seq
+        elif after is not None:
+            queryset = queryset.newer_than(after)
+
         context = {
             'request': request
         }
         serializer = MessageSerializer(queryset, many=True, context=context)
-        return Response(serializer.data)
+        archived = []
+        if reaches_archive:
+            archived = archive.read_messages(
+                pk,
+                after_id=after,
+                from_seq=from_seq,
+                to_seq=to_seq
+            )
+        return Response(archived + serializer.data)
 
-    @action(
-        methods=['post'],
-        detail=True,
-        permission_classes=[IsAuthenticated, HasWritePermissions],
-        serializer_class=MessageSerializer,
-        url_path='messages'
-    )
+    @messages.mapping.post
     def post_messages(self, request, pk=None):
         request.data['channel'] = pk
         request.data['sender'] = request.user.id
@@ -75,7 +310,19 @@ class ChannelViewSet(viewsets.ModelViewSet):
         serializer = MessageSerializer(data=request.data)
 
         if serializer.is_valid():
-            Message.objects.create(**serializer.validated_data)
+            shard = sharding.shard_for_channel(pk)
+            with transaction.atomic(using=shard):
+                serializer.save()
+                outbox.enqueue(
+                    'message.created',
+                    serializer.data,
+                    using=shard
+                )
+                transaction.on_commit(partial(
+                    publish_message,
+                    'message.created',
+                    serializer.data
+                ), using=shard)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         else:
             return Response(
@@ -94,17 +341,300 @@ class ChannelViewSet(viewsets.ModelViewSet):
 
         request.data['id'] = message_id
         request.data['channel'] = pk
-        msg_obj = Message.objects.get(pk=message_id)
+        msg_obj = get_object_or_404(
+            Message.objects.for_channel(pk).with_id(message_id)
+        )
         serializer = MessageSerializer(
             msg_obj,
             data=request.data,
             partial=True
         )
         if serializer.is_valid():
-            serializer.save()
+            shard = sharding.shard_for_channel(pk)
+            with transaction.atomic(using=shard):
+                serializer.save()
+                outbox.enqueue(
+                    'message.updated',
+                    serializer.data,
+                    using=shard
+                )
+                transaction.on_commit(partial(
+                    publish_message,
+                    'message.updated',
+                    serializer.data
+                ), using=shard)
             return Response(serializer.data, status=status.HTTP_200_OK)
         else:
             return Response(
                 serializer.errors,
                 status=status.HTTP_400_BAD_REQUEST
             )
+
+    @action(
+        methods=['get'],
+        detail=True,
+        permission_classes=[IsAuthenticated, HasReadPermissions],
+        serializer_class=MessageSerializer,
+        url_path=r'messages/(?P<message_id>\d+)/thread'
+    )
+    def thread(self, request, pk=None, message_id=None):
+        """The thread of a message: its root and the replies to it,
+        oldest first, at most THREAD_LIMIT of them.
+
+        Replies are read with a single range scan of the thread index
+        on (thread_root, id); `after` continues from a reply id. The
+        threads of archived messages are not listed."""
+
+        try:
+            after = self._int_param(request, 'after')
+        except ValueError as error:
+            return Response(
+                {'detail': str(error)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        messages = Message.objects.for_channel(pk)
+        try:
+            root = messages.with_id(message_id).get()
+            if root.thread_root_id is not None:
+                root = messages.with_id(root.thread_root_id).get()
+        except Message.DoesNotExist:
+            raise Http404
+
+        # Replies are newer than their root, which lets PostgreSQL skip
+        # the partitions of older months.
+        replies = messages.filter(thread_root=root.id).newer_than(
+            max(after or 0, root.id)
+        ).order_by('id')[:THREAD_LIMIT]
+
+        context = {'request': request}
+        return Response({
+            'root': MessageSerializer(root, context=context).data,
+            'replies': MessageSerializer(
+                replies,
+                many=True,
+                context=context
+            ).data,
+        })
+
+    @action(
+        methods=['post'],
+        detail=True,
+        permission_classes=[IsAuthenticated, HasWritePermissions],
+        serializer_class=ReactionSerializer,
+        url_path=r'messages/(?P<message_id>\d+)/reactions'
+    )
+    def reactions(self, request, pk=None, message_id=None):
+        """Toggle the user's reaction with an emoji to a message.
+
+        Answers whether the reaction is now set and the message's
+        updated counts per emoji. Archived messages are read-only."""
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        emoji = serializer.validated_data['emoji']
+        try:
+            message = Message.objects.for_channel(pk).with_id(
+                message_id
+            ).get()
+        except Message.DoesNotExist:
+            if archive.is_archived(pk, int(message_id)):
+                return Response(
+                    {'detail': 'Archived messages cannot be reacted to.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            raise Http404
+
+        shard = sharding.shard_for_channel(pk)
+        with transaction.atomic(using=shard):
+            try:
+                added, counts = Reaction.objects.toggle(
+                    message,
+                    request.user.id,
+                    emoji
+                )
+            except Message.DoesNotExist:
+                raise Http404
+            data = MessageSerializer(message).data
+            outbox.enqueue('message.updated', data, using=shard)
+            transaction.on_commit(partial(
+                publish_message,
+                'message.updated',
+                data
+            ), using=shard)
+        return Response({
+            'emoji': emoji,
+            'reacted': added,
+            'reaction_counts': counts,
+        })
+
+    def _members_cursor(self, request):
+        """Return the (permissions, member id) pair of the `cursor`
+        parameter, or None."""
+
+        value = request.query_params.get('cursor')
+        if value is None:
+            return None
+        permissions, _, member_id = value.partition(':')
+        if not permissions.isdigit() or not member_id.isdigit():
+            raise ValueError('cursor is invalid.')
+        return int(permissions), int(member_id)
+
+    @action(
+        methods=['get'],
+        detail=True,
+        permission_classes=[IsAuthenticated, HasReadPermissions],
+        serializer_class=serializers.MemberSerializer
+    )
+    def members(self, request, pk=None):
+        """List the members of a channel, admins first.
+
+        Pages are keyed on (permissions, member id) instead of offsets,
+        so every page is read from the membership index in the same
+        time whatever the size of the channel. `next` is the `cursor`
+        of the following page. `permissions` keeps one permission level
+        and `username` the usernames starting with a prefix."""
+
+        try:
+            limit = self._int_param(request, 'limit') or MEMBERS_LIMIT
+            permissions = self._int_param(request, 'permissions')
+            cursor = self._members_cursor(request)
+        except ValueError as error:
+            return Response(
+                {'detail': str(error)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        limit = min(limit, MAX_MEMBERS_LIMIT)
+
+        queryset = Membership.objects.filter(channel=pk).select_related(
+            'member'
+        ).only(
+            'member_id',
+            'member__username',
+            'permissions',
+            'join_date'
+        ).order_by('-permissions', 'member_id')
+        if permissions is not None:
+            queryset = queryset.filter(permissions=permissions)
+        username = request.query_params.get('username')
+        if username:
+            queryset = queryset.filter(member__username__startswith=username)
+        if cursor is not None:
+            queryset = queryset.filter(
+                Q(permissions__lt=cursor[0]) |
+                Q(permissions=cursor[0], member_id__gt=cursor[1])
+            )
+
+        page = list(queryset[:limit + 1])
+        next_cursor = None
+        if len(page) > limit:
+            page = page[:limit]
+            last = page[-1]
+            next_cursor = f'{last.permissions}:{last.member_id}'
+
+        serializer = serializers.MemberSerializer(page, many=True)
+        return Response({'results': serializer.data, 'next': next_cursor})
+
+    @action(
+        methods=['post'],
+        detail=True,
+        permission_classes=[IsAuthenticated, HasReadPermissions],
+        serializer_class=serializers.ReadMarkerSerializer
+    )
+    def read(self, request, pk=None):
+        """Mark the messages of a channel up to the sequence number
+        `seq` as read by the user.
+
+        The marker only moves forward and never past the channel's last
+        message."""
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        last_seq = Channel.objects.filter(pk=pk).values_list(
+            'last_message_seq',
+            flat=True
+        ).get()
+        seq = min(serializer.validated_data['seq'], last_seq)
+        Membership.objects.filter(
+            channel=pk,
+            member=request.user,
+            last_read_seq__lt=seq
+        ).update(last_read_seq=seq)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(
+        methods=['get'],
+        detail=True,
+        permission_classes=[IsAuthenticated, HasReadPermissions]
+    )
+    def presence(self, request, pk=None):
+        """List the members online and typing in a channel.
+
+        Presence lives in the memory of the channel's gateway node and
+        is never read from the database."""
+
+        redirect = self._owner_redirect(request, pk)
+        if redirect:
+            return redirect
+        return Response({
+            'online': presence.online(int(pk)),
+            'typing': presence.typing(int(pk)),
+        })
+
+    @presence.mapping.post
+    def touch_presence(self, request, pk=None):
+        """Mark the user as online in a channel."""
+
+        redirect = self._owner_redirect(request, pk)
+        if redirect:
+            return redirect
+        presence.touch(int(pk), request.user.id, request.user.username)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(
+        methods=['post'],
+        detail=True,
+        permission_classes=[IsAuthenticated, HasReadPermissions]
+    )
+    def typing(self, request, pk=None):
+        """Mark the user as typing in a channel."""
+
+        redirect = self._owner_redirect(request, pk)
+        if redirect:
+            return redirect
+        presence.start_typing(
+            int(pk),
+            request.user.id,
+            request.user.username
+        )
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class DirectoryViewSet(viewsets.GenericViewSet):
+    """Search channels by name and description."""
+
+    serializer_class = serializers.DirectoryChannelSerializer
+    queryset = Channel.objects.active()
+
+    # api permissions
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def list(self, request):
+        """List the channels matching the query `q`, best match first.
+
+        Names and descriptions match when they contain the words of the
+        query or words close to them, so typos are tolerated. Channels
+        with more members rank higher among similar matches."""
+
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response(
+                {'detail': 'q is required.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        limit = request.query_params.get('limit', '')
+        limit = int(limit) if limit.isdigit() else DIRECTORY_LIMIT
+        limit = max(min(limit, MAX_DIRECTORY_LIMIT), 1)
+
+        channels = directory.search(query, limit)
+        return Response(self.get_serializer(channels, many=True).data)
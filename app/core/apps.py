@@ -4,3 +4,6 @@ from django.apps import AppConfig  # noqa
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from core import signals  # noqa
@@ -0,0 +1,397 @@
+"""
+Cold storage of old channel history.
+
+The archive_messages command moves messages older than
+ARCHIVE_AFTER_DAYS out of the message table into segment files, one
+series of files per channel, and records every file as an
+ArchiveSegment. A segment holds zlib compressed blocks of
+ARCHIVE_BLOCK_SIZE serialized messages followed by a block index:
+
+    header  magic, version
+    blocks  zlib(JSON list of messages), in id order
+    index   first id, last id, lowest seq, highest seq, offset, length
+            for every block
+    footer  index offset, block count, magic
+
+Segments are read through a memory map, and a read only decompresses
+the blocks its id or sequence range overlaps. The maps of recently read
+segments stay open between reads.
+
+Archived messages are read-only: they cannot be replied to or reacted
+to, and their threads are not listed. A reply whose thread root was
+archived after it was posted leaves the root's archived reply_count as
+it was. Messages archived before threads and reactions existed lack
+their fields, which reads fill in with MESSAGE_DEFAULTS.
+"""
+
+import bisect
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import zlib
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from copy import copy
+from datetime import date
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from core.models import ArchiveSegment, Message
+from core.routers import read_alias
+from core.sharding import shard_for_channel
+
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'CHSG'
+VERSION = 1
+COMPRESSION_LEVEL = 6
+DEFAULT_SEGMENT_SIZE = 20000
+
+MESSAGE_DEFAULTS = {
+    'parent': None,
+    'thread_root': None,
+    'reply_count': 0,
+    'last_reply_at': None,
+    'reaction_counts': {},
+}
+
+HEADER = struct.Struct('>4sB')
+INDEX_ENTRY = struct.Struct('>QQQQQI')
+FOOTER = struct.Struct('>QI4s')
+
+
+class SegmentError(Exception):
+    """Raised when a file is not a valid segment."""
+
+
+def write_segment(path, messages, block_size=None):
+    """Write serialized messages, ordered by id, to a segment file.
+
+    The file is written next to its destination and renamed into place,
+    so readers never see a partial segment."""
+
+    block_size = block_size or settings.ARCHIVE_BLOCK_SIZE
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.tmp'
+
+    with open(tmp_path, 'wb') as segment:
+        segment.write(HEADER.pack(MAGIC, VERSION))
+        entries = []
+        for start in range(0, len(messages), block_size):
+            block = messages[start:start + block_size]
+            data = zlib.compress(
+                json.dumps(
+                    block,
+                    cls=DjangoJSONEncoder,
+                    separators=(',', ':')
+                ).encode(),
+                COMPRESSION_LEVEL
+            )
+            seqs = [message['seq'] for message in block]
+            entries.append(INDEX_ENTRY.pack(
+                int(block[0]['id']),
+                int(block[-1]['id']),
+                min(seqs),
+                max(seqs),
+                segment.tell(),
+                len(data)
+            ))
+            segment.write(data)
+        index_offset = segment.tell()
+        segment.write(b''.join(entries))
+        segment.write(FOOTER.pack(index_offset, len(entries), MAGIC))
+        segment.flush()
+        os.fsync(segment.fileno())
+
+    os.replace(tmp_path, path)
+
+
+class SegmentReader:
+    """Memory mapped reader of a segment file."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as segment:
+            self._map = mmap.mmap(
+                segment.fileno(),
+                0,
+                access=mmap.ACCESS_READ
+            )
+
+        magic, version = HEADER.unpack_from(self._map, 0)
+        index_offset, count, end_magic = FOOTER.unpack_from(
+            self._map,
+            len(self._map) - FOOTER.size
+        )
+        if magic != MAGIC or end_magic != MAGIC or version != VERSION:
+            raise SegmentError(f'{path} is not a message segment.')
+
+        self._index = [
+            INDEX_ENTRY.unpack_from(
+                self._map,
+                index_offset + block * INDEX_ENTRY.size
+            )
+            for block in range(count)
+        ]
+        self._last_ids = [entry[1] for entry in self._index]
+
+    def _read_block(self, offset, length):
+        return json.loads(zlib.decompress(self._map[offset:offset + length]))
+
+    def messages(self, after_id=None, from_seq=None, to_seq=None):
+        """Return the messages of the segment in id order, limited to ids
+        greater than `after_id` and to the inclusive sequence range."""
+
+        start = 0
+        if after_id is not None:
+            start = bisect.bisect_right(self._last_ids, after_id)
+
+        result = []
+        for entry in self._index[start:]:
+            _, _, low_seq, high_seq, offset, length = entry
+            if from_seq is not None and high_seq < from_seq:
+                continue
+            if to_seq is not None and low_seq > to_seq:
+                continue
+            for message in self._read_block(offset, length):
+                if after_id is not None and int(message['id']) <= after_id:
+                    continue
+                if from_seq is not None and message['seq'] < from_seq:
+                    continue
+                if to_seq is not None and message['seq'] > to_seq:
+                    continue
+                for field, default in MESSAGE_DEFAULTS.items():
+                    message.setdefault(field, copy(default))
+                result.append(message)
+        return result
+
+    def close(self):
+        self._map.close()
+
+
+class SegmentCache:
+    """Readers of the most recently used segment files.
+
+    A reader pushed out of the cache is closed, as soon as no read is
+    using it any more."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._readers = OrderedDict()
+        self._in_use = Counter()
+        self._retired = set()
+
+    @contextmanager
+    def __call__(self, path):
+        """Open a segment file, or reuse its open reader, for the
+        duration of the block."""
+
+        with self._lock:
+            reader = self._readers.pop(path, None) or SegmentReader(path)
+            self._readers[path] = reader
+            self._in_use[reader] += 1
+            while len(self._readers) > self.maxsize:
+                self._retire(self._readers.popitem(last=False)[1])
+        try:
+            yield reader
+        finally:
+            with self._lock:
+                self._in_use[reader] -= 1
+                if not self._in_use[reader]:
+                    del self._in_use[reader]
+                    if reader in self._retired:
+                        self._retired.remove(reader)
+                        reader.close()
+
+    def _retire(self, reader):
+        if self._in_use[reader]:
+            self._retired.add(reader)
+        else:
+            reader.close()
+
+    def cache_clear(self):
+        """Close every reader once it is no longer in use."""
+
+        with self._lock:
+            while self._readers:
+                self._retire(self._readers.popitem()[1])
+
+
+open_segment = SegmentCache(maxsize=64)
+
+
+def segment_path(segment):
+    """Return the absolute path of a segment's file."""
+
+    return os.path.join(settings.ARCHIVE_ROOT, segment.path)
+
+
+def last_segment(channel_id):
+    """Return the newest segment of a channel, or None."""
+
+    return ArchiveSegment.objects.using(
+        read_alias(shard_for_channel(channel_id))
+    ).filter(channel=channel_id).order_by('-first_id').first()
+
+
+def is_archived(channel_id, message_id):
+    """Return whether a message id falls in an archived segment of its
+    channel."""
+
+    return ArchiveSegment.objects.using(
+        read_alias(shard_for_channel(channel_id))
+    ).filter(
+        channel=channel_id,
+        first_id__lte=message_id,
+        last_id__gte=message_id
+    ).exists()
+
+
+def latest_messages(channel_id, count):
+    """Return the newest `count` messages of a channel's newest segment,
+    newest first."""
+
+    segment = last_segment(channel_id)
+    if segment is None:
+        return []
+    messages = read_messages(channel_id, from_seq=segment.first_seq)
+    messages.sort(key=lambda message: message['seq'], reverse=True)
+    return messages[:count]
+
+
+def read_messages(channel_id, after_id=None, from_seq=None, to_seq=None):
+    """Return the archived messages of a channel, oldest first, limited
+    like `SegmentReader.messages`."""
+
+    segments = ArchiveSegment.objects.using(
+        read_alias(shard_for_channel(channel_id))
+    ).filter(channel=channel_id).order_by('first_id')
+    if after_id is not None:
+        segments = segments.filter(last_id__gt=after_id)
+    if from_seq is not None:
+        segments = segments.filter(last_seq__gte=from_seq)
+    if to_seq is not None:
+        segments = segments.filter(first_seq__lte=to_seq)
+
+    messages = []
+    for segment in segments:
+        with open_segment(segment_path(segment)) as reader:
+            messages.extend(reader.messages(
+                after_id=after_id,
+                from_seq=from_seq,
+                to_seq=to_seq
+            ))
+    return messages
+
+
+def archive_channel(channel_id, before, segment_size=DEFAULT_SEGMENT_SIZE):
+    """Move the messages of a channel sent before the date `before` to
+    segment files and return how many were archived.
+
+    A segment's file is written before its messages are deleted, in the
+    transaction that records the segment, and removed again when that
+    transaction fails."""
+
+    from message.serializers import MessageSerializer
+
+    shard = shard_for_channel(channel_id)
+    queryset = Message.objects.for_channel(channel_id).filter(
+        sent_date__lt=before
+    ).order_by('id')
+
+    archived = 0
+    while True:
+        messages = list(queryset[:segment_size])
+        if not messages:
+            return archived
+
+        data = MessageSerializer(messages, many=True).data
+        seqs = [message.seq for message in messages]
+        first_id, last_id = messages[0].id, messages[-1].id
+        path = os.path.join(str(channel_id), f'{first_id}-{last_id}.seg')
+        absolute_path = os.path.join(settings.ARCHIVE_ROOT, path)
+        write_segment(absolute_path, list(data))
+
+        try:
+            with transaction.atomic(using=shard):
+                ArchiveSegment.objects.using(shard).create(
+                    channel_id=channel_id,
+                    path=path,
+                    first_id=first_id,
+                    last_id=last_id,
+                    first_seq=min(seqs),
+                    last_seq=max(seqs),
+                    message_count=len(messages),
+                    last_sent_date=max(
+                        message.sent_date for message in messages
+                    )
+                )
+                queryset.filter(
+                    id__gte=first_id,
+                    id__lte=last_id
+                ).delete()
+        except Exception:
+            os.remove(absolute_path)
+            raise
+        archived += len(messages)
+
+
+def delete_segments(segments, using):
+    """Delete segments, removing their files once the surrounding
+    transaction commits, and return how many were deleted."""
+
+    paths = [segment_path(segment) for segment in segments]
+    segments.delete()
+
+    def remove_files():
+        open_segment.cache_clear()
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                logger.warning('Archive segment %s was already gone.', path)
+
+    transaction.on_commit(remove_files, using=using)
+    return len(paths)
+
+
+def delete_channel_archive(channel_id):
+    """Delete every segment of a channel."""
+
+    shard = shard_for_channel(channel_id)
+    return delete_segments(
+        ArchiveSegment.objects.using(shard).filter(channel=channel_id),
+        shard
+    )
+
+
+def last_sent_date(segment):
+    """Return the date the last message of a segment was sent, read
+    from its file."""
+
+    with open_segment(segment_path(segment)) as reader:
+        return max(
+            date.fromisoformat(message['sent_date'])
+            for message in reader.messages()
+        )
+
+
+def delete_segments_sent_before(channel_id, before):
+    """Delete the segments of a channel holding only messages sent
+    before the date `before`.
+
+    Segments archived before their last sent date was recorded get it
+    from their file first."""
+
+    shard = shard_for_channel(channel_id)
+    segments = ArchiveSegment.objects.using(shard).filter(channel=channel_id)
+    for segment in segments.filter(last_sent_date__isnull=True):
+        segment.last_sent_date = last_sent_date(segment)
+        segment.save(using=shard, update_fields=['last_sent_date'])
+    return delete_segments(segments.filter(last_sent_date__lt=before), shard)
@@ -0,0 +1,100 @@
+"""
+Cached lists of the channels of every user.
+
+Listing a user's channels through the membership join gets slow for
+users in thousands of channels, so the ids of a user's channels are
+cached as a sorted list under a key that contains a per-user version
+counter. Changing a membership bumps the counter, which makes the next
+read rebuild the list; old lists are never read again and expire on
+their own.
+
+Saving or deleting a Membership bumps the counter through signals.
+Bulk operations skip signals and call `bump` themselves.
+
+Lists are rebuilt from the primary, since a list read from a lagging
+replica would be cached long after the replica caught up. A cached
+list can still be briefly stale, for example when the cache misses a
+bump, so it is only used to show a user their channels. Anything
+granting access to messages reads the memberships with
+`member_channel_ids` instead.
+"""
+
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router, transaction
+
+from core.request_cache import memoize
+
+
+def version_key(user_id):
+    return f'channel_list_version:{user_id}'
+
+
+def list_key(user_id, version):
+    return f'channel_list:{user_id}:{version}'
+
+
+def get_version(user_id):
+    """Return the version of a user's channel list.
+
+    A missing counter starts from the current time, so a counter
+    evicted from the cache never reuses the version of an old list."""
+
+    key = version_key(user_id)
+    cache.add(key, time.time_ns(), None)
+    return cache.get(key)
+
+
+def _incr(user_ids):
+    for user_id in user_ids:
+        try:
+            cache.incr(version_key(user_id))
+        except ValueError:
+            # No counter, so no list is cached for the user.
+            pass
+
+
+def bump(user_ids, using=None):
+    """Invalidate the channel lists of users.
+
+    The counters are bumped right away, so the current transaction
+    reads its own changes, and again once it commits, so a list cached
+    by another request in between is not kept."""
+
+    user_ids = set(user_ids)
+    if user_ids:
+        _incr(user_ids)
+        transaction.on_commit(partial(_incr, user_ids), using=using)
+
+
+def channel_ids(user_id):
+    """Return the ids of the channels a user is a member of, ascending,
+    excluding deleted channels."""
+
+    return memoize(('channel_ids', user_id), partial(_load, user_id))
+
+
+def member_channel_ids(user_id):
+    """Return the ids of a user's channels like `channel_ids`, read from
+    the primary database."""
+
+    from core.models import Membership
+
+    return list(Membership.objects.using(
+        router.db_for_write(Membership)
+    ).filter(
+        member=user_id,
+        channel__deleted_at__isnull=True
+    ).order_by('channel_id').values_list('channel_id', flat=True))
+
+
+def _load(user_id):
+    key = list_key(user_id, get_version(user_id))
+    ids = cache.get(key)
+    if ids is None:
+        ids = member_channel_ids(user_id)
+        cache.set(key, ids, settings.CHANNEL_LIST_TIMEOUT)
+    return ids
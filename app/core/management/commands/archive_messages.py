@@ -0,0 +1,52 @@
+"""
+Django command to move old messages to the archive.
+"""
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from core import archive
+from core.models import Channel
+
+
+class Command(BaseCommand):
+    """Django command to archive old messages."""
+
+    help = 'Move old messages into compressed archive segments.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.ARCHIVE_AFTER_DAYS,
+            help='Archive messages sent more than this many days ago.'
+        )
+        parser.add_argument(
+            '--segment-size',
+            type=int,
+            default=archive.DEFAULT_SEGMENT_SIZE,
+            help='Maximum number of messages in a segment file.'
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for commands."""
+
+        before = date.today() - timedelta(days=options['days'])
+        total = 0
+        channel_ids = Channel.objects.active().order_by('id').values_list(
+            'id',
+            flat=True
+        )
+        for channel_id in channel_ids.iterator():
+            archived = archive.archive_channel(
+                channel_id,
+                before,
+                segment_size=options['segment_size']
+            )
+            if archived:
+                self.stdout.write(
+                    f'Archived {archived} messages of channel {channel_id}.'
+                )
+            total += archived
+        self.stdout.write(self.style.SUCCESS(f'Archived {total} messages.'))
@@ -0,0 +1,70 @@
+"""
+Django command to maintain the monthly partitions of messages.
+"""
+from datetime import date
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.db import connections
+
+from core import partitions
+
+
+class Command(BaseCommand):
+    """Django command to create and drop message partitions."""
+
+    help = (
+        'Create the message partitions of the coming months and drop '
+        'the partitions past retention.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months-ahead',
+            type=int,
+            default=partitions.DEFAULT_MONTHS_AHEAD,
+            help='Number of months to create partitions for in advance.'
+        )
+        parser.add_argument(
+            '--retention-months',
+            type=int,
+            help=('Keep the current month and this many months before '
+                  'it, drop the partitions of older months.')
+        )
+        parser.add_argument(
+            '--database',
+            action='append',
+            help='Database to maintain, every message shard by default.'
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for commands."""
+
+        today = date.today()
+        for alias in options['database'] or settings.MESSAGE_SHARDS:
+            connection = connections[alias]
+            if not partitions.is_partitioned(connection):
+                self.stdout.write(
+                    self.style.WARNING(f'Messages on {alias} are not '
+                                       'partitioned, skipping.')
+                )
+                continue
+
+            created = partitions.create_partitions(
+                connection,
+                today,
+                partitions.add_months(today, options['months_ahead'])
+            )
+            for name in created:
+                self.stdout.write(f'Created {name} on {alias}.')
+
+            if options['retention_months'] is not None:
+                dropped = partitions.drop_partitions_before(
+                    connection,
+                    partitions.add_months(
+                        today,
+                        -options['retention_months']
+                    )
+                )
+                for name in dropped:
+                    self.stdout.write(f'Dropped {name} on {alias}.')
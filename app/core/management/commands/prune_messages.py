@@ -0,0 +1,115 @@
+"""
+Django command to delete messages past their channel's retention.
+"""
+import time
+from datetime import date, timedelta
+
+from django.core.management import BaseCommand
+
+from core import archive
+from core.models import Channel, Message
+
+
+class Command(BaseCommand):
+    """Django command to prune old messages.
+
+    Messages are deleted in batches ordered by id, each batch in its
+    own short transaction, with a pause between batches so replicas can
+    keep up. Only messages past retention are selected, so an
+    interrupted run is resumed by running the command again."""
+
+    help = 'Delete messages older than the retention of their channel.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of messages deleted per batch.'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0.1,
+            help='Seconds to pause between batches.'
+        )
+        parser.add_argument(
+            '--channel',
+            type=int,
+            action='append',
+            help='Only prune this channel.'
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for commands."""
+
+        channels = Channel.objects.active().filter(
+            retention_days__isnull=False
+        ).order_by('id')
+        if options['channel']:
+            channels = channels.filter(id__in=options['channel'])
+
+        total = 0
+        started = time.monotonic()
+        for channel_id, retention_days in channels.values_list(
+            'id',
+            'retention_days'
+        ):
+            before = date.today() - timedelta(days=retention_days)
+            total += self.prune_channel(channel_id, before, options)
+            self.prune_archive(channel_id, before)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {total} messages in {elapsed:.1f}s '
+            f'({total / max(elapsed, 1e-6):.0f} rows/s).'
+        ))
+
+    def prune_channel(self, channel_id, before, options):
+        """Delete the messages of a channel sent before a date and
+        return how many were deleted."""
+
+        queryset = Message.objects.for_channel(channel_id).filter(
+            sent_date__lt=before
+        )
+        deleted = 0
+        last_id = 0
+        started = time.monotonic()
+        while True:
+            ids = list(
+                queryset.filter(id__gt=last_id).order_by('id').values_list(
+                    'id',
+                    flat=True
+                )[:options['batch_size']]
+            )
+            if not ids:
+                break
+            count, _ = queryset.filter(id__in=ids).delete()
+            deleted += count
+            last_id = ids[-1]
+            if options['verbosity'] > 1:
+                self.stdout.write(
+                    f'Channel {channel_id}: deleted {deleted} messages '
+                    f'up to id {last_id}.'
+                )
+            if len(ids) < options['batch_size']:
+                break
+            time.sleep(options['sleep'])
+
+        if deleted:
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f'Channel {channel_id}: deleted {deleted} messages '
+                f'({deleted / max(elapsed, 1e-6):.0f} rows/s).'
+            )
+        return deleted
+
+    def prune_archive(self, channel_id, before):
+        """Delete the archive segments of a channel holding only
+        messages sent before a date."""
+
+        dropped = archive.delete_segments_sent_before(channel_id, before)
+        if dropped:
+            self.stdout.write(
+                f'Channel {channel_id}: dropped {dropped} archive segments.'
+            )
@@ -0,0 +1,64 @@
+"""
+Django command to purge deleted channels.
+"""
+import time
+
+from django.core.management import BaseCommand
+
+from core import purge
+
+
+class Command(BaseCommand):
+    """Django command to purge deleted channels."""
+
+    help = 'Delete the messages and memberships of deleted channels.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of rows deleted per statement.'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0.1,
+            help='Seconds to pause between batches.'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5.0,
+            help='Seconds to sleep when no channel is waiting.'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Purge the channels deleted so far and exit.'
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for commands."""
+
+        self.stdout.write('Purging deleted channels...')
+
+        while True:
+            deletion = purge.pending_deletions().first()
+            if deletion is None:
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+                continue
+
+            purge.purge_channel(
+                deletion,
+                batch_size=options['batch_size'],
+                sleep=options['sleep']
+            )
+            deletion.refresh_from_db()
+            self.stdout.write(
+                f'Purged channel {deletion.channel_id}: '
+                f'{deletion.messages_deleted} messages, '
+                f'{deletion.memberships_deleted} memberships.'
+            )
@@ -0,0 +1,58 @@
+"""
+Django command to deliver outbox events to their handlers.
+"""
+import time
+
+from django.core.management import BaseCommand
+
+from core import outbox
+
+
+class Command(BaseCommand):
+    """Django command to relay outbox events."""
+
+    help = 'Deliver stored outbox events to the registered handlers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Number of events claimed per transaction.'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1.0,
+            help='Seconds to sleep when there is nothing to deliver.'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Deliver the events that are due and exit.'
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for commands."""
+
+        outbox.autodiscover()
+        self.stdout.write('Relaying outbox events...')
+
+        databases = outbox.relay_databases()
+        while True:
+            busy = False
+            for using in databases:
+                delivered, failed = outbox.relay_batch(
+                    options['batch_size'],
+                    using=using
+                )
+                if delivered or failed:
+                    self.stdout.write(
+                        f'Delivered {delivered} events, {failed} failed.'
+                    )
+                if delivered + failed >= options['batch_size']:
+                    busy = True
+            if not busy:
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
@@ -0,0 +1,63 @@
+"""
+Middleware for the app.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.routers import reset_replicas, use_replicas
+
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def client_key(request):
+    """Return a key identifying the client of a request, or None.
+
+    Token clients are only authenticated inside the DRF view, so they
+    are identified by a hash of their Authorization header instead of
+    a user lookup."""
+
+    header = request.META.get('HTTP_AUTHORIZATION')
+    if header:
+        return hashlib.sha1(header.encode()).hexdigest()
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f'user:{user.pk}'
+    return None
+
+
+class ReplicaRoutingMiddleware:
+    """Let read-only requests read from replicas.
+
+    One healthy replica of every database is chosen per request, when
+    it is first read. A client that made a
+    successful write is pinned to the primary for REPLICA_STICKY_SECONDS,
+    so it reads its own writes even while the replicas lag behind. The
+    pin is kept in the shared cache, so it holds whichever process
+    serves the client's next request."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        key = client_key(request)
+        pin_key = f'primary_pin:{key}' if key else None
+
+        token = None
+        if request.method in SAFE_METHODS and not (
+            pin_key and cache.get(pin_key)
+        ):
+            token = use_replicas()
+        try:
+            response = self.get_response(request)
+        finally:
+            if token is not None:
+                reset_replicas(token)
+
+        if pin_key and request.method not in SAFE_METHODS \
+                and response.status_code < 400:
+            cache.set(pin_key, True, settings.REPLICA_STICKY_SECONDS)
+        return response
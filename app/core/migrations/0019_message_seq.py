@@ -0,0 +1,23 @@
+# Generated by Django 3.2.16 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_alter_membership_permissions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='channel',
+            name='last_message_seq',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='seq',
+            field=models.PositiveBigIntegerField(editable=False, null=True),
+        ),
+    ]
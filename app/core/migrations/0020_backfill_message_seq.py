@@ -0,0 +1,40 @@
+# Generated by Django 3.2.16 on 2026-10-19 09:12
+
+from django.db import migrations
+
+
+def backfill_message_seq(apps, schema_editor):
+    """Number existing messages of every channel in id order."""
+
+    Channel = apps.get_model('core', 'Channel')
+    Message = apps.get_model('core', 'Message')
+    db = schema_editor.connection.alias
+
+    for channel in Channel.objects.using(db).only('id').iterator():
+        messages = list(
+            Message.objects.using(db).filter(
+                channel_id=channel.id
+            ).only('id').order_by('id')
+        )
+        for seq, message in enumerate(messages, start=1):
+            message.seq = seq
+        Message.objects.using(db).bulk_update(
+            messages, ['seq'], batch_size=1000
+        )
+        Channel.objects.using(db).filter(pk=channel.id).update(
+            last_message_seq=len(messages)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_message_seq'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            backfill_message_seq,
+            migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 3.2.16 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_backfill_message_seq'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='message',
+            name='seq',
+            field=models.PositiveBigIntegerField(editable=False),
+        ),
+        migrations.AddConstraint(
+            model_name='message',
+            constraint=models.UniqueConstraint(fields=('channel', 'seq'), name='unique_message_channel_seq'),
+        ),
+    ]
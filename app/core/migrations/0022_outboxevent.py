@@ -0,0 +1,36 @@
+# Generated by Django 3.2.25 on 2026-10-19 05:25
+
+import django.core.serializers.json
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_message_seq_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(max_length=64)),
+                ('payload', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='membership',
+            name='permissions',
+            field=models.IntegerField(choices=[(1, 'Read'), (2, 'Write'), (3, 'Admin')], default=1),
+        ),
+        migrations.AddIndex(
+            model_name='outboxevent',
+            index=models.Index(fields=['available_at', 'id'], name='core_outbox_availab_afc649_idx'),
+        ),
+    ]
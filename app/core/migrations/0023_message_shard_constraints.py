@@ -0,0 +1,25 @@
+# Generated by Django 3.2.25 on 2026-10-19 05:39
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_outboxevent'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='message',
+            name='channel',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, to='core.channel'),
+        ),
+        migrations.AlterField(
+            model_name='message',
+            name='sender',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.PROTECT, to=settings.AUTH_USER_MODEL),
+        ),
+    ]
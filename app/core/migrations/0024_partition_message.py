@@ -0,0 +1,32 @@
+# Generated by Django 3.2.25 on 2026-10-19 06:20
+
+from datetime import date
+
+from django.db import migrations
+
+
+def partition_message(apps, schema_editor):
+    """Partition the message table by month on PostgreSQL."""
+
+    from core import partitions
+
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    if partitions.is_partitioned(connection):
+        return
+    partitions.partition_table(connection, date.today())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_message_shard_constraints'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            partition_message,
+            migrations.RunPython.noop
+        ),
+    ]
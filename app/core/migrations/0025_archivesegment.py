@@ -0,0 +1,32 @@
+# Generated by Django 3.2.25 on 2026-10-19 05:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0024_partition_message'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchiveSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=255)),
+                ('first_id', models.BigIntegerField()),
+                ('last_id', models.BigIntegerField()),
+                ('first_seq', models.PositiveBigIntegerField()),
+                ('last_seq', models.PositiveBigIntegerField()),
+                ('message_count', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('channel', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='archive_segments', to='core.channel')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivesegment',
+            index=models.Index(fields=['channel', 'first_id'], name='core_archiv_channel_69a555_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-19 05:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0025_archivesegment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='channel',
+            name='retention_days',
+            field=models.PositiveIntegerField(blank=True, help_text='Delete messages older than this. Empty keeps them.', null=True),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 3.2.25 on 2026-10-19 05:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0026_channel_retention_days'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChannelDeletion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('channel_id', models.BigIntegerField(unique=True)),
+                ('requested_at', models.DateTimeField(auto_now_add=True)),
+                ('messages_deleted', models.PositiveBigIntegerField(default=0)),
+                ('memberships_deleted', models.PositiveIntegerField(default=0)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='channel',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 3.2.25 on 2026-10-19 05:53
+
+from django.db import migrations
+from django.db.models import Count
+
+
+def dedupe_memberships(apps, schema_editor):
+    """Keep one membership, the one with the most permissions, of every
+    member of a channel."""
+
+    Membership = apps.get_model('core', 'Membership')
+    db = schema_editor.connection.alias
+
+    duplicates = Membership.objects.using(db).values(
+        'channel_id',
+        'member_id'
+    ).annotate(count=Count('id')).filter(count__gt=1)
+
+    for duplicate in duplicates.iterator():
+        ids = list(
+            Membership.objects.using(db).filter(
+                channel_id=duplicate['channel_id'],
+                member_id=duplicate['member_id']
+            ).order_by('-permissions', 'id').values_list('id', flat=True)
+        )
+        Membership.objects.using(db).filter(id__in=ids[1:]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0027_channel_deletion'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            dedupe_memberships,
+            migrations.RunPython.noop
+        ),
+    ]
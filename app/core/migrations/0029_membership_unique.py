@@ -0,0 +1,17 @@
+# Generated by Django 3.2.25 on 2026-10-19 05:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0028_dedupe_memberships'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='membership',
+            constraint=models.UniqueConstraint(fields=('channel', 'member'), name='unique_membership_channel_member'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.25 on 2026-10-19 05:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0029_membership_unique'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='membership',
+            index=models.Index(fields=['channel', '-permissions', 'member'], name='membership_channel_perm_idx'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 3.2.25 on 2026-10-19 09:40
+
+import logging
+
+from django.db import DatabaseError, migrations, transaction
+
+
+logger = logging.getLogger(__name__)
+
+INDEXES = {
+    'channel_name_trgm_idx': 'name',
+    'channel_description_trgm_idx': 'description',
+}
+
+
+def create_trigram_indexes(apps, schema_editor):
+    """Index channel names and descriptions by trigrams on PostgreSQL.
+
+    Creating the extension needs extra privileges; without it the
+    directory search falls back to an in-process index."""
+
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    try:
+        with transaction.atomic(using=connection.alias):
+            schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    except DatabaseError:
+        logger.warning('pg_trgm is not available, skipping its indexes.')
+        return
+    for name, column in INDEXES.items():
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON core_channel '
+            f'USING gin ({column} gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0030_membership_channel_perm_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            create_trigram_indexes,
+            drop_trigram_indexes
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 3.2.25 on 2026-10-19 10:25
+
+from django.db import migrations
+
+
+INDEXES = {
+    'user_username_prefix_idx': 'username',
+    'user_name_prefix_idx': 'name',
+}
+
+
+def create_prefix_indexes(apps, schema_editor):
+    """Index usernames and names for case-insensitive prefix search on
+    PostgreSQL.
+
+    istartswith compiles to UPPER(column::text) LIKE UPPER(%s), which
+    can only use an index on that expression with a pattern operator
+    class."""
+
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, column in INDEXES.items():
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON core_user '
+            f'(UPPER({column}::text) text_pattern_ops)'
+        )
+
+
+def drop_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0031_channel_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            create_prefix_indexes,
+            drop_prefix_indexes
+        ),
+    ]
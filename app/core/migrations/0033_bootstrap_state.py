@@ -0,0 +1,23 @@
+# Generated by Django 3.2.25 on 2026-10-19 10:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0032_user_prefix_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='channel',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='membership',
+            name='last_read_seq',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
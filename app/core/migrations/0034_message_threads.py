@@ -0,0 +1,38 @@
+# Generated by Django 3.2.25 on 2026-10-19 11:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0033_bootstrap_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='last_reply_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='parent',
+            field=models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='replies', to='core.message'),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='reply_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='thread_root',
+            field=models.ForeignKey(blank=True, db_constraint=False, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='core.message'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(condition=models.Q(('thread_root__isnull', False)), fields=['thread_root', 'id'], name='message_thread_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 3.2.25 on 2026-10-19 12:15
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0034_message_threads'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='reaction_counts',
+            field=models.JSONField(default=dict, editable=False),
+        ),
+        migrations.CreateModel(
+            name='Reaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('emoji', models.CharField(max_length=32)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('channel', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='core.channel')),
+                ('message', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='reactions', to='core.message')),
+                ('user', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='reaction',
+            constraint=models.UniqueConstraint(fields=('message', 'user', 'emoji'), name='unique_reaction_message_user_emoji'),
+        ),
+    ]
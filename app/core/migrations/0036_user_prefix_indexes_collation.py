@@ -0,0 +1,48 @@
+# Generated by Django 3.2.25 on 2026-10-19 18:40
+
+from django.db import migrations
+
+
+INDEXES = {
+    'user_username_prefix_idx': 'username',
+    'user_name_prefix_idx': 'name',
+}
+
+
+def create_indexes(apps, schema_editor, collation):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, column in INDEXES.items():
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+        schema_editor.execute(
+            f'CREATE INDEX {name} ON core_user '
+            f'((UPPER({column}::text)) {collation})'
+        )
+
+
+def collate_prefix_indexes(apps, schema_editor):
+    """Index the upper-cased columns in the "C" collation.
+
+    The search filters and orders by UPPER(column) COLLATE "C". A btree
+    index in that collation serves LIKE prefix matches as well as the
+    ORDER BY, which the text_pattern_ops indexes could not."""
+
+    create_indexes(apps, schema_editor, 'COLLATE "C"')
+
+
+def restore_pattern_indexes(apps, schema_editor):
+    create_indexes(apps, schema_editor, 'text_pattern_ops')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0035_reactions'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            collate_prefix_indexes,
+            restore_pattern_indexes
+        ),
+    ]
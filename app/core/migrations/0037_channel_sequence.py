@@ -0,0 +1,21 @@
+# Generated by Django 3.2.25 on 2026-10-19 19:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0036_user_prefix_indexes_collation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChannelSequence',
+            fields=[
+                ('channel', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='+', serialize=False, to='core.channel')),
+                ('last_message_seq', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-19 19:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0037_channel_sequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivesegment',
+            name='last_sent_date',
+            field=models.DateField(null=True),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.2.25 on 2026-10-19 19:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0038_archivesegment_last_sent_date'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reaction',
+            name='channel',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='core.channel'),
+        ),
+    ]
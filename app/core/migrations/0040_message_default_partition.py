@@ -0,0 +1,27 @@
+# Generated by Django 3.2.25 on 2026-10-19 19:40
+
+from django.db import migrations
+
+
+def add_default_partition(apps, schema_editor):
+    """Give a partitioned message table its DEFAULT partition."""
+
+    from core import partitions
+
+    connection = schema_editor.connection
+    if partitions.is_partitioned(connection):
+        partitions.create_default_partition(connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0039_reaction_channel_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            add_default_partition,
+            migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 3.2.25 on 2026-10-19 19:50
+
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_last_read_seq(apps, schema_editor):
+    """Mark the messages sent before read markers existed as read, so
+    existing members do not find their channels' whole history
+    unread."""
+
+    Channel = apps.get_model('core', 'Channel')
+    Membership = apps.get_model('core', 'Membership')
+    db = schema_editor.connection.alias
+
+    Membership.objects.using(db).filter(last_read_seq=0).update(
+        last_read_seq=Subquery(
+            Channel.objects.using(db).filter(
+                pk=OuterRef('channel_id')
+            ).values('last_message_seq')[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0040_message_default_partition'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            backfill_last_read_seq,
+            migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 3.2.25 on 2026-10-19 20:00
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_members(apps, schema_editor):
+    """Count the members of every channel."""
+
+    Channel = apps.get_model('core', 'Channel')
+    Membership = apps.get_model('core', 'Membership')
+    db = schema_editor.connection.alias
+
+    Channel.objects.using(db).update(member_count=Coalesce(
+        Subquery(
+            Membership.objects.using(db).filter(
+                channel_id=OuterRef('pk')
+            ).values('channel_id').annotate(
+                count=Count('id')
+            ).values('count')[:1]
+        ),
+        0
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0041_backfill_last_read_seq'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='channel',
+            name='member_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(
+            count_members,
+            migrations.RunPython.noop
+        ),
+    ]
@@ -2,11 +2,28 @@
 Database models.
 """
 
+import json
+from collections import Counter
+from datetime import timedelta
+from functools import partial
+
+from django.utils import timezone
 from django.utils.translation import gettext as _
 
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from django.db import (
+    connections,
+    models,
+    router,
+    transaction,
+)
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 
-from django.db import models
+from core import channel_lists, snowflake
+from core.sharding import shard_for_channel
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
@@ -60,6 +77,168 @@ class User(AbstractBaseUser, PermissionsMixin):
     REQUIRED_FIELDS = ['email']
 
 
+class ChannelManager(models.Manager):
+    """Manager for channels."""
+
+    def active(self):
+        """Return the channels that are not deleted."""
+
+        return self.filter(deleted_at__isnull=True)
+
+    def bulk_provision(self, channels, batch_size=500):
+        """Create unsaved channels and the admin memberships of their
+        creators with a few queries per batch instead of several per
+        channel, and return the channels."""
+
+        from channel import directory
+
+        channels = list(channels)
+        for channel in channels:
+            channel.member_count = 1
+        with transaction.atomic(using=self.db):
+            self.bulk_create(channels, batch_size=batch_size)
+
+            # Databases that cannot return the inserted ids.
+            missing = [channel for channel in channels if channel.pk is None]
+            for start in range(0, len(missing), batch_size):
+                batch = missing[start:start + batch_size]
+                ids = dict(self.filter(
+                    name__in=[channel.name for channel in batch]
+                ).values_list('name', 'id'))
+                for channel in batch:
+                    channel.pk = ids[channel.name]
+
+            Membership.objects.bulk_create([
+                Membership(
+                    inviter_id=channel.creator_id,
+                    member_id=channel.creator_id,
+                    channel_id=channel.pk,
+                    permissions=Membership.ADMIN,
+                    last_read_seq=channel.last_message_seq
+                )
+                for channel in channels
+            ], batch_size=batch_size)
+            channel_lists.bump(
+                [channel.creator_id for channel in channels],
+                using=self.db
+            )
+            directory.invalidate(
+                [channel.pk for channel in channels],
+                using=self.db
+            )
+        return channels
+
+    def recount_members(self, channel_ids):
+        """Set the member counts of channels from their memberships,
+        after bulk operations that skip the membership signals."""
+
+        self.filter(pk__in=channel_ids).update(member_count=Coalesce(
+            Subquery(
+                Membership.objects.filter(
+                    channel=OuterRef('pk')
+                ).values('channel').annotate(
+                    count=Count('id')
+                ).values('count')[:1]
+            ),
+            0
+        ))
+
+    def allocate_seq(self, channel_id, count=1, using=None):
+        """Reserve `count` message sequence numbers in a channel
+        and return the last one reserved.
+
+        The counter lives on the shard of the channel's messages, or on
+        `using`, and is bumped in the transaction open there: on the
+        channel row when that is the directory database, in the
+        channel's ChannelSequence row otherwise. The row stays locked
+        until the messages are inserted and committed, so concurrent
+        writers to the same channel are serialized, their numbers
+        become visible in order and a rolled back insert gives its
+        numbers back. A ChannelSequence passes the last number on to
+        the channel row once the shard commits."""
+
+        using = using or shard_for_channel(channel_id)
+        directory = router.db_for_write(self.model)
+        now = timezone.now()
+
+        if using == directory:
+            last = bump_seq(
+                using,
+                self.model,
+                channel_id,
+                count,
+                last_message_at=now
+            )
+            if last is None:
+                raise self.model.DoesNotExist
+            return last
+
+        last = bump_seq(using, ChannelSequence, channel_id, count)
+        if last is None:
+            # The first message on the shard carries on from the number
+            # the channel row got before the shards were split.
+            start = self.using(directory).filter(
+                pk=channel_id
+            ).values_list('last_message_seq', flat=True).first()
+            if start is None:
+                raise self.model.DoesNotExist
+            ChannelSequence.objects.using(using).bulk_create(
+                [ChannelSequence(
+                    channel_id=channel_id,
+                    last_message_seq=start
+                )],
+                ignore_conflicts=True
+            )
+            last = bump_seq(using, ChannelSequence, channel_id, count)
+        transaction.on_commit(
+            partial(self.record_seq, channel_id, last, now),
+            using=using
+        )
+        return last
+
+    def record_seq(self, channel_id, seq, at):
+        """Copy a committed sequence number of a channel allocated on its
+        shard to the channel row."""
+
+        self.filter(pk=channel_id, last_message_seq__lt=seq).update(
+            last_message_seq=seq,
+            last_message_at=at
+        )
+
+
+def bump_seq(using, model, pk, count, **values):
+    """Add `count` to the last_message_seq of a row and set `values` on
+    it, and return the new last_message_seq, or None when there is no
+    such row."""
+
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        ops = connection.ops
+        column = ops.quote_name('last_message_seq')
+        assignments = ''.join(
+            f', {ops.quote_name(name)} = %s' for name in values
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {ops.quote_name(model._meta.db_table)} '
+                f'SET {column} = {column} + %s{assignments} '
+                f'WHERE {ops.quote_name(model._meta.pk.column)} = %s '
+                f'RETURNING {column}',
+                [count, *values.values(), pk]
+            )
+            row = cursor.fetchone()
+        return row[0] if row is not None else None
+
+    queryset = model._default_manager.using(using).filter(pk=pk)
+    updated = queryset.update(
+        last_message_seq=F('last_message_seq') + count,
+        **values
+    )
+    if not updated:
+        return None
+    return queryset.values_list('last_message_seq', flat=True).get()
+
+
 class Channel(models.Model):
     """Channel object."""
 
@@ -76,6 +255,21 @@ class Channel(models.Model):
         through='Membership',
         through_fields=('channel', 'member')
     )
+    last_message_seq = models.PositiveBigIntegerField(default=0)
+    last_message_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False
+    )
+    retention_days = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text=_('Delete messages older than this. Empty keeps them.')
+    )
+    member_count = models.PositiveIntegerField(default=0, editable=False)
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = ChannelManager()
 
     def __str__(self):
         return str(self.name)
@@ -84,32 +278,511 @@ class Channel(models.Model):
         """Override save method to automatically add
         creator as member of channel at create"""
 
-        super(Channel, self).save(*args, **kwargs)
+        if not self._state.adding:
+            return super(Channel, self).save(*args, **kwargs)
 
-        if not self.members.all():
+        with transaction.atomic(using=kwargs.get('using')):
+            super(Channel, self).save(*args, **kwargs)
             Membership.objects.create(
-                inviter=self.creator,
-                member=self.creator,
+                inviter_id=self.creator_id,
+                member_id=self.creator_id,
                 channel=self,
-                permissions=3
+                permissions=Membership.ADMIN,
+                last_read_seq=self.last_message_seq
             )
+            # Counted in the database by the membership signal.
+            self.member_count = 1
+
+    def mark_deleted(self):
+        """Hide the channel and queue it for the purge_channels command,
+        which deletes its messages and memberships in batches."""
+
+        with transaction.atomic():
+            self.deleted_at = timezone.now()
+            self.save(update_fields=['deleted_at'])
+            ChannelDeletion.objects.get_or_create(channel_id=self.pk)
+            channel_lists.bump(Membership.objects.filter(
+                channel=self
+            ).values_list('member_id', flat=True))
+
+    def delete(self, *args, **kwargs):
+        """Delete the channel's messages and archive from their shard
+        as well."""
+
+        from core import archive
+
+        shard = shard_for_channel(self.pk)
+        with transaction.atomic(using=shard):
+            Message.objects.for_channel(self.pk).delete()
+            ChannelSequence.objects.using(shard).filter(
+                channel=self.pk
+            ).delete()
+            archive.delete_channel_archive(self.pk)
+            return super(Channel, self).delete(*args, **kwargs)
+
+
+class ChannelSequence(models.Model):
+    """Message sequence counter of a channel whose messages are on a
+    shard other than the directory database.
+
+    It lives on that shard, so numbers are allocated in the transaction
+    inserting the messages."""
+
+    channel = models.OneToOneField(
+        Channel,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_constraint=False,
+        related_name='+'
+    )
+    last_message_seq = models.PositiveBigIntegerField(default=0)
+
+
+def sent_date_bounds(message_id):
+    """Return the range of days a message with a Snowflake id can have
+    been sent on, or None for other ids.
+
+    Filtering on it lets PostgreSQL skip the partitions of other months.
+    A day of margin covers the difference between the UTC time in the
+    id and the local date in `sent_date`. Ids up to
+    SNOWFLAKE_CUTOVER_ID come from the database sequence, however large
+    they are."""
+
+    if not settings.SNOWFLAKE_IDS or \
+            message_id <= settings.SNOWFLAKE_CUTOVER_ID or \
+            message_id >> snowflake.TIMESTAMP_SHIFT == 0:
+        return None
+    sent_date = snowflake.to_datetime(message_id).date()
+    return sent_date - timedelta(days=1), sent_date + timedelta(days=1)
+
+
+SEQ_SLACK = 20
+
+
+def mark_sent_read(channel_id, sender_id, seq):
+    """Move the sender's read marker of a channel up to a message they
+    sent, so their own messages are never unread."""
+
+    if sender_id is not None:
+        Membership.objects.filter(
+            channel=channel_id,
+            member=sender_id,
+            last_read_seq__lt=seq
+        ).update(last_read_seq=seq)
+
+
+class MessageQuerySet(models.QuerySet):
+    """Queryset of messages."""
+
+    def on_shard(self, alias):
+        """Return the messages of a shard. Reads go to the replica of
+        the shard chosen for the current context, writes to the shard."""
+
+        queryset = self._chain()
+        queryset._hints = {**self._hints, 'shard': alias}
+        return queryset
+
+    def for_channel(self, channel_id):
+        """Return the messages of a channel, on its shard."""
+
+        return self.on_shard(shard_for_channel(channel_id)).filter(
+            channel=channel_id
+        )
+
+    def newer_than(self, message_id):
+        """Return the messages with an id greater than `message_id`."""
+
+        queryset = self.filter(id__gt=message_id)
+        bounds = sent_date_bounds(message_id)
+        if bounds is not None:
+            queryset = queryset.filter(sent_date__gte=bounds[0])
+        return queryset
+
+    def with_id(self, message_id):
+        """Return the message with an id, as a queryset."""
+
+        queryset = self.filter(pk=message_id)
+        bounds = sent_date_bounds(int(message_id))
+        if bounds is not None:
+            queryset = queryset.filter(sent_date__range=bounds)
+        return queryset
+
+    def latest_per_channel(self, limits):
+        """Return the newest messages of several channels on one shard,
+        newest first, with a query numbering them per channel.
+
+        `limits` maps channel ids to their last sequence number and the
+        number of messages wanted. Only the last `count + SEQ_SLACK`
+        sequence numbers of a channel are read, so every channel costs
+        an index range scan, leaving room for the gaps left by deleted
+        messages and failed inserts. A channel with wider gaps gets too
+        few messages that way and is read again with a query of its
+        own, without the bound."""
+
+        if not limits:
+            return []
+        connection = connections[self.db]
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        columns = ', '.join(
+            f'm.{connection.ops.quote_name(field.column)}'
+            for field in self.model._meta.concrete_fields
+        )
+        values = ', '.join(['(%s, %s, %s)'] * len(limits))
+        params = []
+        for channel_id, (last_seq, count) in limits.items():
+            params.extend([channel_id, last_seq - count - SEQ_SLACK, count])
+        messages = list(self.raw(
+            f'WITH bounds (channel_id, after_seq, row_limit) AS '
+            f'(VALUES {values}) '
+            f'SELECT * FROM ('
+            f'SELECT {columns}, b.row_limit, ROW_NUMBER() OVER ('
+            f'PARTITION BY m.channel_id ORDER BY m.seq DESC) AS row_number '
+            f'FROM {table} m JOIN bounds b '
+            f'ON m.channel_id = b.channel_id AND m.seq > b.after_seq'
+            f') ranked WHERE row_number <= row_limit '
+            f'ORDER BY channel_id, seq DESC',
+            params
+        ))
+
+        found = Counter(message.channel_id for message in messages)
+        short = {
+            channel_id for channel_id, (last_seq, count) in limits.items()
+            if found[channel_id] < count and last_seq - count - SEQ_SLACK > 0
+        }
+        if short:
+            messages = [m for m in messages if m.channel_id not in short]
+            for channel_id in short:
+                messages.extend(self.filter(
+                    channel=channel_id
+                ).order_by('-seq')[:limits[channel_id][1]])
+            messages.sort(key=lambda m: (m.channel_id, -m.seq))
+        return messages
+
+    def create(self, **kwargs):
+        """Create a message on the shard of its channel, unless a
+        database was chosen explicitly."""
+
+        obj = self.model(**kwargs)
+        obj.save(force_insert=True, using=self._db)
+        return obj
+
+
+class MessageManager(models.Manager.from_queryset(MessageQuerySet)):
+    """Manager for messages."""
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """Allocate ids and per-channel sequence numbers before
+        inserting, each message on the shard of its channel."""
+
+        objs = list(objs)
+        shards = {}
+        for obj in objs:
+            obj.assign_id()
+            alias = self._db or shard_for_channel(obj.channel_id)
+            shards.setdefault(alias, []).append(obj)
+
+        for alias, shard_objs in shards.items():
+            pending = {}
+            for obj in shard_objs:
+                if obj.seq is None:
+                    pending.setdefault(obj.channel_id, []).append(obj)
+
+            with transaction.atomic(using=alias, savepoint=False):
+                for channel_id, channel_objs in sorted(pending.items()):
+                    last = Channel.objects.allocate_seq(
+                        channel_id,
+                        count=len(channel_objs),
+                        using=alias
+                    )
+                    first = last - len(channel_objs) + 1
+                    for offset, obj in enumerate(channel_objs):
+                        obj.seq = first + offset
+                self.get_queryset().using(alias).bulk_create(
+                    shard_objs,
+                    *args,
+                    **kwargs
+                )
+                sent = {}
+                for obj in shard_objs:
+                    key = (obj.channel_id, obj.sender_id)
+                    sent[key] = max(sent.get(key, 0), obj.seq)
+                for (channel_id, sender_id), seq in sent.items():
+                    mark_sent_read(channel_id, sender_id, seq)
+        return objs
 
 
 class Message(models.Model):
-    """Message object."""
+    """Message object.
+
+    Messages live on the shard of their channel, away from the users
+    and channels they reference, so their foreign keys are not enforced
+    by the database."""
 
     sender = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.PROTECT,
-        null=True
+        null=True,
+        db_constraint=False
+    )
+    channel = models.ForeignKey(
+        Channel,
+        on_delete=models.CASCADE,
+        db_constraint=False
     )
-    channel = models.ForeignKey(Channel, on_delete=models.CASCADE)
     text = models.TextField(max_length=1024)
     sent_date = models.DateField(auto_now_add=True)
+    seq = models.PositiveBigIntegerField(editable=False)
+    parent = models.ForeignKey(
+        'self',
+        on_delete=models.DO_NOTHING,
+        null=True,
+        blank=True,
+        db_constraint=False,
+        db_index=False,
+        related_name='replies'
+    )
+    thread_root = models.ForeignKey(
+        'self',
+        on_delete=models.DO_NOTHING,
+        null=True,
+        blank=True,
+        editable=False,
+        db_constraint=False,
+        db_index=False,
+        related_name='+'
+    )
+    reply_count = models.PositiveIntegerField(default=0, editable=False)
+    reaction_counts = models.JSONField(default=dict, editable=False)
+    last_reply_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False
+    )
+
+    objects = MessageManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['channel', 'seq'],
+                name='unique_message_channel_seq'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['thread_root', 'id'],
+                name='message_thread_idx',
+                condition=models.Q(thread_root__isnull=False)
+            ),
+        ]
 
     def __str__(self):
         return str(self.text)
 
+    def assign_id(self):
+        """Give the message a Snowflake id if it has none yet."""
+
+        if self.id is None and settings.SNOWFLAKE_IDS:
+            self.id = snowflake.next_id()
+
+    def save(self, *args, **kwargs):
+        """Override save method to give new messages an id and the
+        next sequence number of their channel.
+
+        A new reply joins the thread of its parent, whose root counts
+        it in the same transaction, and the sender's read marker moves
+        up to a new message."""
+
+        adding = self._state.adding
+        if adding and self.id is None:
+            self.assign_id()
+            if self.id is not None:
+                # The row cannot exist yet, skip Django's UPDATE attempt.
+                kwargs['force_insert'] = True
+
+        if adding and self.parent_id is not None:
+            self.thread_root_id = self.parent.thread_root_id or self.parent_id
+
+        if adding and (self.seq is None or self.thread_root_id is not None):
+            using = kwargs.get('using') or router.db_for_write(
+                Message,
+                instance=self
+            )
+            with transaction.atomic(using=using, savepoint=False):
+                if self.seq is None:
+                    self.seq = Channel.objects.allocate_seq(
+                        self.channel_id,
+                        using=using
+                    )
+                super(Message, self).save(*args, **kwargs)
+                mark_sent_read(self.channel_id, self.sender_id, self.seq)
+                if self.thread_root_id is not None:
+                    Message.objects.using(using).with_id(
+                        self.thread_root_id
+                    ).update(
+                        reply_count=F('reply_count') + 1,
+                        last_reply_at=timezone.now()
+                    )
+            return
+
+        super(Message, self).save(*args, **kwargs)
+
+
+class ReactionManager(models.Manager):
+    """Manager for reactions."""
+
+    def _update_counts(self, connection, message, emoji, delta):
+        """Add `delta` to the count of an emoji in the message's
+        reaction_counts, dropping it at zero, and return the counts."""
+
+        table = connection.ops.quote_name(Message._meta.db_table)
+        where = 'id = %s'
+        params = [message.pk]
+        bounds = sent_date_bounds(message.pk)
+        if bounds is not None:
+            where += ' AND sent_date BETWEEN %s AND %s'
+            params.extend(bounds)
+
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(
+                    f'UPDATE {table} SET reaction_counts = CASE '
+                    'WHEN COALESCE((reaction_counts->>%s)::int, 0) + %s > 0 '
+                    'THEN jsonb_set(reaction_counts, ARRAY[%s], to_jsonb('
+                    'COALESCE((reaction_counts->>%s)::int, 0) + %s)) '
+                    'ELSE reaction_counts - %s END '
+                    f'WHERE {where} RETURNING reaction_counts',
+                    [emoji, delta, emoji, emoji, delta, emoji] + params
+                )
+                row = cursor.fetchone()
+                if row is None:
+                    raise Message.DoesNotExist
+                counts = row[0]
+            else:
+                path = f'$."{emoji}"'
+                cursor.execute(
+                    f'UPDATE {table} SET reaction_counts = CASE '
+                    'WHEN COALESCE(json_extract(reaction_counts, %s), 0) '
+                    '+ %s > 0 '
+                    'THEN json_set(reaction_counts, %s, COALESCE('
+                    'json_extract(reaction_counts, %s), 0) + %s) '
+                    'ELSE json_remove(reaction_counts, %s) END '
+                    f'WHERE {where}',
+                    [path, delta, path, path, delta, path] + params
+                )
+                counts = Message.objects.using(connection.alias).filter(
+                    pk=message.pk
+                ).values_list('reaction_counts', flat=True).get()
+        if isinstance(counts, str):
+            counts = json.loads(counts)
+        return counts
+
+    def toggle(self, message, user_id, emoji):
+        """Add the user's reaction to a message, or remove it when it
+        exists, and return whether it was added and the new counts.
+
+        The reaction is inserted with ON CONFLICT DO NOTHING, and only
+        deleted when that inserted nothing; the message's counts are
+        then updated in place by a single UPDATE, unless a concurrent
+        toggle already removed the reaction. Raises Message.DoesNotExist
+        when the message is gone."""
+
+        using = shard_for_channel(message.channel_id)
+        connection = connections[using]
+        ops = connection.ops
+        columns = [
+            'message_id',
+            'channel_id',
+            'user_id',
+            'emoji',
+            'created_at',
+        ]
+        with transaction.atomic(using=using):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'INSERT INTO {table} ({columns}) '
+                    'VALUES (%s, %s, %s, %s, %s) '
+                    'ON CONFLICT (message_id, user_id, emoji) '
+                    'DO NOTHING'.format(
+                        table=ops.quote_name(self.model._meta.db_table),
+                        columns=', '.join(map(ops.quote_name, columns))
+                    ),
+                    [
+                        message.pk,
+                        message.channel_id,
+                        user_id,
+                        emoji,
+                        timezone.now()
+                    ]
+                )
+                added = cursor.rowcount == 1
+            delta = 1
+            if not added:
+                delta = -self.using(using).filter(
+                    message=message.pk,
+                    user=user_id,
+                    emoji=emoji
+                ).delete()[0]
+            if delta:
+                counts = self._update_counts(
+                    connection,
+                    message,
+                    emoji,
+                    delta
+                )
+            else:
+                counts = Message.objects.using(using).with_id(
+                    message.pk
+                ).values_list('reaction_counts', flat=True).get()
+        message.reaction_counts = counts
+        return added, counts
+
+
+class Reaction(models.Model):
+    """Emoji reaction of a user to a message.
+
+    Reactions are stored on the shard of their message's channel, and
+    every message keeps the number of reactions per emoji in
+    `reaction_counts`, so messages are listed without reading them.
+    The channel is indexed for purging the reactions of a deleted
+    channel."""
+
+    message = models.ForeignKey(
+        Message,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        db_index=False,
+        related_name='reactions'
+    )
+    channel = models.ForeignKey(
+        Channel,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+'
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        related_name='+'
+    )
+    emoji = models.CharField(max_length=32)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = ReactionManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['message', 'user', 'emoji'],
+                name='unique_reaction_message_user_emoji'
+            ),
+        ]
+
+    def __str__(self):
+        return str(self.emoji)
+
 
 class Membership(models.Model):
     """Membership object."""
@@ -142,3 +815,87 @@ class Membership(models.Model):
         choices=PERMISSIONS_CHOICES
     )
     join_date = models.DateField(auto_now_add=True)
+    last_read_seq = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['channel', 'member'],
+                name='unique_membership_channel_member'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['channel', '-permissions', 'member'],
+                name='membership_channel_perm_idx'
+            ),
+        ]
+
+
+class OutboxEvent(models.Model):
+    """Event waiting to be relayed to its handlers.
+
+    Events are written in the same transaction as the change they
+    describe and delivered at least once by the relay_outbox command."""
+
+    event_type = models.CharField(max_length=64)
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    available_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['available_at', 'id']),
+        ]
+
+    def __str__(self):
+        return f'{self.event_type} #{self.id}'
+
+
+class ArchiveSegment(models.Model):
+    """Compressed file of archived messages of a channel.
+
+    Segments live on the shard of their channel and point to a file
+    under ARCHIVE_ROOT holding the messages from first_id to last_id,
+    the last of them sent on last_sent_date."""
+
+    channel = models.ForeignKey(
+        Channel,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        related_name='archive_segments'
+    )
+    path = models.CharField(max_length=255)
+    first_id = models.BigIntegerField()
+    last_id = models.BigIntegerField()
+    first_seq = models.PositiveBigIntegerField()
+    last_seq = models.PositiveBigIntegerField()
+    message_count = models.PositiveIntegerField()
+    last_sent_date = models.DateField(null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['channel', 'first_id']),
+        ]
+
+    def __str__(self):
+        return self.path
+
+
+class ChannelDeletion(models.Model):
+    """Progress of purging a deleted channel.
+
+    The channel row is deleted last, so this keeps its id without a
+    foreign key."""
+
+    channel_id = models.BigIntegerField(unique=True)
+    requested_at = models.DateTimeField(auto_now_add=True)
+    messages_deleted = models.PositiveBigIntegerField(default=0)
+    memberships_deleted = models.PositiveIntegerField(default=0)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'Deletion of channel #{self.channel_id}'
@@ -0,0 +1,116 @@
+"""
+Transactional outbox for side effects of message changes.
+
+Views call `enqueue` inside the transaction that changes a message, so
+the event is stored if and only if the change is committed. The
+relay_outbox command later hands stored events to the handlers
+registered for their type. Delivery is at least once: handlers must be
+idempotent.
+
+Events are stored on the database of the message they belong to, which
+is the message's shard; the relay goes over every database.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from core.models import OutboxEvent
+
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRY_DELAY = 300
+
+_handlers = defaultdict(list)
+
+
+def register(event_type):
+    """Decorator registering a handler for an event type.
+
+    Handlers are called with the event payload. Apps put their handlers
+    in an `outbox_handlers` module, which the relay imports on start."""
+
+    def decorator(handler):
+        _handlers[event_type].append(handler)
+        return handler
+
+    return decorator
+
+
+def unregister(event_type, handler):
+    """Remove a handler registered for an event type."""
+
+    _handlers[event_type].remove(handler)
+
+
+def autodiscover():
+    """Import the `outbox_handlers` module of every installed app."""
+
+    autodiscover_modules('outbox_handlers')
+
+
+def enqueue(event_type, payload, using=None):
+    """Store an event in the current transaction."""
+
+    return OutboxEvent.objects.using(using).create(
+        event_type=event_type,
+        payload=payload
+    )
+
+
+def relay_databases():
+    """Return the aliases of the databases storing outbox events."""
+
+    return list(dict.fromkeys(['default', *settings.MESSAGE_SHARDS]))
+
+
+def relay_batch(batch_size=100, using='default'):
+    """Deliver up to `batch_size` due events and return how many were
+    delivered and how many failed.
+
+    Rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so several
+    relays can run side by side without delivering the same event at
+    the same time. An event is deleted only after all its handlers
+    succeeded; a failed event is retried later with exponential
+    backoff."""
+
+    delivered = []
+    failed = 0
+
+    queryset = OutboxEvent.objects.using(using)
+    with transaction.atomic(using=using):
+        events = list(
+            queryset.select_for_update(skip_locked=True).filter(
+                available_at__lte=timezone.now()
+            ).order_by('id')[:batch_size]
+        )
+
+        for event in events:
+            try:
+                with transaction.atomic(using=using):
+                    for handler in _handlers.get(event.event_type, []):
+                        handler(event.payload)
+            except Exception as error:
+                logger.exception('Outbox event %s failed.', event.id)
+                failed += 1
+                event.attempts += 1
+                event.last_error = repr(error)
+                event.available_at = timezone.now() + timedelta(
+                    seconds=min(2 ** event.attempts, MAX_RETRY_DELAY)
+                )
+                event.save(
+                    update_fields=['attempts', 'last_error', 'available_at']
+                )
+            else:
+                delivered.append(event.id)
+
+        if delivered:
+            queryset.filter(id__in=delivered).delete()
+
+    return len(delivered), failed
@@ -0,0 +1,247 @@
+"""
+Monthly range partitions of the message table on PostgreSQL.
+
+`core_message` is partitioned by `sent_date`, one partition per month
+named `core_message_pYYYYMM`. A partitioned table's unique constraints
+have to contain the partition key, so its primary key is
+(id, sent_date) and the channel sequence constraint is
+(channel_id, seq, sent_date); ids and sequence numbers are still unique
+on their own as they are handed out by the app.
+
+Messages of months without a partition land in the DEFAULT partition,
+`core_message_default`, so writes never fail for lack of a partition.
+The message_partitions command creates the partitions of the coming
+months, moving their rows out of the DEFAULT partition, and drops whole
+months past retention, which is much cheaper than deleting their rows.
+Deploys run it after migrating; it also has to run at least monthly,
+for example daily from cron, or new messages pile up in the DEFAULT
+partition.
+
+Queries prune partitions when they filter on `sent_date`. Lookups by
+message id only get such a filter from Snowflake ids, which carry the
+time they were made (see `sent_date_bounds`); with SNOWFLAKE_IDS off
+they read the id index of every partition. Turn on Snowflake ids before
+partitioning a large message table.
+"""
+
+from datetime import date
+
+from django.db import transaction
+
+from core.models import Message
+
+
+TABLE = Message._meta.db_table
+PARTITION_PREFIX = f'{TABLE}_p'
+DEFAULT_PARTITION = f'{TABLE}_default'
+DEFAULT_MONTHS_AHEAD = 3
+
+
+def month_start(day):
+    """Return the first day of the month of `day`."""
+
+    return date(day.year, day.month, 1)
+
+
+def add_months(day, months):
+    """Return the first day of the month `months` after `day`."""
+
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    """Return the table name of the partition of a month."""
+
+    return f'{PARTITION_PREFIX}{month:%Y%m}'
+
+
+def is_partitioned(connection):
+    """Return whether the message table is partitioned."""
+
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM pg_partitioned_table p '
+            'JOIN pg_class c ON c.oid = p.partrelid '
+            'WHERE c.relname = %s AND pg_table_is_visible(c.oid)',
+            [TABLE]
+        )
+        return cursor.fetchone() is not None
+
+
+def create_default_partition(connection):
+    """Create the DEFAULT partition of the message table if missing."""
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} '
+            'DEFAULT'.format(
+                name=connection.ops.quote_name(DEFAULT_PARTITION),
+                table=connection.ops.quote_name(TABLE)
+            )
+        )
+
+
+def create_partition(cursor, connection, month):
+    """Create the partition of a month, moving the month's rows out of
+    the DEFAULT partition.
+
+    PostgreSQL refuses a partition whose rows are in the DEFAULT
+    partition, so when there are any the DEFAULT partition is detached
+    while they are moved."""
+
+    quote = connection.ops.quote_name
+    name = quote(partition_name(month))
+    table = quote(TABLE)
+    default = quote(DEFAULT_PARTITION)
+    bounds = [month, add_months(month, 1)]
+
+    cursor.execute('SELECT to_regclass(%s)', [DEFAULT_PARTITION])
+    move = cursor.fetchone()[0] is not None
+    if move:
+        cursor.execute(
+            f'SELECT 1 FROM {default} '
+            'WHERE sent_date >= %s AND sent_date < %s LIMIT 1',
+            bounds
+        )
+        move = cursor.fetchone() is not None
+    if move:
+        cursor.execute(f'ALTER TABLE {table} DETACH PARTITION {default}')
+
+    cursor.execute(
+        f'CREATE TABLE {name} PARTITION OF {table} '
+        'FOR VALUES FROM (%s) TO (%s)',
+        bounds
+    )
+
+    if move:
+        cursor.execute(
+            f'WITH moved AS (DELETE FROM {default} '
+            'WHERE sent_date >= %s AND sent_date < %s RETURNING *) '
+            f'INSERT INTO {name} SELECT * FROM moved',
+            bounds
+        )
+        cursor.execute(
+            f'ALTER TABLE {table} ATTACH PARTITION {default} DEFAULT'
+        )
+
+
+def create_partitions(connection, first, last):
+    """Create the missing partitions of the months from `first` to
+    `last` and return the names of those created."""
+
+    created = []
+    existing = set(list_partitions(connection))
+    month = month_start(first)
+    with transaction.atomic(using=connection.alias), \
+            connection.cursor() as cursor:
+        while month <= last:
+            if month not in existing:
+                create_partition(cursor, connection, month)
+                created.append(partition_name(month))
+            month = add_months(month, 1)
+    return created
+
+
+def list_partitions(connection):
+    """Return a dict of the partitions of the message table by month."""
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT c.relname FROM pg_inherits i '
+            'JOIN pg_class c ON c.oid = i.inhrelid '
+            'JOIN pg_class p ON p.oid = i.inhparent '
+            'WHERE p.relname = %s AND pg_table_is_visible(p.oid)',
+            [TABLE]
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    partitions = {}
+    for name in names:
+        suffix = name[len(PARTITION_PREFIX):]
+        if name.startswith(PARTITION_PREFIX) and suffix.isdigit():
+            month = date(int(suffix[:4]), int(suffix[4:]), 1)
+            partitions[month] = name
+    return partitions
+
+
+def drop_partitions_before(connection, month):
+    """Drop the partitions of the months before `month` and return the
+    names of those dropped."""
+
+    dropped = []
+    with connection.cursor() as cursor:
+        for start, name in sorted(list_partitions(connection).items()):
+            if start >= month:
+                break
+            quoted = connection.ops.quote_name(name)
+            cursor.execute(
+                'ALTER TABLE {table} DETACH PARTITION {name}'.format(
+                    table=connection.ops.quote_name(TABLE),
+                    name=quoted
+                )
+            )
+            cursor.execute(f'DROP TABLE {quoted}')
+            dropped.append(name)
+    return dropped
+
+
+def partition_table(connection, today, months_ahead=DEFAULT_MONTHS_AHEAD):
+    """Turn the message table into a table partitioned by month.
+
+    Existing rows are copied into the partitions of their month, so
+    this locks the table for as long as the copy takes."""
+
+    quote = connection.ops.quote_name
+    table = quote(TABLE)
+    old = quote(f'{TABLE}_unpartitioned')
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT indexdef FROM pg_indexes i '
+            'JOIN pg_index x ON x.indexrelid = ('
+            "quote_ident(i.schemaname) || '.' || "
+            'quote_ident(i.indexname))::regclass '
+            'WHERE i.tablename = %s AND NOT x.indisunique',
+            [TABLE]
+        )
+        indexes = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            'SELECT pg_get_serial_sequence(%s, %s), min(sent_date) '
+            f'FROM {table}',
+            [TABLE, 'id']
+        )
+        sequence, oldest = cursor.fetchone()
+
+        cursor.execute(f'ALTER TABLE {table} RENAME TO {old}')
+        cursor.execute(
+            f'CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS) '
+            'PARTITION BY RANGE (sent_date)'
+        )
+
+    create_partitions(
+        connection,
+        oldest or today,
+        add_months(today, months_ahead)
+    )
+    create_default_partition(connection)
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'INSERT INTO {table} SELECT * FROM {old}')
+        if sequence:
+            cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY {table}.id')
+        cursor.execute(f'DROP TABLE {old}')
+
+        # The old table's indexes are gone, so their names can be reused.
+        cursor.execute(
+            f'ALTER TABLE {table} ADD PRIMARY KEY (id, sent_date)'
+        )
+        cursor.execute(
+            f'ALTER TABLE {table} ADD CONSTRAINT '
+            f'{quote("unique_message_channel_seq")} '
+            'UNIQUE (channel_id, seq, sent_date)'
+        )
+        for indexdef in indexes:
+            cursor.execute(indexdef)
@@ -1,27 +1,42 @@
 from .models import Membership, Message
+from core.request_cache import memoize
 from rest_framework.permissions import BasePermission
 
 
+def membership_permissions(request, view):
+    """Return the user's permission level in the channel of the view,
+    or None when not a member of it."""
+
+    channel_id = view.kwargs.get('pk')
+
+    def fetch():
+        return Membership.objects.filter(
+            channel=channel_id,
+            channel__deleted_at__isnull=True,
+            member=request.user
+        ).values_list('permissions', flat=True).first()
+
+    return memoize(('membership', request.user.pk, str(channel_id)), fetch)
+
+
 class HasReadPermissions(BasePermission):
 
     def has_permission(self, request, view):
-        membership = Membership.objects.all().filter(
-            channel=view.kwargs.get('pk'),
-            member=request.user
-        )
-        return True if membership else False
+        return membership_permissions(request, view) is not None
 
 
 class HasWritePermissions(BasePermission):
 
     def has_permission(self, request, view):
-        membership = Membership.objects.all().filter(
-            channel=view.kwargs.get('pk'),
-            member=request.user
-        )
-        if membership:
-            return True if membership.permissions >= 2 else False
-        return False
+        permissions = membership_permissions(request, view)
+        return permissions is not None and permissions >= Membership.WRITE
+
+
+class HasAdminPermissions(BasePermission):
+
+    def has_permission(self, request, view):
+        permissions = membership_permissions(request, view)
+        return permissions is not None and permissions >= Membership.ADMIN
 
 
 class IsMessageOwner(BasePermission):
@@ -29,14 +44,13 @@ class IsMessageOwner(BasePermission):
 
     def has_permission(self, request, view):
 
-        membership = Membership.objects.all().filter(
-            channel=view.kwargs.get('pk'),
-            member=request.user
-        )
-        if membership:
-            message = Message.objects.all().filter(
-                sender=request.user,
-                pk=view.kwargs.get('message_id')
+        if membership_permissions(request, view) is not None:
+            message = Message.objects.for_channel(
+                view.kwargs.get('pk')
+            ).with_id(
+                view.kwargs.get('message_id')
+            ).filter(
+                sender=request.user
             )
             if message:
                 return True
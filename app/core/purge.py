@@ -0,0 +1,109 @@
+"""
+Background deletion of deleted channels.
+
+Deleting a channel only marks it deleted. The purge_channels command
+then removes its reactions, messages and memberships with raw DELETE
+statements of at most `batch_size` rows each, so no statement holds
+locks for long and nothing is loaded into memory, and records its
+progress on the channel's ChannelDeletion. The channel row itself goes last.
+"""
+
+import time
+
+from django.db import connections, router
+from django.db.models import F
+from django.utils import timezone
+
+from core import archive
+from core.models import (
+    Channel,
+    ChannelDeletion,
+    ChannelSequence,
+    Membership,
+    Message,
+    Reaction,
+)
+from core.sharding import shard_for_channel
+
+
+def delete_batch(using, model, column, value, batch_size):
+    """Delete up to `batch_size` rows of a model whose column equals a
+    value and return how many were deleted."""
+
+    connection = connections[using]
+    table = connection.ops.quote_name(model._meta.db_table)
+    column = connection.ops.quote_name(column)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE id IN ('
+            f'SELECT id FROM {table} WHERE {column} = %s LIMIT %s)',
+            [value, batch_size]
+        )
+        return cursor.rowcount
+
+
+def purge_rows(deletion, using, model, counter, batch_size, sleep):
+    """Delete the rows of a model belonging to the deleted channel in
+    batches, adding them to a counter of the deletion if given."""
+
+    while True:
+        count = delete_batch(
+            using,
+            model,
+            'channel_id',
+            deletion.channel_id,
+            batch_size
+        )
+        if count and counter:
+            ChannelDeletion.objects.filter(pk=deletion.pk).update(
+                **{counter: F(counter) + count}
+            )
+        if count < batch_size:
+            return
+        time.sleep(sleep)
+
+
+def purge_channel(deletion, batch_size=1000, sleep=0.1):
+    """Delete everything of a deleted channel and mark it finished."""
+
+    channel_id = deletion.channel_id
+    purge_rows(
+        deletion,
+        shard_for_channel(channel_id),
+        Reaction,
+        None,
+        batch_size,
+        sleep
+    )
+    purge_rows(
+        deletion,
+        shard_for_channel(channel_id),
+        Message,
+        'messages_deleted',
+        batch_size,
+        sleep
+    )
+    ChannelSequence.objects.using(shard_for_channel(channel_id)).filter(
+        channel=channel_id
+    ).delete()
+    archive.delete_channel_archive(channel_id)
+    purge_rows(
+        deletion,
+        router.db_for_write(Membership),
+        Membership,
+        'memberships_deleted',
+        batch_size,
+        sleep
+    )
+    Channel.objects.filter(pk=channel_id).delete()
+    ChannelDeletion.objects.filter(pk=deletion.pk).update(
+        finished_at=timezone.now()
+    )
+
+
+def pending_deletions():
+    """Return the deletions still to purge, oldest first."""
+
+    return ChannelDeletion.objects.filter(
+        finished_at__isnull=True
+    ).order_by('requested_at', 'id')
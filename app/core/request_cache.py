@@ -0,0 +1,45 @@
+"""
+Values shared by the views run for a single client request.
+
+A batch request runs several views in-process, and they tend to look
+up the same memberships and channel lists. Inside `request_cache()`
+those lookups go through `memoize` and are done once; outside of it
+`memoize` just calls through.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+_store = ContextVar('request_cache', default=None)
+
+
+@contextmanager
+def request_cache():
+    """Share memoized values until the block exits."""
+
+    token = _store.set({})
+    try:
+        yield
+    finally:
+        _store.reset(token)
+
+
+def memoize(key, func):
+    """Return `func()`, computed once per key in the current request
+    cache."""
+
+    store = _store.get()
+    if store is None:
+        return func()
+    if key not in store:
+        store[key] = func()
+    return store[key]
+
+
+def clear():
+    """Forget the memoized values, after a write made them stale."""
+
+    store = _store.get()
+    if store is not None:
+        store.clear()
@@ -0,0 +1,198 @@
+"""
+Database routers.
+"""
+
+import itertools
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+from core.sharding import shard_for_channel
+
+
+logger = logging.getLogger(__name__)
+
+SHARDED_MODELS = {
+    'core.message',
+    'core.archivesegment',
+    'core.reaction',
+    'core.channelsequence',
+}
+
+_replicas = ContextVar('replicas', default=None)
+
+
+def replicas_of(alias):
+    """Return the replica aliases of a primary database alias."""
+
+    if alias == 'default':
+        return settings.DATABASE_REPLICAS
+    return settings.SHARD_REPLICAS.get(alias, [])
+
+
+def use_replicas():
+    """Send the reads of the current context to replicas and return a
+    token to restore the previous routing."""
+
+    return _replicas.set({})
+
+
+def reset_replicas(token):
+    """Restore what `use_replicas` changed."""
+
+    _replicas.reset(token)
+
+
+def read_alias(alias):
+    """Return the database to read a primary alias from.
+
+    In a context using replicas, that is a healthy replica of it, chosen
+    on its first read so every later read of the context sees the same
+    point in time; otherwise, or without a healthy replica, the primary
+    itself."""
+
+    chosen = _replicas.get()
+    if chosen is None:
+        return alias
+    if alias not in chosen:
+        chosen[alias] = replica_pool.choose(alias) or alias
+    return chosen[alias]
+
+
+def all_replicas():
+    """Return the aliases of every replica."""
+
+    replicas = set(settings.DATABASE_REPLICAS)
+    for aliases in settings.SHARD_REPLICAS.values():
+        replicas.update(aliases)
+    return replicas
+
+
+class ReplicaPool:
+    """Round-robin over the healthy replica aliases.
+
+    A replica's health is checked at most every
+    REPLICA_HEALTH_CHECK_INTERVAL seconds by opening its connection."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counter = itertools.count()
+        self._checked = {}
+
+    def is_healthy(self, alias):
+        """Return whether a replica answered its last check."""
+
+        now = time.monotonic()
+        with self._lock:
+            healthy, checked_at = self._checked.get(alias, (True, None))
+            due = checked_at is None or (
+                now - checked_at >= settings.REPLICA_HEALTH_CHECK_INTERVAL
+            )
+            if not due:
+                return healthy
+            # Claim the check so concurrent callers do not repeat it.
+            self._checked[alias] = (healthy, now)
+
+        try:
+            connection = connections[alias]
+            connection.ensure_connection()
+            healthy = connection.is_usable()
+        except Exception:
+            healthy = False
+        if not healthy:
+            logger.warning('Replica %s is unavailable.', alias)
+        with self._lock:
+            self._checked[alias] = (healthy, now)
+        return healthy
+
+    def choose(self, alias='default'):
+        """Return the next healthy replica of a primary alias, or None."""
+
+        replicas = replicas_of(alias)
+        if not replicas:
+            return None
+        start = next(self._counter)
+        for offset in range(len(replicas)):
+            alias = replicas[(start + offset) % len(replicas)]
+            if self.is_healthy(alias):
+                return alias
+        return None
+
+
+replica_pool = ReplicaPool()
+
+
+class ShardRouter:
+    """Send messages, and the archive segments of a channel, to the
+    shard of their channel, and their reads to the replica of the shard
+    chosen for the current context.
+
+    The shard is found from the `shard` hint, which
+    `Message.objects.for_channel()` and `on_shard()` give, or from the
+    `instance` hint, which Django gives when saving a message or
+    following a channel's messages. Other queries on messages have to
+    pick their database explicitly."""
+
+    def _shard(self, model, hints):
+        if model._meta.label_lower not in SHARDED_MODELS:
+            return None
+        if hints.get('shard') is not None:
+            return hints['shard']
+        instance = hints.get('instance')
+        if instance is None:
+            return None
+        if instance._meta.label_lower == 'core.channel':
+            channel_id = instance.pk
+        else:
+            channel_id = getattr(instance, 'channel_id', None)
+        if channel_id is None:
+            return None
+        return shard_for_channel(channel_id)
+
+    def db_for_read(self, model, **hints):
+        shard = self._shard(model, hints)
+        return shard and read_alias(shard)
+
+    def db_for_write(self, model, **hints):
+        return self._shard(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        labels = {obj1._meta.label_lower, obj2._meta.label_lower}
+        if labels & SHARDED_MODELS:
+            return True
+        # Every shard holds the full schema, which migrate fills with
+        # rows such as content types on each of them.
+        databases = {'default', *settings.MESSAGE_SHARDS, *all_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaRouter:
+    """Send reads to the replica chosen for the current request.
+
+    ReplicaRoutingMiddleware lets read-only requests of users that have
+    not written recently use replicas, and every read of the request
+    goes to the same one, so they all see the same point in time.
+    Everything else, including every write, goes to the primary."""
+
+    def db_for_read(self, model, **hints):
+        return read_alias('default')
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {'default', *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in all_replicas():
+            return False
+        return None
@@ -0,0 +1,88 @@
+"""
+Horizontal sharding of messages by channel.
+
+Messages are stored on one of the MESSAGE_SHARDS database aliases,
+chosen by a stable hash of their channel id, so all the messages of a
+channel live on the same shard and a channel's history is read from a
+single database. Users, channels and memberships stay on the directory
+database (`default`), except for the message sequence counter of a
+channel, which is a ChannelSequence on its shard so numbers are
+allocated in the transaction inserting the messages. With a single
+shard, the default, every table lives on `default`.
+
+The shard is the hash modulo the number of shards, so changing
+MESSAGE_SHARDS moves channels to other shards; their messages have to
+be copied over before the new setting is deployed.
+"""
+
+import contextvars
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+
+
+def stable_hash(value):
+    """Return a hash that is stable across processes."""
+
+    digest = hashlib.md5(str(value).encode()).digest()
+    return int.from_bytes(digest[:8], 'big')
+
+
+def shard_for_channel(channel_id):
+    """Return the database alias storing a channel's messages."""
+
+    shards = settings.MESSAGE_SHARDS
+    if len(shards) == 1:
+        return shards[0]
+    return shards[stable_hash(int(channel_id)) % len(shards)]
+
+
+def group_by_shard(channel_ids):
+    """Return a dict of the given channel ids by their shard alias."""
+
+    groups = {}
+    for channel_id in channel_ids:
+        groups.setdefault(shard_for_channel(channel_id), []).append(
+            channel_id
+        )
+    return groups
+
+
+def _call_in_thread(func, alias, channel_ids):
+    try:
+        return func(alias, channel_ids)
+    finally:
+        connections.close_all()
+
+
+def scatter_gather(func, channel_ids):
+    """Call `func(alias, channel_ids)` once for every shard holding some
+    of the channels and return the list of results.
+
+    When the channels are spread over several shards, the shards are
+    queried at the same time from worker threads, unless a transaction
+    is open on one of them. The threads run in a copy of the caller's
+    context, so they read from the replicas it reads from."""
+
+    groups = group_by_shard(channel_ids)
+    if len(groups) <= 1 or any(
+        connections[alias].in_atomic_block for alias in groups
+    ):
+        # Worker threads have connections of their own, which cannot see
+        # the writes of a transaction open in this thread.
+        return [func(alias, ids) for alias, ids in groups.items()]
+
+    with ThreadPoolExecutor(max_workers=len(groups)) as executor:
+        futures = [
+            executor.submit(
+                contextvars.copy_context().run,
+                _call_in_thread,
+                func,
+                alias,
+                ids
+            )
+            for alias, ids in groups.items()
+        ]
+        return [future.result() for future in futures]
@@ -0,0 +1,33 @@
+"""
+Signal handlers of the core app.
+"""
+
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core import channel_lists
+from core.models import Channel, Membership
+
+
+def count_member(membership, delta):
+    Channel.objects.filter(pk=membership.channel_id).update(
+        member_count=F('member_count') + delta
+    )
+
+
+@receiver(post_save, sender=Membership)
+def membership_saved(sender, instance, created, using, **kwargs):
+    """Count a new member and invalidate their channel list."""
+
+    if created:
+        count_member(instance, 1)
+        channel_lists.bump([instance.member_id], using=using)
+
+
+@receiver(post_delete, sender=Membership)
+def membership_deleted(sender, instance, using, **kwargs):
+    """Uncount a removed member and invalidate their channel list."""
+
+    count_member(instance, -1)
+    channel_lists.bump([instance.member_id], using=using)
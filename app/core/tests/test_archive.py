@@ -0,0 +1,294 @@
+"""
+Tests for the message archive.
+"""
+
+import os
+import tempfile
+from datetime import date, timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connections
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import archive
+from core.sharding import shard_for_channel
+from core.models import ArchiveSegment, Channel, Message
+
+
+def sample_messages(count):
+    return [
+        {'id': 100 + i, 'seq': i + 1, 'text': f'Message {i}'}
+        for i in range(count)
+    ]
+
+
+class SegmentFileTests(SimpleTestCase):
+    """Test writing and reading segment files."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, '1', 'segment.seg')
+
+    def test_round_trip(self):
+        """Test a segment returns the messages written to it, with the
+        fields missing from older messages filled in."""
+
+        archive.write_segment(self.path, sample_messages(25), block_size=10)
+        messages = [
+            {**archive.MESSAGE_DEFAULTS, **message}
+            for message in sample_messages(25)
+        ]
+
+        reader = archive.SegmentReader(self.path)
+        self.addCleanup(reader.close)
+
+        self.assertEqual(reader.messages(), messages)
+        self.assertEqual(reader.messages(after_id=120), messages[21:])
+        self.assertEqual(
+            reader.messages(from_seq=5, to_seq=7),
+            messages[4:7]
+        )
+
+    def test_only_overlapping_blocks_decompressed(self):
+        """Test reads skip the blocks outside their range."""
+
+        archive.write_segment(self.path, sample_messages(50), block_size=10)
+        reader = archive.SegmentReader(self.path)
+        self.addCleanup(reader.close)
+
+        with patch.object(
+            reader,
+            '_read_block',
+            wraps=reader._read_block
+        ) as read_block:
+            reader.messages(after_id=135)
+            reader.messages(from_seq=12, to_seq=14)
+
+        self.assertEqual(read_block.call_count, 3)
+
+    def test_evicted_reader_closed_after_use(self):
+        """Test readers pushed out of the cache are closed, but not
+        while a read still uses them."""
+
+        other = os.path.join(os.path.dirname(self.path), 'other.seg')
+        archive.write_segment(self.path, sample_messages(5))
+        archive.write_segment(other, sample_messages(5))
+        cache = archive.SegmentCache(maxsize=1)
+        self.addCleanup(cache.cache_clear)
+
+        with cache(self.path) as first:
+            with cache(other) as second:
+                self.assertFalse(first._map.closed)
+            self.assertEqual(len(first.messages()), 5)
+        with cache(other) as reused:
+            pass
+
+        self.assertTrue(first._map.closed)
+        self.assertIs(reused, second)
+        self.assertFalse(second._map.closed)
+
+    def test_invalid_file_rejected(self):
+        """Test opening a file that is not a segment raises an error."""
+
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, 'wb') as invalid:
+            invalid.write(b'not a segment at all')
+
+        with self.assertRaises(archive.SegmentError):
+            archive.SegmentReader(self.path)
+
+
+class ArchiveMessagesTests(TestCase):
+    """Test archiving the old messages of channels."""
+
+    databases = '__all__'
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        settings_override = override_settings(ARCHIVE_ROOT=tmp.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(archive.open_segment.cache_clear)
+        self.root = tmp.name
+
+        self.user = get_user_model().objects.create(
+            username='User',
+            email='email@example.com',
+            password='pass123'
+        )
+        self.channel = Channel.objects.create(
+            creator=self.user,
+            name='Channel'
+        )
+        self.shard = shard_for_channel(self.channel.id)
+        self.messages = [
+            Message.objects.create(
+                sender=self.user,
+                channel=self.channel,
+                text=f'Message {i}'
+            )
+            for i in range(5)
+        ]
+        old = [message.id for message in self.messages[:3]]
+        Message.objects.for_channel(self.channel.id).filter(
+            id__in=old
+        ).update(
+            sent_date=date.today() - timedelta(days=100)
+        )
+
+    def archive(self):
+        call_command('archive_messages', '--segment-size=2', stdout=StringIO())
+
+    def test_old_messages_moved_to_segments(self):
+        """Test old messages leave the table for segment files."""
+
+        self.archive()
+
+        self.assertEqual(
+            list(Message.objects.for_channel(self.channel.id).values_list(
+                'id',
+                flat=True
+            )),
+            [message.id for message in self.messages[3:]]
+        )
+        segments = ArchiveSegment.objects.using(self.shard).order_by(
+            'first_id'
+        )
+        self.assertEqual([s.message_count for s in segments], [2, 1])
+        for segment in segments:
+            self.assertTrue(os.path.exists(archive.segment_path(segment)))
+
+    def test_messages_endpoint_reads_through_archive(self):
+        """Test listing messages includes the archived ones."""
+
+        self.archive()
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = reverse('channel:channel-messages', args=[self.channel.id])
+
+        res = client.get(url)
+        ranged = client.get(url, {'from_seq': 2, 'to_seq': 4})
+
+        self.assertEqual(
+            [m['id'] for m in res.data],
+            [str(message.id) for message in self.messages]
+        )
+        self.assertEqual([m['seq'] for m in ranged.data], [2, 3, 4])
+
+    def test_archived_messages_read_only(self):
+        """Test archived messages cannot be replied or reacted to."""
+
+        self.archive()
+        client = APIClient()
+        client.force_authenticate(self.user)
+        archived = self.messages[0]
+
+        reply = client.post(
+            reverse('channel:channel-messages', args=[self.channel.id]),
+            {'text': 'Reply', 'parent': archived.id},
+            format='json'
+        )
+        reaction = client.post(
+            reverse(
+                'channel:channel-reactions',
+                args=[self.channel.id, archived.id]
+            ),
+            {'emoji': '👍'},
+            format='json'
+        )
+
+        self.assertEqual(reply.status_code, 400)
+        self.assertIn('Archived', str(reply.data['parent']))
+        self.assertEqual(reaction.status_code, 400)
+
+    def test_messages_endpoint_reads_table_past_archive(self):
+        """Test the message table is only read past the archived ids."""
+
+        self.archive()
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = reverse('channel:channel-messages', args=[self.channel.id])
+
+        with CaptureQueriesContext(connections[self.shard]) as queries:
+            client.get(url)
+
+        last_id = self.messages[2].id
+        self.assertTrue(any(
+            f'"id" > {last_id}' in query['sql']
+            for query in queries
+            if 'FROM "core_message"' in query['sql']
+        ))
+
+    def test_newer_messages_skip_archive(self):
+        """Test ranges past the archived messages do not read it."""
+
+        self.archive()
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = reverse('channel:channel-messages', args=[self.channel.id])
+
+        with patch.object(archive, 'read_messages') as read_messages:
+            after = client.get(url, {'after': self.messages[3].id})
+            ranged = client.get(url, {'from_seq': 4})
+
+        read_messages.assert_not_called()
+        self.assertEqual([m['seq'] for m in after.data], [5])
+        self.assertEqual([m['seq'] for m in ranged.data], [4, 5])
+
+    def test_deleting_channel_removes_segments(self):
+        """Test a deleted channel's segment files are removed."""
+
+        self.archive()
+        paths = [
+            archive.segment_path(segment)
+            for segment in ArchiveSegment.objects.using(self.shard)
+        ]
+
+        with self.captureOnCommitCallbacks(using=self.shard, execute=True):
+            self.channel.delete()
+
+        self.assertTrue(paths)
+        self.assertFalse(ArchiveSegment.objects.using(self.shard).exists())
+        self.assertFalse(any(os.path.exists(path) for path in paths))
+
+    @override_settings(SNOWFLAKE_IDS=False)
+    def test_prune_drops_segments_past_retention(self):
+        """Test segments are pruned by the dates of their messages."""
+
+        self.archive()
+        segments = ArchiveSegment.objects.using(self.shard)
+        segments.filter(first_id=self.messages[2].id).update(
+            last_sent_date=None
+        )
+        Channel.objects.filter(id=self.channel.id).update(retention_days=30)
+
+        with self.captureOnCommitCallbacks(using=self.shard, execute=True):
+            call_command('prune_messages', stdout=StringIO())
+
+        self.assertFalse(segments.exists())
+        self.assertEqual(
+            Message.objects.for_channel(self.channel.id).count(),
+            2
+        )
+
+    def test_prune_keeps_segments_within_retention(self):
+        """Test segments with messages within retention are kept."""
+
+        self.archive()
+        Channel.objects.filter(id=self.channel.id).update(retention_days=200)
+
+        call_command('prune_messages', stdout=StringIO())
+
+        self.assertEqual(
+            ArchiveSegment.objects.using(self.shard).count(),
+            2
+        )
@@ -2,13 +2,27 @@
 Test custom Django management commands.
 """
 
+from datetime import date, timedelta
+from io import StringIO
 from unittest.mock import patch
 
 from psycopg2 import OperationalError as Psycopg2Error
 
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.test import SimpleTestCase, TestCase
+
+from core import outbox
+from core.sharding import shard_for_channel
+from core.models import (
+    Channel,
+    ChannelDeletion,
+    Membership,
+    Message,
+    OutboxEvent,
+    Reaction,
+)
 
 
 @patch('core.management.commands.wait_for_db.Command.check')
@@ -34,3 +48,176 @@ class CommandsTests(SimpleTestCase):
 
         self.assertEqual(patched_check.call_count, 6)
         patched_check.assert_called_with(databases=['default'])
+
+
+class RelayOutboxCommandTests(TestCase):
+    """Test relaying outbox events."""
+
+    databases = '__all__'
+
+    def setUp(self):
+        self.received = []
+        outbox.register('test.event')(self.received.append)
+
+    def tearDown(self):
+        outbox.unregister('test.event', self.received.append)
+
+    def test_relay_delivers_and_deletes_events(self):
+        """Test events are handed to handlers and removed."""
+
+        outbox.enqueue('test.event', {'id': 1})
+        outbox.enqueue('test.event', {'id': 2})
+
+        call_command('relay_outbox', '--once', stdout=StringIO())
+
+        self.assertEqual(self.received, [{'id': 1}, {'id': 2}])
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_relay_keeps_failed_events_for_retry(self):
+        """Test an event whose handler fails is kept and rescheduled."""
+
+        def failing_handler(payload):
+            raise RuntimeError('unavailable')
+
+        outbox.register('test.failing')(failing_handler)
+        self.addCleanup(outbox.unregister, 'test.failing', failing_handler)
+        event = outbox.enqueue('test.failing', {'id': 1})
+
+        with self.assertLogs('core.outbox', level='ERROR'):
+            call_command('relay_outbox', '--once', stdout=StringIO())
+
+        event.refresh_from_db()
+        self.assertEqual(event.attempts, 1)
+        self.assertIn('unavailable', event.last_error)
+        self.assertGreater(event.available_at, event.created_at)
+
+
+class PruneMessagesCommandTests(TestCase):
+    """Test deleting messages past retention."""
+
+    databases = '__all__'
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(
+            username='User',
+            email='email@example.com',
+            password='pass123'
+        )
+
+    def create_messages(self, channel, count, days_ago):
+        messages = [
+            Message.objects.create(
+                sender=self.user,
+                channel=channel,
+                text='Message'
+            )
+            for _ in range(count)
+        ]
+        Message.objects.for_channel(channel.id).filter(
+            id__in=[m.id for m in messages]
+        ).update(
+            sent_date=date.today() - timedelta(days=days_ago)
+        )
+        return messages
+
+    @patch('time.sleep')
+    def test_prune_deletes_old_messages_in_batches(self, patched_sleep):
+        """Test messages past retention are deleted batch by batch."""
+
+        channel = Channel.objects.create(
+            creator=self.user,
+            name='Channel',
+            retention_days=30
+        )
+        kept_forever = Channel.objects.create(
+            creator=self.user,
+            name='Kept'
+        )
+        self.create_messages(channel, 5, days_ago=40)
+        recent = self.create_messages(channel, 2, days_ago=10)
+        self.create_messages(kept_forever, 3, days_ago=400)
+        out = StringIO()
+
+        call_command(
+            'prune_messages',
+            '--batch-size=2',
+            '--sleep=0',
+            stdout=out
+        )
+
+        self.assertEqual(
+            list(Message.objects.for_channel(channel.id).order_by('id')),
+            recent
+        )
+        self.assertEqual(
+            Message.objects.for_channel(kept_forever.id).count(),
+            3
+        )
+        self.assertEqual(patched_sleep.call_count, 2)
+        self.assertIn('rows/s', out.getvalue())
+
+
+class PurgeChannelsCommandTests(TestCase):
+    """Test purging deleted channels."""
+
+    databases = '__all__'
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(
+            username='User',
+            email='email@example.com',
+            password='pass123'
+        )
+        self.channel = Channel.objects.create(
+            creator=self.user,
+            name='Channel'
+        )
+        for _ in range(5):
+            Message.objects.create(
+                sender=self.user,
+                channel=self.channel,
+                text='Message'
+            )
+
+    @patch('time.sleep')
+    def test_purge_deletes_channel_in_batches(self, patched_sleep):
+        """Test a deleted channel's rows are removed and counted."""
+
+        other = Channel.objects.create(creator=self.user, name='Other')
+        Message.objects.create(sender=self.user, channel=other, text='Hi')
+        Reaction.objects.toggle(
+            Message.objects.for_channel(self.channel.id).first(),
+            self.user.id,
+            '👍'
+        )
+        self.channel.mark_deleted()
+
+        call_command(
+            'purge_channels',
+            '--once',
+            '--batch-size=2',
+            stdout=StringIO()
+        )
+
+        deletion = ChannelDeletion.objects.get(channel_id=self.channel.id)
+        self.assertIsNotNone(deletion.finished_at)
+        self.assertEqual(deletion.messages_deleted, 5)
+        self.assertEqual(deletion.memberships_deleted, 1)
+        self.assertFalse(Channel.objects.filter(id=self.channel.id))
+        self.assertFalse(Message.objects.for_channel(self.channel.id))
+        self.assertFalse(Reaction.objects.using(
+            shard_for_channel(self.channel.id)
+        ).filter(channel=self.channel.id))
+        self.assertFalse(Membership.objects.filter(channel=self.channel.id))
+        self.assertEqual(Message.objects.for_channel(other.id).count(), 1)
+        self.assertEqual(patched_sleep.call_count, 2)
+
+    def test_active_channels_untouched(self):
+        """Test channels that are not deleted are left alone."""
+
+        call_command('purge_channels', '--once', stdout=StringIO())
+
+        self.assertEqual(
+            Message.objects.for_channel(self.channel.id).count(),
+            5
+        )
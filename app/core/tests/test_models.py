@@ -1,17 +1,21 @@
 """
 Tests for models.
 """
-from django.db import IntegrityError
+from django.db import IntegrityError, connection
 from datetime import date
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 
 from core import models
+from core.sharding import shard_for_channel
 
 
 class ModelTests(TestCase):
     """Test models."""
 
+    databases = '__all__'
+
     def test_create_user_with_email_successful(self):
         """Test creating user with an email is successful."""
         username = 'exampleuser'
@@ -119,6 +123,55 @@ class ModelTests(TestCase):
         self.assertTrue(creator in channel.members.all())
         self.assertEqual(channel.created_date, date.today())
 
+    def test_update_channel_skips_membership(self):
+        """Test saving an existing channel only updates its row."""
+
+        creator = get_user_model().objects.create(
+            username='channel_creator',
+            email='test@example.com',
+            password='pas123'
+        )
+        channel = models.Channel.objects.create(
+            name='Channel Test',
+            creator=creator,
+        )
+        channel.description = 'Changed'
+
+        with self.assertNumQueries(1):
+            channel.save()
+
+        self.assertEqual(channel.members.count(), 1)
+
+    def test_bulk_provision_channels(self):
+        """Test provisioning channels adds their creators as admins
+        with the same number of queries for any number of channels."""
+
+        creator = get_user_model().objects.create(
+            username='channel_creator',
+            email='test@example.com',
+            password='pas123'
+        )
+
+        with CaptureQueriesContext(connection) as one:
+            models.Channel.objects.bulk_provision([
+                models.Channel(creator=creator, name='Channel')
+            ])
+        with CaptureQueriesContext(connection) as many:
+            channels = models.Channel.objects.bulk_provision(
+                models.Channel(creator=creator, name=f'Channel {i}')
+                for i in range(20)
+            )
+
+        self.assertEqual(len(one), len(many))
+        self.assertTrue(all(channel.pk for channel in channels))
+        self.assertEqual(
+            models.Membership.objects.filter(
+                member=creator,
+                permissions=models.Membership.ADMIN
+            ).count(),
+            21
+        )
+
     def test_create_duplicate_channel_name_fails(self):
         """Tests creating 2 channels with same name fails."""
 
@@ -283,3 +336,76 @@ class ModelTests(TestCase):
         self.assertEqual(message.sent_date, date.today())
         self.assertEqual(message.channel, channel)
         self.assertEqual(str(message), text)
+
+    def test_message_seq_allocated_per_channel(self):
+        """Test messages are numbered consecutively within a channel."""
+
+        sender = get_user_model().objects.create(
+            username='Sender User',
+            email='sender@example.com',
+            password='mypassword'
+        )
+        channel1 = models.Channel.objects.create(
+            creator=sender,
+            name='Channel 1'
+        )
+        channel2 = models.Channel.objects.create(
+            creator=sender,
+            name='Channel 2'
+        )
+
+        with self.captureOnCommitCallbacks(
+            using=shard_for_channel(channel1.id),
+            execute=True
+        ):
+            first = models.Message.objects.create(
+                sender=sender,
+                channel=channel1,
+                text='First'
+            )
+            other = models.Message.objects.create(
+                sender=sender,
+                channel=channel2,
+                text='Other'
+            )
+            second = models.Message.objects.create(
+                sender=sender,
+                channel=channel1,
+                text='Second'
+            )
+        channel1.refresh_from_db()
+
+        self.assertEqual(first.seq, 1)
+        self.assertEqual(second.seq, 2)
+        self.assertEqual(other.seq, 1)
+        self.assertEqual(channel1.last_message_seq, 2)
+
+    def test_message_bulk_create_allocates_seq(self):
+        """Test bulk created messages get consecutive sequence numbers."""
+
+        sender = get_user_model().objects.create(
+            username='Sender User',
+            email='sender@example.com',
+            password='mypassword'
+        )
+        channel = models.Channel.objects.create(
+            creator=sender,
+            name='Channel'
+        )
+        models.Message.objects.create(
+            sender=sender,
+            channel=channel,
+            text='First'
+        )
+
+        models.Message.objects.bulk_create([
+            models.Message(sender=sender, channel=channel, text=str(i))
+            for i in range(3)
+        ])
+
+        seqs = list(
+            models.Message.objects.for_channel(channel.id).order_by(
+                'seq'
+            ).values_list('seq', flat=True)
+        )
+        self.assertEqual(seqs, [1, 2, 3, 4])
@@ -0,0 +1,168 @@
+"""
+Tests for monthly partitions of messages.
+"""
+
+from datetime import date
+from io import StringIO
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+
+from core import partitions
+from core.models import Channel, Message
+
+
+class MonthTests(SimpleTestCase):
+    """Test month arithmetic of partitions."""
+
+    def test_add_months(self):
+        """Test moving across years returns first days of months."""
+
+        self.assertEqual(
+            partitions.add_months(date(2023, 11, 20), 2),
+            date(2024, 1, 1)
+        )
+        self.assertEqual(
+            partitions.add_months(date(2024, 1, 31), -1),
+            date(2023, 12, 1)
+        )
+
+    def test_partition_name(self):
+        """Test partitions are named after their month."""
+
+        self.assertEqual(
+            partitions.partition_name(date(2024, 3, 1)),
+            'core_message_p202403'
+        )
+
+
+def where_clause(queryset):
+    return str(queryset.query).split(' WHERE ')[1]
+
+
+@override_settings(SNOWFLAKE_IDS=True, SNOWFLAKE_NODE_ID=0)
+class PartitionPruningTests(TestCase):
+    """Test message queries filter on the partition key."""
+
+    databases = '__all__'
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(
+            username='User',
+            email='email@example.com',
+            password='pass123'
+        )
+        self.channel = Channel.objects.create(
+            creator=self.user,
+            name='Channel'
+        )
+        self.message = Message.objects.create(
+            sender=self.user,
+            channel=self.channel,
+            text='Hello'
+        )
+
+    def test_lookups_by_id_filter_on_sent_date(self):
+        """Test id lookups carry a sent_date predicate and still match."""
+
+        messages = Message.objects.for_channel(self.channel.id)
+        newer = messages.newer_than(self.message.id - 1)
+        by_id = messages.with_id(self.message.id)
+
+        self.assertIn('sent_date', where_clause(newer))
+        self.assertIn('sent_date', where_clause(by_id))
+        self.assertEqual(list(newer), [self.message])
+        self.assertEqual(list(by_id), [self.message])
+
+    def test_ids_without_timestamp_not_bounded(self):
+        """Test small ids do not restrict the sent date."""
+
+        self.assertNotIn(
+            'sent_date',
+            where_clause(Message.objects.newer_than(0))
+        )
+
+    @override_settings(SNOWFLAKE_CUTOVER_ID=1 << 40)
+    def test_ids_up_to_cutover_not_bounded(self):
+        """Test sequence ids from before the cutover do not restrict the
+        sent date, even past the timestamp bits."""
+
+        self.assertNotIn(
+            'sent_date',
+            where_clause(Message.objects.with_id(1 << 40))
+        )
+        self.assertIn(
+            'sent_date',
+            where_clause(Message.objects.with_id((1 << 40) + 1))
+        )
+
+
+class MessagePartitionsCommandTests(TestCase):
+    """Test the message_partitions command."""
+
+    def test_unpartitioned_database_skipped(self):
+        """Test databases without partitions are left alone."""
+
+        out = StringIO()
+
+        call_command('message_partitions', stdout=out)
+
+        self.assertIn('not partitioned', out.getvalue())
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Requires PostgreSQL.')
+class PostgresPartitionTests(TransactionTestCase):
+    """Test maintaining partitions on PostgreSQL."""
+
+    def test_create_and_drop_partitions(self):
+        """Test months ahead are created and old months dropped."""
+
+        today = date.today()
+        old = partitions.add_months(today, -13)
+        partitions.create_partitions(connection, old, old)
+
+        call_command(
+            'message_partitions',
+            '--retention-months=12',
+            stdout=StringIO()
+        )
+
+        existing = partitions.list_partitions(connection)
+        self.assertTrue(partitions.is_partitioned(connection))
+        self.assertNotIn(old, existing)
+        self.assertIn(partitions.add_months(today, 3), existing)
+
+    def test_rows_of_missing_months_kept_in_default(self):
+        """Test messages of months without a partition go to the DEFAULT
+        partition and move to their month's partition once created."""
+
+        user = get_user_model().objects.create(
+            username='User',
+            email='email@example.com',
+            password='pass123'
+        )
+        channel = Channel.objects.create(creator=user, name='Channel')
+        later = partitions.add_months(date.today(), 24)
+        message = Message.objects.create(
+            sender=user,
+            channel=channel,
+            text='Hello'
+        )
+        Message.objects.filter(pk=message.pk).update(sent_date=later)
+
+        created = partitions.create_partitions(connection, later, later)
+
+        self.assertEqual(created, [partitions.partition_name(later)])
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT id FROM {partitions.partition_name(later)}'
+            )
+            self.assertEqual(cursor.fetchall(), [(message.pk,)])
@@ -0,0 +1,232 @@
+"""
+Tests for read replica routing.
+"""
+
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import channel_lists, routers, sharding
+from core.middleware import ReplicaRoutingMiddleware
+from core.models import Channel, Message
+
+
+@override_settings(DATABASE_REPLICAS=['replica_a', 'replica_b'])
+class ReplicaRouterTests(SimpleTestCase):
+    """Test choosing the database of reads."""
+
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+        patcher = patch.object(
+            routers,
+            'replica_pool',
+            routers.ReplicaPool()
+        )
+        self.pool = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reads_go_to_primary_by_default(self):
+        """Test reads outside read-only requests use the primary."""
+
+        self.assertEqual(self.router.db_for_read(Channel), 'default')
+        self.assertEqual(self.router.db_for_write(Channel), 'default')
+
+    def test_reads_go_to_chosen_replica(self):
+        """Test every read of a context goes to the same replica."""
+
+        token = routers.use_replicas()
+        try:
+            with patch.object(self.pool, 'is_healthy', return_value=True):
+                aliases = [
+                    self.router.db_for_read(Channel) for _ in range(3)
+                ]
+        finally:
+            routers.reset_replicas(token)
+
+        self.assertIn(aliases[0], ['replica_a', 'replica_b'])
+        self.assertEqual(aliases, aliases[:1] * 3)
+
+    @override_settings(
+        MESSAGE_SHARDS=['shard_a', 'shard_b'],
+        SHARD_REPLICAS={'shard_a': ['shard_a_replica'], 'shard_b': []}
+    )
+    def test_shard_reads_go_to_shard_replica(self):
+        """Test the messages of a channel are read from a replica of its
+        shard and written to the shard."""
+
+        channel_id = next(
+            pk for pk in range(100)
+            if sharding.shard_for_channel(pk) == 'shard_a'
+        )
+        messages = Message.objects.for_channel(channel_id)
+        primary = messages.db
+
+        token = routers.use_replicas()
+        try:
+            with patch.object(self.pool, 'is_healthy', return_value=True):
+                replica = messages.db
+                writes = routers.ShardRouter().db_for_write(
+                    Message,
+                    **messages._hints
+                )
+                unreplicated = Message.objects.on_shard('shard_b').db
+        finally:
+            routers.reset_replicas(token)
+
+        self.assertEqual(primary, 'shard_a')
+        self.assertEqual(replica, 'shard_a_replica')
+        self.assertEqual(writes, 'shard_a')
+        self.assertEqual(unreplicated, 'shard_b')
+
+    def test_choose_round_robins_over_replicas(self):
+        """Test successive choices alternate between replicas."""
+
+        with patch.object(self.pool, 'is_healthy', return_value=True):
+            aliases = [self.pool.choose() for _ in range(4)]
+
+        self.assertEqual(aliases, ['replica_a', 'replica_b'] * 2)
+
+    def test_unhealthy_replica_skipped(self):
+        """Test choices avoid replicas that failed their check."""
+
+        def healthy(alias):
+            return alias == 'replica_b'
+
+        with patch.object(self.pool, 'is_healthy', side_effect=healthy):
+            aliases = {self.pool.choose() for _ in range(4)}
+
+        self.assertEqual(aliases, {'replica_b'})
+
+    def test_unreachable_replica_marked_unhealthy(self):
+        """Test a replica that cannot connect fails its check."""
+
+        with self.assertLogs('core.routers', level='WARNING'):
+            self.assertIsNone(self.pool.choose())
+
+    def test_replicas_not_migrated(self):
+        """Test migrations only run on the primary."""
+
+        self.assertFalse(self.router.allow_migrate('replica_a', 'core'))
+        self.assertIsNone(self.router.allow_migrate('default', 'core'))
+
+
+@override_settings(DATABASE_REPLICAS=['replica_a', 'replica_b'])
+class ReplicaRoutingMiddlewareTests(SimpleTestCase):
+    """Test which requests may read from replicas."""
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.seen = []
+
+        def get_response(request):
+            self.seen.append(routers.read_alias('default'))
+            return HttpResponse(status=200)
+
+        self.middleware = ReplicaRoutingMiddleware(get_response)
+        patcher = patch.object(
+            routers.replica_pool,
+            'is_healthy',
+            return_value=True
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_get_may_use_replica(self):
+        """Test read-only requests may read from a replica."""
+
+        self.middleware(self.factory.get('/'))
+        self.middleware(self.factory.post('/'))
+
+        self.assertIn(self.seen[0], ['replica_a', 'replica_b'])
+        self.assertEqual(self.seen[1], 'default')
+        self.assertIsNone(routers._replicas.get())
+
+    def test_client_pinned_to_primary_after_write(self):
+        """Test a client reads from the primary right after writing."""
+
+        auth = {'HTTP_AUTHORIZATION': 'Token abc'}
+
+        self.middleware(self.factory.post('/', **auth))
+        self.middleware(self.factory.get('/', **auth))
+        self.middleware(self.factory.get('/', HTTP_AUTHORIZATION='Token x'))
+
+        self.assertEqual(self.seen[0], 'default')
+        self.assertEqual(self.seen[1], 'default')
+        self.assertNotEqual(self.seen[2], 'default')
+
+
+@override_settings(DATABASE_REPLICAS=['replica_a'])
+class ChannelListRoutingTests(TestCase):
+    """Test the database channel lists are rebuilt from."""
+
+    databases = '__all__'
+
+    def test_channel_lists_read_from_primary(self):
+        """Test a user's channels are read from the primary even when
+        the request may read from replicas."""
+
+        user = get_user_model().objects.create(
+            username='User',
+            email='email@example.com',
+            password='pass123'
+        )
+        channel = Channel.objects.create(creator=user, name='Channel')
+
+        token = routers.use_replicas()
+        try:
+            with patch.object(
+                routers.replica_pool,
+                'is_healthy',
+                return_value=True
+            ):
+                ids = channel_lists.member_channel_ids(user.id)
+        finally:
+            routers.reset_replicas(token)
+
+        self.assertEqual(ids, [channel.id])
+
+
+@skipUnless(settings.DATABASE_REPLICAS, 'Requires a replica alias.')
+class ReplicaReadTests(TransactionTestCase):
+    """Test reading through a configured replica alias.
+
+    A replica only sees committed rows, so this cannot run inside the
+    transaction of a TestCase."""
+
+    databases = '__all__'
+
+    def test_list_channels_reads_from_replica(self):
+        """Test listing channels works when served by a replica."""
+
+        user = get_user_model().objects.create(
+            username='User',
+            email='email@example.com',
+            password='pass123'
+        )
+        Channel.objects.create(creator=user, name='Channel')
+        client = APIClient()
+        client.force_authenticate(user)
+
+        with patch.object(
+            routers.replica_pool,
+            'is_healthy',
+            return_value=True
+        ):
+            res = client.get(reverse('channel:channel-list'))
+
+        self.assertEqual(len(res.data), 1)
@@ -0,0 +1,223 @@
+"""
+Tests for sharding messages by channel.
+"""
+
+from collections import Counter
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import outbox, sharding
+from core.models import Channel, ChannelSequence, Message, OutboxEvent
+from core.routers import ShardRouter
+
+
+@override_settings(MESSAGE_SHARDS=['shard_a', 'shard_b', 'shard_c'])
+class ShardForChannelTests(SimpleTestCase):
+    """Test picking the shard of a channel."""
+
+    def test_shard_is_stable(self):
+        """Test a channel always maps to the same shard."""
+
+        self.assertEqual(
+            [sharding.shard_for_channel(42) for _ in range(3)],
+            [sharding.shard_for_channel('42')] * 3
+        )
+
+    def test_channels_spread_over_shards(self):
+        """Test every shard stores a fair share of the channels."""
+
+        shards = Counter(
+            sharding.shard_for_channel(channel) for channel in range(3000)
+        )
+
+        self.assertEqual(set(shards), set(settings.MESSAGE_SHARDS))
+        for count in shards.values():
+            self.assertGreater(count, 800)
+
+    def test_group_by_shard(self):
+        """Test channels are grouped by their shard."""
+
+        groups = sharding.group_by_shard(range(100))
+
+        for alias, channel_ids in groups.items():
+            for channel_id in channel_ids:
+                self.assertEqual(sharding.shard_for_channel(channel_id), alias)
+        self.assertEqual(sum(map(len, groups.values())), 100)
+
+    @override_settings(MESSAGE_SHARDS=['default'])
+    def test_single_shard(self):
+        """Test a single shard stores every channel."""
+
+        self.assertEqual(sharding.shard_for_channel(7), 'default')
+
+    def test_router_sends_messages_to_shard(self):
+        """Test messages are routed by channel and channels are not."""
+
+        router = ShardRouter()
+        message = Message(channel_id=7)
+
+        self.assertEqual(
+            router.db_for_write(Message, instance=message),
+            sharding.shard_for_channel(7)
+        )
+        self.assertEqual(
+            router.db_for_read(Message, instance=Channel(id=7)),
+            sharding.shard_for_channel(7)
+        )
+        self.assertIsNone(router.db_for_read(Message))
+        self.assertIsNone(router.db_for_write(Channel, instance=message))
+
+
+@skipUnless(
+    len(settings.MESSAGE_SHARDS) > 1,
+    'Requires several message shards.'
+)
+class MultiShardTests(TransactionTestCase):
+    """Test storing messages on several shards.
+
+    The scatter-gather path reads the shards from worker threads, which
+    only see committed rows, so this cannot run inside a TestCase."""
+
+    databases = '__all__'
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(
+            username='User',
+            email='email@example.com',
+            password='pass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.channels = {}
+        while len(self.channels) < len(settings.MESSAGE_SHARDS):
+            channel = Channel.objects.create(
+                creator=self.user,
+                name=f'Channel {Channel.objects.count()}'
+            )
+            self.channels.setdefault(
+                sharding.shard_for_channel(channel.id),
+                channel
+            )
+
+    def post_message(self, channel, text):
+        return self.client.post(
+            reverse('channel:channel-messages', args=[channel.id]),
+            {'text': text},
+            format='json'
+        )
+
+    def test_messages_stored_on_channel_shard(self):
+        """Test a posted message and its event land on its shard."""
+
+        for alias, channel in self.channels.items():
+            res = self.post_message(channel, alias)
+            self.assertEqual(res.status_code, 201)
+
+        for alias in settings.MESSAGE_SHARDS:
+            self.assertEqual(
+                list(Message.objects.using(alias).values_list(
+                    'text',
+                    flat=True
+                )),
+                [alias]
+            )
+            self.assertEqual(OutboxEvent.objects.using(alias).count(), 1)
+
+    def test_seq_allocated_on_shard(self):
+        """Test sequence numbers are allocated on the channel's shard in
+        the transaction inserting the message, and handed on to the
+        channel row once it commits."""
+
+        for alias, channel in self.channels.items():
+            with CaptureQueriesContext(connections['default']) as queries:
+                self.post_message(channel, 'One')
+            with self.assertRaises(RuntimeError):
+                with transaction.atomic(using=alias):
+                    Message.objects.create(channel=channel, text='Lost')
+                    raise RuntimeError
+            self.post_message(channel, 'Two')
+
+            self.assertFalse(any(
+                'last_message_seq" +' in query['sql'] for query in queries
+            ))
+            self.assertEqual(
+                list(Message.objects.for_channel(channel.id).order_by(
+                    'seq'
+                ).values_list('seq', flat=True)),
+                [1, 2]
+            )
+            self.assertEqual(
+                ChannelSequence.objects.using(alias).get(
+                    channel=channel
+                ).last_message_seq,
+                2
+            )
+            channel.refresh_from_db()
+            self.assertEqual(channel.last_message_seq, 2)
+
+    def test_list_and_update_read_from_shard(self):
+        """Test listing and editing messages find them on their shard."""
+
+        for channel in self.channels.values():
+            message_id = self.post_message(channel, 'Hello').data['id']
+
+            res = self.client.get(
+                reverse('channel:channel-messages', args=[channel.id])
+            )
+            self.assertEqual([m['id'] for m in res.data], [message_id])
+
+            res = self.client.patch(
+                reverse(
+                    'channel:channel-patch-messages',
+                    args=[channel.id, message_id]
+                ),
+                {'text': 'Edited'},
+                format='json'
+            )
+            self.assertEqual(res.status_code, 200)
+            self.assertEqual(
+                Message.objects.for_channel(channel.id).get().text,
+                'Edited'
+            )
+
+    def test_sync_merges_shards(self):
+        """Test syncing merges the messages of every shard by id."""
+
+        ids = [
+            self.post_message(channel, 'Hello').data['id']
+            for channel in self.channels.values()
+        ]
+
+        res = self.client.get(reverse('channel:channel-sync'))
+
+        self.assertEqual([m['id'] for m in res.data], sorted(ids))
+
+    def test_delete_channel_deletes_shard_messages(self):
+        """Test deleting a channel deletes its messages on its shard."""
+
+        for channel in self.channels.values():
+            self.post_message(channel, 'Hello')
+            channel.delete()
+
+        for alias in settings.MESSAGE_SHARDS:
+            self.assertFalse(Message.objects.using(alias).exists())
+
+    def test_relay_outbox_goes_over_shards(self):
+        """Test the outbox relay delivers the events of every shard."""
+
+        for channel in self.channels.values():
+            self.post_message(channel, 'Hello')
+
+        for alias in outbox.relay_databases():
+            outbox.relay_batch(using=alias)
+
+        for alias in settings.MESSAGE_SHARDS:
+            self.assertFalse(OutboxEvent.objects.using(alias).exists())
@@ -0,0 +1,179 @@
+"""
+Tests for the Snowflake id generator.
+"""
+
+import threading
+from unittest.mock import patch
+from datetime import datetime, timezone
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.contrib.auth import get_user_model
+
+from core import models
+from core import snowflake
+from message.serializers import MessageSerializer
+
+
+class FakeClock:
+    """Clock returning preset milliseconds."""
+
+    def __init__(self, *values):
+        self.values = list(values)
+
+    def __call__(self):
+        if len(self.values) > 1:
+            return self.values.pop(0)
+        return self.values[0]
+
+
+class SnowflakeGeneratorTests(SimpleTestCase):
+    """Test generating ids."""
+
+    def test_id_layout(self):
+        """Test timestamp, node id and sequence are encoded in the id."""
+
+        epoch = snowflake.DEFAULT_EPOCH_MS
+        generator = snowflake.SnowflakeGenerator(
+            node_id=5,
+            clock=FakeClock(epoch + 1000)
+        )
+
+        first = generator.next_id()
+        second = generator.next_id()
+
+        self.assertEqual(first >> snowflake.TIMESTAMP_SHIFT, 1000)
+        self.assertEqual(
+            (first >> snowflake.NODE_SHIFT) & snowflake.MAX_NODE_ID,
+            5
+        )
+        self.assertEqual(first & snowflake.MAX_SEQUENCE, 0)
+        self.assertEqual(second & snowflake.MAX_SEQUENCE, 1)
+
+    def test_invalid_node_id_raises_error(self):
+        """Test a node id outside the node bits raises ValueError."""
+
+        with self.assertRaises(ValueError):
+            snowflake.SnowflakeGenerator(node_id=snowflake.MAX_NODE_ID + 1)
+
+    def test_clock_moving_backwards_keeps_ids_increasing(self):
+        """Test ids keep increasing when the clock steps back."""
+
+        epoch = snowflake.DEFAULT_EPOCH_MS
+        generator = snowflake.SnowflakeGenerator(
+            node_id=1,
+            clock=FakeClock(epoch + 5000, epoch + 4000, epoch + 4001)
+        )
+
+        with self.assertLogs('core.snowflake', level='WARNING'):
+            ids = generator.next_ids(3)
+
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(set(ids)), 3)
+
+    def test_sequence_overflow_borrows_next_millisecond(self):
+        """Test running out of sequence numbers moves to the next ms."""
+
+        epoch = snowflake.DEFAULT_EPOCH_MS
+        generator = snowflake.SnowflakeGenerator(
+            node_id=1,
+            clock=FakeClock(epoch + 10)
+        )
+
+        with patch.object(snowflake.logger, 'warning') as warning:
+            ids = generator.next_ids(snowflake.MAX_SEQUENCE + 3)
+
+        warning.assert_not_called()
+        self.assertEqual(len(set(ids)), len(ids))
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(ids[-1] >> snowflake.TIMESTAMP_SHIFT, 11)
+
+    def test_ids_unique_across_threads(self):
+        """Test concurrent callers never get the same id."""
+
+        generator = snowflake.SnowflakeGenerator(node_id=1)
+        results = []
+
+        def generate():
+            results.extend(generator.next_ids(2000))
+
+        threads = [threading.Thread(target=generate) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(set(results)), 8000)
+
+    @override_settings(SNOWFLAKE_NODE_ID=None)
+    def test_node_id_required(self):
+        """Test the process wide generator needs an explicit node id."""
+
+        with patch.object(snowflake, '_generator', None):
+            with self.assertRaises(ImproperlyConfigured):
+                snowflake.next_id()
+
+    def test_min_id_for_matches_timestamp(self):
+        """Test ids can be bounded by the time they were generated at."""
+
+        moment = datetime(2024, 5, 1, tzinfo=timezone.utc)
+        lower = snowflake.min_id_for(moment)
+
+        self.assertEqual(snowflake.to_datetime(lower), moment)
+
+
+@override_settings(SNOWFLAKE_IDS=True, SNOWFLAKE_NODE_ID=0)
+class MessageSnowflakeIdTests(TestCase):
+    """Test messages get Snowflake ids."""
+
+    databases = '__all__'
+
+    def test_message_ids_generated_before_insert(self):
+        """Test messages get increasing ids from the generator."""
+
+        sender = get_user_model().objects.create(
+            username='Sender User',
+            email='sender@example.com',
+            password='mypassword'
+        )
+        channel = models.Channel.objects.create(
+            creator=sender,
+            name='Channel'
+        )
+
+        first = models.Message.objects.create(
+            sender=sender,
+            channel=channel,
+            text='First'
+        )
+        second = models.Message.objects.create(
+            sender=sender,
+            channel=channel,
+            text='Second'
+        )
+
+        self.assertGreater(first.id, 1 << snowflake.TIMESTAMP_SHIFT)
+        self.assertGreater(second.id, first.id)
+
+    def test_message_ids_serialized_as_strings(self):
+        """Test ids above 2^53 are written out as exact strings."""
+
+        sender = get_user_model().objects.create(
+            username='Sender User',
+            email='sender@example.com',
+            password='mypassword'
+        )
+        channel = models.Channel.objects.create(
+            creator=sender,
+            name='Channel'
+        )
+        message = models.Message(
+            id=(1 << 53) + 1,
+            sender=sender,
+            channel=channel,
+            text='Big'
+        )
+
+        data = MessageSerializer(message).data
+
+        self.assertEqual(data['id'], str((1 << 53) + 1))
@@ -0,0 +1,30 @@
+"""
+Serializers for the membership API.
+"""
+
+from rest_framework import serializers
+
+from core.models import Membership
+
+
+MAX_USERNAMES = 10000
+
+
+class BulkMembersSerializer(serializers.Serializer):
+    """Serializer for a list of channel members."""
+
+    usernames = serializers.ListField(
+        child=serializers.CharField(max_length=255),
+        allow_empty=False,
+        max_length=MAX_USERNAMES
+    )
+
+
+class BulkPermissionsSerializer(BulkMembersSerializer):
+    """Serializer for a list of channel members and a permission
+    level."""
+
+    permissions = serializers.ChoiceField(
+        choices=Membership.PERMISSIONS_CHOICES,
+        default=Membership.READ
+    )
@@ -0,0 +1,195 @@
+"""
+Tests for the membership API.
+"""
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Channel, Membership
+
+
+INVITE_URL = 'membership:membership-invite'
+PERMISSIONS_URL = 'membership:membership-change-permissions'
+REMOVE_URL = 'membership:membership-remove'
+
+
+def create_user(username):
+    return get_user_model().objects.create(
+        username=username,
+        email=f'{username}@example.com',
+        password='pass123'
+    )
+
+
+class MembershipAPITests(TestCase):
+    """Test managing channel members in bulk."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = create_user('admin')
+        self.client.force_authenticate(self.admin)
+        self.channel = Channel.objects.create(
+            creator=self.admin,
+            name='Channel'
+        )
+
+    def post(self, url_name, payload):
+        return self.client.post(
+            reverse(url_name, args=[self.channel.id]),
+            payload,
+            format='json'
+        )
+
+    def invite(self, usernames, permissions=Membership.READ):
+        return self.post(INVITE_URL, {
+            'usernames': usernames,
+            'permissions': permissions
+        })
+
+    def permissions_of(self, username):
+        return Membership.objects.get(
+            channel=self.channel,
+            member__username=username
+        ).permissions
+
+    def test_invite_returns_result_per_username(self):
+        """Test inviting reports every username's outcome."""
+
+        create_user('new')
+        create_user('member')
+        self.invite(['member'])
+
+        res = self.invite(
+            ['new', 'member', 'unknown', 'new'],
+            permissions=Membership.WRITE
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [
+            {'username': 'new', 'status': 'invited'},
+            {'username': 'member', 'status': 'already_member'},
+            {'username': 'unknown', 'status': 'not_found'},
+        ])
+        self.assertEqual(self.permissions_of('new'), Membership.WRITE)
+        self.assertEqual(self.permissions_of('member'), Membership.READ)
+
+    def test_invite_query_count_independent_of_size(self):
+        """Test inviting many users takes as many queries as one."""
+
+        usernames = [f'user{i}' for i in range(50)]
+        for username in usernames:
+            create_user(username)
+
+        with CaptureQueriesContext(connection) as one:
+            self.invite(usernames[:1])
+        with CaptureQueriesContext(connection) as many:
+            self.invite(usernames[1:])
+
+        self.assertEqual(len(one), len(many))
+        self.assertEqual(
+            Membership.objects.filter(channel=self.channel).count(),
+            51
+        )
+
+    def test_invited_members_start_at_current_seq(self):
+        """Test invited members have no unread messages from before they
+        joined."""
+
+        create_user('member')
+        Channel.objects.filter(pk=self.channel.pk).update(
+            last_message_seq=7
+        )
+
+        self.invite(['member'])
+
+        self.assertEqual(
+            Membership.objects.get(
+                channel=self.channel,
+                member__username='member'
+            ).last_read_seq,
+            7
+        )
+
+    def test_member_count_follows_memberships(self):
+        """Test the channel's member count follows invites and
+        removals."""
+
+        create_user('member')
+        create_user('other')
+
+        self.invite(['member', 'other'])
+        invited = Channel.objects.get(pk=self.channel.pk).member_count
+        self.post(REMOVE_URL, {'usernames': ['member']})
+
+        self.assertEqual(invited, 3)
+        self.assertEqual(
+            Channel.objects.get(pk=self.channel.pk).member_count,
+            2
+        )
+
+    def test_change_permissions(self):
+        """Test setting permissions of members, but not the creator."""
+
+        create_user('member')
+        create_user('outsider')
+        self.invite(['member'])
+
+        res = self.post(PERMISSIONS_URL, {
+            'usernames': ['member', 'outsider', 'admin'],
+            'permissions': Membership.ADMIN
+        })
+
+        self.assertEqual([r['status'] for r in res.data], [
+            'updated',
+            'not_member',
+            'forbidden',
+        ])
+        self.assertEqual(self.permissions_of('member'), Membership.ADMIN)
+
+    def test_remove_members(self):
+        """Test removing members, but not the creator."""
+
+        create_user('member')
+        self.invite(['member'])
+
+        res = self.post(REMOVE_URL, {'usernames': ['member', 'admin']})
+
+        self.assertEqual(
+            [r['status'] for r in res.data],
+            ['removed', 'forbidden']
+        )
+        self.assertEqual(
+            list(self.channel.members.values_list('username', flat=True)),
+            ['admin']
+        )
+
+    def test_invalid_permissions_error(self):
+        """Test an unknown permission level returns an error."""
+
+        create_user('member')
+
+        res = self.invite(['member'], permissions=7)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_requires_admin_permissions(self):
+        """Test members without admin permissions cannot manage
+        members."""
+
+        writer = create_user('writer')
+        self.invite(['writer'], permissions=Membership.WRITE)
+        create_user('new')
+        self.client.force_authenticate(writer)
+
+        res = self.invite(['new'])
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(
+            Membership.objects.filter(member__username='new').exists()
+        )
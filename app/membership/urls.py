@@ -0,0 +1,22 @@
+"""
+URL mappings for the membership API.
+"""
+
+from django.urls import (
+    path,
+    include,
+)
+
+from rest_framework.routers import DefaultRouter
+
+from membership import views
+
+
+router = DefaultRouter()
+router.register('channels', views.MembershipViewSet, basename='membership')
+
+app_name = 'membership'
+
+urlpatterns = [
+    path('', include(router.urls)),
+]
@@ -0,0 +1,190 @@
+"""
+Views for the membership API.
+"""
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from rest_framework import viewsets
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from core import channel_lists
+from core.models import Channel, Membership
+from core.permissions import HasAdminPermissions
+from membership import serializers
+
+
+INVITED = 'invited'
+UPDATED = 'updated'
+REMOVED = 'removed'
+ALREADY_MEMBER = 'already_member'
+NOT_MEMBER = 'not_member'
+NOT_FOUND = 'not_found'
+FORBIDDEN = 'forbidden'
+
+
+class MembershipViewSet(viewsets.GenericViewSet):
+    """Manage the members of a channel in bulk.
+
+    Every action takes a list of usernames, resolves them with a single
+    query, writes all rows in one transaction and answers with the
+    outcome of every username."""
+
+    queryset = Channel.objects.active()
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated, HasAdminPermissions]
+
+    def _resolve(self, serializer):
+        """Return the requested usernames, without duplicates, and the
+        ids of the users found by username."""
+
+        usernames = list(dict.fromkeys(
+            serializer.validated_data['usernames']
+        ))
+        users = dict(
+            get_user_model().objects.filter(
+                username__in=usernames
+            ).values_list('username', 'id')
+        )
+        return usernames, users
+
+    def _members(self, channel, user_ids):
+        """Return the memberships of the channel among the users."""
+
+        return {
+            membership.member_id: membership
+            for membership in Membership.objects.filter(
+                channel=channel,
+                member__in=user_ids
+            ).only('id', 'member_id', 'permissions')
+        }
+
+    def _results(self, usernames, statuses):
+        return Response([
+            {'username': username, 'status': statuses[username]}
+            for username in usernames
+        ])
+
+    @action(
+        methods=['post'],
+        detail=True,
+        serializer_class=serializers.BulkPermissionsSerializer
+    )
+    def invite(self, request, pk=None):
+        """Add users to the channel with a permission level."""
+
+        channel = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        permissions = serializer.validated_data['permissions']
+        usernames, users = self._resolve(serializer)
+
+        with transaction.atomic():
+            members = self._members(channel, users.values())
+            statuses = {}
+            new = []
+            for username in usernames:
+                user_id = users.get(username)
+                if user_id is None:
+                    statuses[username] = NOT_FOUND
+                elif user_id in members:
+                    statuses[username] = ALREADY_MEMBER
+                else:
+                    statuses[username] = INVITED
+                    new.append(Membership(
+                        channel=channel,
+                        member_id=user_id,
+                        inviter=request.user,
+                        permissions=permissions,
+                        last_read_seq=channel.last_message_seq
+                    ))
+            Membership.objects.bulk_create(
+                new,
+                batch_size=1000,
+                ignore_conflicts=True
+            )
+            Channel.objects.recount_members([channel.id])
+            channel_lists.bump(
+                membership.member_id for membership in new
+            )
+
+        return self._results(usernames, statuses)
+
+    @action(
+        methods=['post'],
+        detail=True,
+        url_path='permissions',
+        serializer_class=serializers.BulkPermissionsSerializer
+    )
+    def change_permissions(self, request, pk=None):
+        """Set the permission level of members of the channel.
+
+        The creator's membership cannot be changed."""
+
+        channel = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        permissions = serializer.validated_data['permissions']
+        usernames, users = self._resolve(serializer)
+
+        with transaction.atomic():
+            members = self._members(channel, users.values())
+            statuses = {}
+            changed = []
+            for username in usernames:
+                user_id = users.get(username)
+                if user_id is None:
+                    statuses[username] = NOT_FOUND
+                elif user_id not in members:
+                    statuses[username] = NOT_MEMBER
+                elif user_id == channel.creator_id:
+                    statuses[username] = FORBIDDEN
+                else:
+                    statuses[username] = UPDATED
+                    membership = members[user_id]
+                    membership.permissions = permissions
+                    changed.append(membership)
+            Membership.objects.bulk_update(
+                changed,
+                ['permissions'],
+                batch_size=1000
+            )
+
+        return self._results(usernames, statuses)
+
+    @action(
+        methods=['post'],
+        detail=True,
+        serializer_class=serializers.BulkMembersSerializer
+    )
+    def remove(self, request, pk=None):
+        """Remove members from the channel.
+
+        The creator cannot be removed."""
+
+        channel = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        usernames, users = self._resolve(serializer)
+
+        with transaction.atomic():
+            members = self._members(channel, users.values())
+            statuses = {}
+            removed = []
+            for username in usernames:
+                user_id = users.get(username)
+                if user_id is None:
+                    statuses[username] = NOT_FOUND
+                elif user_id not in members:
+                    statuses[username] = NOT_MEMBER
+                elif user_id == channel.creator_id:
+                    statuses[username] = FORBIDDEN
+                else:
+                    statuses[username] = REMOVED
+                    removed.append(members[user_id].id)
+            Membership.objects.filter(id__in=removed).delete()
+
+        return self._results(usernames, statuses)
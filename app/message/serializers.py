@@ -2,15 +2,99 @@
 Serializers message API.
 """
 
+from django.utils.translation import gettext as _
+
 from rest_framework import serializers
+from core import archive
 from core.models import Message
 
 
+class IdField(serializers.IntegerField):
+    """Integer id written out as a string.
+
+    Snowflake ids do not fit in the 53 bits a JSON number keeps in
+    JavaScript. Both forms are accepted as input."""
+
+    def to_representation(self, value):
+        return str(int(value))
+
+
 class MessageSerializer(serializers.ModelSerializer):
-    """Serializer class for message model."""
+    """Serializer class for message model.
+
+    `thread_root`, `reply_count`, `last_reply_at` and
+    `reaction_counts` are stored on the message itself, so listing
+    messages with their thread and reaction summaries takes no extra
+    query."""
+
+    id = IdField(read_only=True)
+    parent = IdField(
+        source='parent_id',
+        required=False,
+        allow_null=True
+    )
+    thread_root = IdField(
+        source='thread_root_id',
+        read_only=True
+    )
 
     class Meta:
 
         model = Message
-        fields = ['id', 'channel', 'text', 'sender', 'sent_date']
-        read_only_fields = ['id', 'sent_date']
+        fields = [
+            'id',
+            'channel',
+            'seq',
+            'text',
+            'sender',
+            'sent_date',
+            'parent',
+            'thread_root',
+            'reply_count',
+            'last_reply_at',
+            'reaction_counts',
+        ]
+        read_only_fields = [
+            'id',
+            'seq',
+            'sent_date',
+            'reply_count',
+            'last_reply_at',
+            'reaction_counts',
+        ]
+
+    def validate(self, attrs):
+        """Replies are to messages of the same channel and cannot be
+        moved to another thread."""
+
+        parent_id = attrs.pop('parent_id', None)
+        if self.instance is not None:
+            if parent_id not in (None, self.instance.parent_id):
+                raise serializers.ValidationError(
+                    {'parent': _('The parent of a message cannot change.')}
+                )
+            return attrs
+
+        if parent_id is not None:
+            parent = Message.objects.for_channel(
+                attrs['channel'].id
+            ).with_id(parent_id).first()
+            if parent is None and archive.is_archived(
+                    attrs['channel'].id,
+                    parent_id
+            ):
+                raise serializers.ValidationError(
+                    {'parent': _('Archived messages cannot be replied to.')}
+                )
+            if parent is None:
+                raise serializers.ValidationError(
+                    {'parent': _('Parent must be in the same channel.')}
+                )
+            attrs['parent'] = parent
+        return attrs
+
+
+class ReactionSerializer(serializers.Serializer):
+    """Serializer for toggling a reaction."""
+
+    emoji = serializers.RegexField(r'^[^\s"\\]+$', max_length=32)
@@ -0,0 +1,224 @@
+"""
+Fan-out of channel events to the connections of one process.
+
+A hub holds one pub/sub subscription per channel, whatever the number
+of local connections on it. Every event is encoded once and the same
+bytes are queued for each subscriber. Subscribers have bounded queues,
+so a slow connection either loses its oldest frames or is evicted, but
+never stalls the others or grows memory without limit. A writer takes
+everything queued at once, which turns a burst of events into a single
+write.
+"""
+
+import asyncio
+import json
+import logging
+import weakref
+from collections import deque
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from realtime.pubsub import get_pubsub
+
+
+logger = logging.getLogger(__name__)
+
+DROP_OLDEST = 'drop_oldest'
+DISCONNECT = 'disconnect'
+
+
+def format_event(event_type, data, event_id=None):
+    """Return an SSE frame."""
+
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event_type}')
+    lines.append('data: ' + json.dumps(
+        data,
+        cls=DjangoJSONEncoder,
+        separators=(',', ':')
+    ))
+    return ('\n'.join(lines) + '\n\n').encode()
+
+
+class Frame:
+    """Event together with its encoded SSE frame."""
+
+    __slots__ = ('event', 'event_id', 'data')
+
+    def __init__(self, event):
+        self.event = event
+        self.event_id = None
+        if event['type'] == 'message.created':
+            self.event_id = event['message']['seq']
+        self.data = format_event(
+            event['type'],
+            event.get('message', event),
+            self.event_id
+        )
+
+
+class SubscriberEvicted(Exception):
+    """Raised to a subscriber that fell too far behind."""
+
+
+class Subscriber:
+    """Bounded queue of frames for one connection."""
+
+    def __init__(self, hub, channel_id, maxsize, policy):
+        self.hub = hub
+        self.channel_id = channel_id
+        self.maxsize = maxsize
+        self.policy = policy
+        self.dropped = 0
+        self.evicted = False
+        self.closed = False
+        self._queue = deque()
+        self._ready = asyncio.Event()
+
+    @property
+    def depth(self):
+        return len(self._queue)
+
+    def offer(self, frame):
+        """Queue a frame, applying the overflow policy when full."""
+
+        if self.closed:
+            return
+        if len(self._queue) >= self.maxsize:
+            if self.policy == DROP_OLDEST:
+                self._queue.popleft()
+                self.dropped += 1
+                self.hub.metrics['dropped'] += 1
+            else:
+                self.evicted = True
+                self.hub.metrics['evicted'] += 1
+                logger.info(
+                    'Evicted slow subscriber of channel %s.',
+                    self.channel_id
+                )
+                self.close()
+                self._ready.set()
+                return
+        self._queue.append(frame)
+        self._ready.set()
+
+    async def get(self, timeout=None):
+        """Return every queued frame, waiting up to `timeout` seconds
+        for one. Returns an empty list on timeout."""
+
+        if not self._queue and not self.evicted:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        if self.evicted:
+            raise SubscriberEvicted
+        frames = list(self._queue)
+        self._queue.clear()
+        return frames
+
+    def close(self):
+        """Stop receiving frames."""
+
+        if not self.closed:
+            self.closed = True
+            self.hub.remove(self)
+
+
+class FanoutHub:
+    """Distributes the events of subscribed channels to the local
+    subscribers of one event loop."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._channels = {}
+        self.metrics = {
+            'events': 0,
+            'frames_queued': 0,
+            'dropped': 0,
+            'evicted': 0,
+        }
+
+    def subscribe(self, channel_id, maxsize=100, policy=DISCONNECT):
+        """Return a new subscriber of a channel."""
+
+        channel_id = int(channel_id)
+        subscriber = Subscriber(self, channel_id, maxsize, policy)
+        if channel_id not in self._channels:
+            subscription = self.backend.subscribe(
+                channel_id,
+                lambda event: self.dispatch(channel_id, event)
+            )
+            self._channels[channel_id] = (subscription, set())
+        self._channels[channel_id][1].add(subscriber)
+        return subscriber
+
+    def remove(self, subscriber):
+        """Forget a subscriber, and the channel with its last one."""
+
+        entry = self._channels.get(subscriber.channel_id)
+        if entry is None:
+            return
+        subscription, subscribers = entry
+        subscribers.discard(subscriber)
+        if not subscribers:
+            del self._channels[subscriber.channel_id]
+            subscription.close()
+
+    def dispatch(self, channel_id, event):
+        """Encode an event once and queue it for every subscriber."""
+
+        entry = self._channels.get(channel_id)
+        if entry is None:
+            return
+        frame = Frame(event)
+        subscribers = list(entry[1])
+        self.metrics['events'] += 1
+        self.metrics['frames_queued'] += len(subscribers)
+        for subscriber in subscribers:
+            subscriber.offer(frame)
+
+    def stats(self):
+        """Return counters and current queue depths."""
+
+        depths = [
+            subscriber.depth
+            for _, subscribers in list(self._channels.values())
+            for subscriber in list(subscribers)
+        ]
+        return {
+            **self.metrics,
+            'channels': len(self._channels),
+            'subscribers': len(depths),
+            'queue_depth_max': max(depths, default=0),
+            'queue_depth_total': sum(depths),
+        }
+
+
+_hubs = weakref.WeakKeyDictionary()
+
+
+def get_hub():
+    """Return the hub of the running event loop."""
+
+    loop = asyncio.get_running_loop()
+    hub = _hubs.get(loop)
+    if hub is None:
+        hub = _hubs[loop] = FanoutHub(get_pubsub())
+    return hub
+
+
+def get_stats():
+    """Return the stats of every hub in the process, added up."""
+
+    totals = {}
+    for hub in list(_hubs.values()):
+        for key, value in hub.stats().items():
+            if key == 'queue_depth_max':
+                totals[key] = max(totals.get(key, 0), value)
+            else:
+                totals[key] = totals.get(key, 0) + value
+    return totals
@@ -0,0 +1,107 @@
+"""
+Consistent-hash ownership of channels across real-time gateway nodes.
+
+Each channel is owned by one gateway node. Connections for a channel
+are sent to its owner, so a node only subscribes to, and receives the
+events of, the channels it owns. Every node is placed on the ring many
+times (virtual nodes) to spread channels evenly; when a node joins or
+leaves only the channels on its arcs move, about 1/N of them.
+"""
+
+import bisect
+import threading
+
+from django.conf import settings
+
+from core.sharding import stable_hash
+
+
+DEFAULT_VNODES = 160
+
+
+class HashRing:
+    """Ring of nodes mapping keys to their owner."""
+
+    def __init__(self, nodes=(), vnodes=DEFAULT_VNODES):
+        self.vnodes = vnodes
+        self._hashes = []
+        self._owners = {}
+        self._nodes = set()
+        for node in nodes:
+            self.add(node)
+
+    @property
+    def nodes(self):
+        return sorted(self._nodes)
+
+    def add(self, node):
+        """Place a node on the ring."""
+
+        if node in self._nodes:
+            return
+        self._nodes.add(node)
+        for replica in range(self.vnodes):
+            point = stable_hash(f'{node}#{replica}')
+            self._owners[point] = node
+            bisect.insort(self._hashes, point)
+
+    def remove(self, node):
+        """Take a node off the ring."""
+
+        if node not in self._nodes:
+            return
+        self._nodes.discard(node)
+        for replica in range(self.vnodes):
+            point = stable_hash(f'{node}#{replica}')
+            del self._owners[point]
+            index = bisect.bisect_left(self._hashes, point)
+            del self._hashes[index]
+
+    def node_for(self, key):
+        """Return the node owning a key, or None on an empty ring."""
+
+        if not self._hashes:
+            return None
+        index = bisect.bisect(self._hashes, stable_hash(key))
+        if index == len(self._hashes):
+            index = 0
+        return self._owners[self._hashes[index]]
+
+
+_ring = None
+_ring_lock = threading.Lock()
+
+
+def get_ring():
+    """Return the ring of the gateway nodes configured in settings."""
+
+    global _ring
+
+    if _ring is None:
+        with _ring_lock:
+            if _ring is None:
+                _ring = HashRing(settings.REALTIME_NODES)
+    return _ring
+
+
+def owner_url(channel_id):
+    """Return the base URL of the node owning a channel, or None when
+    this node owns it or no gateway nodes are configured."""
+
+    owner = get_ring().node_for(channel_id)
+    if owner is None or owner == settings.REALTIME_NODE_ID:
+        return None
+    return settings.REALTIME_NODES[owner].rstrip('/')
+
+
+def redirect_location(channel_id, path, query_string=''):
+    """Return where to redirect a request for a channel owned by
+    another node, or None when it is served here."""
+
+    base = owner_url(channel_id)
+    if base is None:
+        return None
+    location = base + path
+    if query_string:
+        location += '?' + query_string
+    return location
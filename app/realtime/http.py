@@ -0,0 +1,119 @@
+"""
+Helpers for the ASGI endpoints of the real-time API.
+"""
+
+import json
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+
+from rest_framework.authtoken.models import Token
+
+from core.models import Membership
+
+
+def get_header(scope, name):
+    """Return a request header as a string, or None."""
+
+    name = name.lower().encode('latin1')
+    for key, value in scope.get('headers', []):
+        if key.lower() == name:
+            return value.decode('latin1')
+    return None
+
+
+def get_query(scope):
+    """Return the query string parameters, last value wins."""
+
+    query = parse_qs(scope.get('query_string', b'').decode('latin1'))
+    return {key: values[-1] for key, values in query.items()}
+
+
+def database_sync_to_async(func):
+    """Run a function using the database in a worker thread and drop the
+    connection afterwards if it became unusable or too old."""
+
+    def inner(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(inner, thread_sensitive=True)
+
+
+@database_sync_to_async
+def authenticate(scope):
+    """Return the active user of the request's auth token, or None.
+
+    The token is read from the Authorization header, or from the
+    `token` query parameter for clients like EventSource that cannot
+    set headers."""
+
+    key = None
+    header = get_header(scope, 'authorization')
+    if header and header.startswith('Token '):
+        key = header[len('Token '):].strip()
+    if key is None:
+        key = get_query(scope).get('token')
+    if not key:
+        return None
+
+    try:
+        token = Token.objects.select_related('user').get(key=key)
+    except Token.DoesNotExist:
+        return None
+    return token.user if token.user.is_active else None
+
+
+@database_sync_to_async
+def has_read_permissions(user, channel_id):
+    """Return whether the user is a member of the channel."""
+
+    return Membership.objects.filter(
+        channel=channel_id,
+        channel__deleted_at__isnull=True,
+        member=user
+    ).exists()
+
+
+def encode_json(data):
+    """Return data as JSON bytes."""
+
+    return json.dumps(data, cls=DjangoJSONEncoder).encode()
+
+
+async def send_json(send, status, data, headers=()):
+    """Send a complete JSON response."""
+
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json')] + list(headers),
+    })
+    await send({
+        'type': 'http.response.body',
+        'body': encode_json(data),
+    })
+
+
+async def check_channel_access(scope, send, channel_id):
+    """Authenticate the request and check read access to a channel.
+
+    Sends the error response and returns None when access is denied,
+    otherwise returns the user."""
+
+    user = await authenticate(scope)
+    if user is None:
+        await send_json(send, 401, {
+            'detail': 'Authentication credentials were not provided.'
+        })
+        return None
+    if not await has_read_permissions(user, channel_id):
+        await send_json(send, 403, {
+            'detail': 'You do not have permission to perform this action.'
+        })
+        return None
+    return user
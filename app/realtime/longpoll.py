@@ -0,0 +1,95 @@
+"""
+Long-poll variant of the channel messages endpoint.
+
+`GET /api/channel/channels/{pk}/messages/?after_seq=<seq>&wait=<seconds>`
+returns the messages with a sequence number greater than `after_seq`
+right away if there are any.
+Otherwise the request is parked on the event loop until a new message
+is published on the channel or the wait runs out, in which case an
+empty list is returned. A parked request holds no thread and no
+database connection.
+
+The cursor is the channel sequence number rather than the message id:
+sequence numbers become visible in order, while a message with a lower
+id can commit after a newer one and would be skipped by an id cursor.
+"""
+
+import asyncio
+import time
+
+from realtime.fanout import DROP_OLDEST, get_hub
+from realtime.http import (
+    check_channel_access,
+    get_query,
+    send_json,
+)
+from realtime.sse import get_messages_after_seq, wait_for_disconnect
+
+
+MAX_WAIT = 30
+MESSAGES_LIMIT = 500
+
+
+def wants_long_poll(scope):
+    """Return whether a messages request asks to wait."""
+
+    return 'wait' in get_query(scope)
+
+
+async def wait_for_messages(scope, receive, send, pk):
+    """ASGI handler answering a long-poll for new messages."""
+
+    channel_id = int(pk)
+    query = get_query(scope)
+    after = query.get('after_seq', '')
+    wait = query.get('wait', '')
+    if not after.isdigit() or not wait.isdigit():
+        await send_json(send, 400, {
+            'detail': 'after_seq and wait must be non-negative integers.'
+        })
+        return
+    after = int(after)
+    wait = min(int(wait), MAX_WAIT)
+
+    user = await check_channel_access(scope, send, channel_id)
+    if user is None:
+        return
+
+    # Subscribe before looking, so a message posted in between wakes us.
+    subscriber = get_hub().subscribe(
+        channel_id,
+        maxsize=MESSAGES_LIMIT,
+        policy=DROP_OLDEST
+    )
+    disconnect = asyncio.ensure_future(wait_for_disconnect(receive))
+    try:
+        messages = await get_messages_after_seq(
+            channel_id,
+            after,
+            MESSAGES_LIMIT
+        )
+        deadline = time.monotonic() + wait
+        while not messages and not disconnect.done():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            getter = asyncio.ensure_future(subscriber.get(timeout=remaining))
+            await asyncio.wait(
+                {getter, disconnect},
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            if not getter.done():
+                getter.cancel()
+                break
+            messages = [
+                frame.event['message']
+                for frame in getter.result()
+                if frame.event_id is not None and frame.event_id > after
+            ]
+        if disconnect.done():
+            return
+    finally:
+        disconnect.cancel()
+        subscriber.close()
+
+    await send_json(send, 200, messages)
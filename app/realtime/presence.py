@@ -0,0 +1,214 @@
+"""
+In-memory presence and typing indicators.
+
+Presence is high-frequency and short-lived, so it never touches the
+database. A registry keeps, per channel, the users seen recently and
+when they expire. Expiry is driven by a heap of deadlines; renewing a
+user pushes a new deadline and leaves the old entry to be skipped when
+it comes up. A timer is armed for the earliest deadline, so users go
+offline or stop typing on time even when nothing else touches the
+registry. Changes are broadcast as events on the channel through the
+pub/sub backend.
+
+A user can hold several connections to a channel, such as streams in
+two tabs. Connections are counted, and closing one only marks the user
+gone when it was their last.
+"""
+
+import heapq
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from realtime.pubsub import get_pubsub
+
+
+logger = logging.getLogger(__name__)
+
+PRESENCE_TTL = 45
+TYPING_TTL = 6
+
+ONLINE = 'online'
+TYPING = 'typing'
+
+EVENTS = {
+    (ONLINE, True): 'presence.online',
+    (ONLINE, False): 'presence.offline',
+    (TYPING, True): 'typing.started',
+    (TYPING, False): 'typing.stopped',
+}
+
+
+def publish_delta(channel_id, event):
+    """Broadcast a presence change on its channel."""
+
+    try:
+        get_pubsub().publish(channel_id, event)
+    except Exception:
+        logger.exception('Publishing presence of channel %s failed.',
+                         channel_id)
+
+
+def start_timer(delay, function):
+    """Call `function` in a daemon thread after `delay` seconds and
+    return the timer."""
+
+    timer = threading.Timer(delay, function)
+    timer.daemon = True
+    timer.start()
+    return timer
+
+
+class PresenceRegistry:
+    """Online and typing users per channel, expiring after a TTL."""
+
+    def __init__(self, clock=time.monotonic, on_change=publish_delta,
+                 schedule=start_timer):
+        self._clock = clock
+        self._on_change = on_change
+        self._schedule = schedule
+        self._lock = threading.Lock()
+        self._states = {
+            ONLINE: defaultdict(dict),
+            TYPING: defaultdict(dict),
+        }
+        self._deadlines = []
+        self._connections = defaultdict(int)
+        self._timer = None
+        self._timer_deadline = None
+
+    def touch(self, channel_id, user_id, username, ttl=PRESENCE_TTL):
+        """Mark a user as online in a channel for `ttl` seconds."""
+
+        self._set(ONLINE, channel_id, user_id, username, ttl)
+
+    def start_typing(self, channel_id, user_id, username, ttl=TYPING_TTL):
+        """Mark a user as typing in a channel for `ttl` seconds."""
+
+        self._set(TYPING, channel_id, user_id, username, ttl)
+
+    def connect(self, channel_id, user_id, username, ttl=PRESENCE_TTL):
+        """Count a connection of a user to a channel and mark them as
+        online."""
+
+        with self._lock:
+            self._connections[channel_id, user_id] += 1
+        self.touch(channel_id, user_id, username, ttl)
+
+    def disconnect(self, channel_id, user_id):
+        """Count a closed connection, marking the user gone when it was
+        their last one to the channel."""
+
+        key = channel_id, user_id
+        with self._lock:
+            self._connections[key] -= 1
+            if self._connections[key] > 0:
+                return
+            del self._connections[key]
+        self.leave(channel_id, user_id)
+
+    def leave(self, channel_id, user_id):
+        """Mark a user as gone from a channel right away."""
+
+        deltas = []
+        with self._lock:
+            for kind in (TYPING, ONLINE):
+                users = self._states[kind].get(channel_id)
+                if users and users.pop(user_id, None) is not None:
+                    deltas.append((kind, channel_id, user_id, False))
+                    if not users:
+                        del self._states[kind][channel_id]
+        self._emit(deltas)
+
+    def online(self, channel_id):
+        """Return the users online in a channel."""
+
+        return self._members(ONLINE, channel_id)
+
+    def typing(self, channel_id):
+        """Return the users typing in a channel."""
+
+        return self._members(TYPING, channel_id)
+
+    def expire(self):
+        """Remove every entry whose deadline has passed."""
+
+        with self._lock:
+            deltas = self._expire(self._clock())
+        self._emit(deltas)
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer = None
+            self._timer_deadline = None
+        self.expire()
+
+    def _members(self, kind, channel_id):
+        self.expire()
+        with self._lock:
+            users = self._states[kind].get(channel_id, {})
+            return [
+                {'id': user_id, 'username': username}
+                for user_id, (_, username) in users.items()
+            ]
+
+    def _set(self, kind, channel_id, user_id, username, ttl):
+        now = self._clock()
+        deadline = now + ttl
+        with self._lock:
+            deltas = self._expire(now)
+            users = self._states[kind][channel_id]
+            if user_id not in users:
+                deltas.append((kind, channel_id, user_id, True))
+            users[user_id] = (deadline, username)
+            heapq.heappush(
+                self._deadlines,
+                (deadline, kind, channel_id, user_id)
+            )
+            self._arm_timer(now)
+        self._emit(deltas)
+
+    def _expire(self, now):
+        deltas = []
+        while self._deadlines and self._deadlines[0][0] <= now:
+            deadline, kind, channel_id, user_id = heapq.heappop(
+                self._deadlines
+            )
+            users = self._states[kind].get(channel_id)
+            entry = users.get(user_id) if users else None
+            if entry is None or entry[0] != deadline:
+                # Renewed or removed since this deadline was pushed.
+                continue
+            del users[user_id]
+            if not users:
+                del self._states[kind][channel_id]
+            deltas.append((kind, channel_id, user_id, False))
+        self._arm_timer(now)
+        return deltas
+
+    def _arm_timer(self, now):
+        """Make sure a timer fires at the earliest deadline. Called with
+        the lock held."""
+
+        if not self._deadlines:
+            return
+        deadline = self._deadlines[0][0]
+        if self._timer_deadline is not None and \
+                self._timer_deadline <= deadline:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = self._schedule(max(deadline - now, 0), self._on_timer)
+        self._timer_deadline = deadline
+
+    def _emit(self, deltas):
+        for kind, channel_id, user_id, present in deltas:
+            self._on_change(channel_id, {
+                'type': EVENTS[kind, present],
+                'channel': channel_id,
+                'user': user_id,
+            })
+
+
+registry = PresenceRegistry()
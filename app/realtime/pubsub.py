@@ -0,0 +1,334 @@
+"""
+Publish/subscribe of channel events between app processes.
+
+A backend delivers events published on a chat channel to every local
+subscriber of that channel. Subscribers living on an asyncio event loop
+get their callback scheduled on that loop, so events can be published
+from the sync request threads and consumed by async views.
+"""
+
+import asyncio
+import json
+import logging
+import select
+import socket
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.utils.module_loading import import_string
+
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """Callback subscribed to the events of one chat channel."""
+
+    def __init__(self, backend, channel_id, callback, loop=None):
+        self.backend = backend
+        self.channel_id = channel_id
+        self.callback = callback
+        self.loop = loop
+
+    def deliver(self, event):
+        """Run the callback, on the subscriber's loop if it has one."""
+
+        if self.loop is None:
+            self.callback(event)
+            return
+        try:
+            self.loop.call_soon_threadsafe(self.callback, event)
+        except RuntimeError:
+            # The loop is closed, the subscriber is gone.
+            self.close()
+
+    def close(self):
+        """Stop receiving events."""
+
+        self.backend.unsubscribe(self)
+
+
+class BasePubSub:
+    """Keeps track of local subscribers and delivers events to them."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+
+    def subscribe(self, channel_id, callback):
+        """Call `callback` with every event published on a channel.
+
+        When called from a coroutine the callback runs on the calling
+        event loop, otherwise on the publishing thread."""
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+
+        subscription = Subscription(self, int(channel_id), callback, loop)
+        with self._lock:
+            first = not self._subscriptions[subscription.channel_id]
+            self._subscriptions[subscription.channel_id].add(subscription)
+        if first:
+            self.channel_added(subscription.channel_id)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Remove a subscription."""
+
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.channel_id)
+            if subscriptions is None or subscription not in subscriptions:
+                return
+            subscriptions.discard(subscription)
+            last = not subscriptions
+            if last:
+                del self._subscriptions[subscription.channel_id]
+        if last:
+            self.channel_removed(subscription.channel_id)
+
+    def channels(self):
+        """Return the ids of the channels with local subscribers."""
+
+        with self._lock:
+            return list(self._subscriptions)
+
+    def deliver(self, channel_id, event):
+        """Hand an event to the local subscribers of a channel."""
+
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(int(channel_id), ()))
+        for subscription in subscriptions:
+            try:
+                subscription.deliver(event)
+            except Exception:
+                logger.exception(
+                    'Subscriber of channel %s failed.',
+                    channel_id
+                )
+
+    def publish(self, channel_id, event):
+        """Publish an event on a channel."""
+
+        raise NotImplementedError
+
+    def channel_added(self, channel_id):
+        """Called when a channel gets its first local subscriber."""
+
+    def channel_removed(self, channel_id):
+        """Called when a channel loses its last local subscriber."""
+
+
+class InMemoryPubSub(BasePubSub):
+    """Backend delivering events inside the current process only."""
+
+    def publish(self, channel_id, event):
+        """Publish an event on a channel."""
+
+        self.deliver(channel_id, event)
+
+
+def fetch_message_event(event):
+    """Rebuild an event whose message did not fit in the notification."""
+
+    from core.models import Message
+    from message.serializers import MessageSerializer
+
+    try:
+        message = Message.objects.for_channel(event['channel']).with_id(
+            event['id']
+        ).get()
+    except Message.DoesNotExist:
+        return None
+    return {
+        'type': event['type'],
+        'channel': event['channel'],
+        'message': MessageSerializer(message).data,
+    }
+
+
+class PostgresPubSub(BasePubSub):
+    """Backend fanning events out between processes with Postgres
+    LISTEN/NOTIFY.
+
+    Every chat channel is a notification channel of its own, and a
+    process only LISTENs on the channels it has subscribers for. A
+    listener thread owns a dedicated connection; when the connection
+    drops it reconnects and LISTENs again on every subscribed channel.
+    Events whose JSON does not fit in a notification are sent as a
+    reference and fetched by id on the receiving side."""
+
+    # Postgres rejects payloads of 8000 bytes or more.
+    MAX_PAYLOAD = 7900
+    PREFIX = 'chat_channel_'
+
+    def __init__(self, alias='default', fetch=fetch_message_event,
+                 reconnect_delay=1.0, max_reconnect_delay=30.0):
+        super().__init__()
+        self.alias = alias
+        self.fetch = fetch
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self._wakeup_recv, self._wakeup_send = socket.socketpair()
+        self._wakeup_recv.setblocking(False)
+        self._wakeup_send.setblocking(False)
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    @classmethod
+    def encode(cls, channel_id, event):
+        """Return the notification payload for an event."""
+
+        payload = json.dumps(event, cls=DjangoJSONEncoder)
+        if len(payload.encode()) <= cls.MAX_PAYLOAD:
+            return payload
+        return json.dumps({
+            'type': event['type'],
+            'channel': int(channel_id),
+            'id': event['message']['id'],
+            'truncated': True,
+        })
+
+    def publish(self, channel_id, event):
+        """Publish an event on a channel.
+
+        The NOTIFY runs on the request's connection, so inside a
+        transaction it is only sent on commit."""
+
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute(
+                'SELECT pg_notify(%s, %s)',
+                [self.PREFIX + str(int(channel_id)),
+                 self.encode(channel_id, event)]
+            )
+
+    def channel_added(self, channel_id):
+        self._ensure_listener()
+        self._wakeup()
+
+    def channel_removed(self, channel_id):
+        self._wakeup()
+
+    def _wakeup(self):
+        try:
+            self._wakeup_send.send(b'\0')
+        except OSError:
+            # The buffer is full, the listener is awake anyway.
+            pass
+
+    def _ensure_listener(self):
+        with self._thread_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._listen_forever,
+                name='pubsub-listener',
+                daemon=True
+            )
+            self._thread.start()
+
+    def _connect(self):
+        wrapper = connections[self.alias]
+        conn = wrapper.get_new_connection(wrapper.get_connection_params())
+        conn.autocommit = True
+        return conn
+
+    def _listen_forever(self):
+        delay = self.reconnect_delay
+        while True:
+            try:
+                conn = self._connect()
+            except Exception:
+                logger.exception('Pub/sub listener cannot connect.')
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+                continue
+
+            delay = self.reconnect_delay
+            try:
+                self._listen(conn)
+            except Exception:
+                logger.exception('Pub/sub listener lost its connection.')
+            finally:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            time.sleep(delay)
+
+    def _listen(self, conn):
+        listening = set()
+        while True:
+            wanted = set(self.channels())
+            with conn.cursor() as cursor:
+                for channel_id in wanted - listening:
+                    cursor.execute(f'LISTEN "{self.PREFIX}{channel_id}"')
+                for channel_id in listening - wanted:
+                    cursor.execute(f'UNLISTEN "{self.PREFIX}{channel_id}"')
+            listening = wanted
+
+            ready, _, _ = select.select(
+                [conn, self._wakeup_recv], [], [], 5.0
+            )
+            if self._wakeup_recv in ready:
+                self._wakeup_recv.recv(4096)
+            if not ready:
+                # Idle, make sure the connection is still alive.
+                with conn.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+
+            conn.poll()
+            while conn.notifies:
+                notify = conn.notifies.pop(0)
+                self._handle(notify.channel, notify.payload)
+
+    def _handle(self, name, payload):
+        channel_id = int(name[len(self.PREFIX):])
+        event = json.loads(payload)
+        if event.get('truncated'):
+            event = self.fetch(event)
+            if event is None:
+                return
+        self.deliver(channel_id, event)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_pubsub():
+    """Return the process wide backend configured in settings."""
+
+    global _backend
+
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = import_string(settings.PUBSUB_BACKEND)()
+    return _backend
+
+
+def publish_message(event_type, message_data):
+    """Publish a message event on the message's channel.
+
+    Real-time delivery is best effort; reliable side effects go through
+    the outbox instead."""
+
+    event = {
+        'type': event_type,
+        'channel': message_data['channel'],
+        'message': dict(message_data),
+    }
+    try:
+        get_pubsub().publish(message_data['channel'], event)
+    except Exception:
+        logger.exception(
+            'Publishing %s on channel %s failed.',
+            event_type,
+            message_data['channel']
+        )
@@ -0,0 +1,79 @@
+"""
+ASGI routing for the real-time endpoints.
+
+These endpoints hold connections open for a long time, so they are
+served as native ASGI handlers instead of Django views, which would tie
+up a thread for every open connection.
+"""
+
+import re
+
+from realtime import hashring, longpoll, sse
+
+
+class Route:
+    """ASGI handler bound to a method and a path pattern."""
+
+    def __init__(self, method, pattern, handler, when=None):
+        self.method = method
+        self.pattern = re.compile(pattern)
+        self.handler = handler
+        self.when = when
+
+    def match(self, scope):
+        """Return the path parameters if the route serves the request."""
+
+        if scope['method'] != self.method:
+            return None
+        match = self.pattern.fullmatch(scope['path'])
+        if match is None:
+            return None
+        if self.when is not None and not self.when(scope):
+            return None
+        return match.groupdict()
+
+
+routes = [
+    Route('GET', r'/api/channel/channels/(?P<pk>\d+)/stream/',
+          sse.channel_stream),
+    Route('GET', r'/api/channel/channels/(?P<pk>\d+)/messages/',
+          longpoll.wait_for_messages, when=longpoll.wants_long_poll),
+]
+
+
+class RealtimeRouter:
+    """ASGI application serving the real-time routes and passing every
+    other request on to Django.
+
+    Requests for a channel owned by another gateway node are redirected
+    there."""
+
+    def __init__(self, application, routes=routes):
+        self.application = application
+        self.routes = routes
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http':
+            for route in self.routes:
+                kwargs = route.match(scope)
+                if kwargs is not None:
+                    location = hashring.redirect_location(
+                        kwargs['pk'],
+                        scope['path'],
+                        scope.get('query_string', b'').decode('latin1')
+                    )
+                    if location is not None:
+                        return await redirect(send, location)
+                    return await route.handler(scope, receive, send, **kwargs)
+        return await self.application(scope, receive, send)
+
+
+async def redirect(send, location):
+    """Send the client to the node owning the channel."""
+
+    await send({
+        'type': 'http.response.start',
+        'status': 307,
+        'headers': [(b'location', location.encode('latin1'))],
+    })
+    await send({'type': 'http.response.body', 'body': b''})
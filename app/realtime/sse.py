@@ -0,0 +1,188 @@
+"""
+Server-Sent Events stream of a channel's messages.
+
+Clients that cannot use WebSockets open
+`GET /api/channel/channels/{pk}/stream/` and receive every message event
+of the channel. Read permission is checked once when the stream opens.
+Message events carry the message's sequence number in its channel as
+event id, so a reconnecting client sends it back as `Last-Event-ID` and
+gets the messages it missed replayed before the live events.
+
+Sequence numbers are handed out under a lock on the channel row that is
+held until the message commits, so within a channel they become visible
+in order. Message ids carry no such guarantee: a message with a lower id
+can commit after one with a higher id, and a cursor on ids would skip
+it.
+"""
+
+import asyncio
+import time
+
+from core.models import Message
+from message.serializers import MessageSerializer
+from realtime.fanout import (
+    DISCONNECT,
+    SubscriberEvicted,
+    format_event,
+    get_hub,
+)
+from realtime.http import (
+    check_channel_access,
+    database_sync_to_async,
+    get_header,
+    get_query,
+)
+from realtime.presence import registry as presence
+
+
+HEARTBEAT_INTERVAL = 15
+QUEUE_SIZE = 100
+REPLAY_LIMIT = 500
+RETRY_MS = 3000
+
+
+@database_sync_to_async
+def get_messages_after_seq(channel_id, seq, limit):
+    """Return up to `limit` serialized messages with a sequence number
+    greater than `seq`, in sequence order."""
+
+    queryset = Message.objects.for_channel(channel_id).filter(
+        seq__gt=seq
+    ).order_by('seq')[:limit]
+    return list(MessageSerializer(queryset, many=True).data)
+
+
+def get_last_event_id(scope):
+    """Return the sequence number the client has seen last, or None."""
+
+    value = get_header(scope, 'last-event-id')
+    if value is None:
+        value = get_query(scope).get('last_event_id')
+    if value is None or not value.isdigit():
+        return None
+    return int(value)
+
+
+async def wait_for_disconnect(receive):
+    """Return once the client has gone away."""
+
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+
+async def channel_stream(scope, receive, send, pk):
+    """ASGI handler streaming a channel's message events.
+
+    Every stream owns a bounded fan-out queue, and a burst of events is
+    written in one go. A stream whose client cannot keep up is evicted
+    instead of buffering without limit; the client reconnects and
+    catches up through the Last-Event-ID replay."""
+
+    channel_id = int(pk)
+    user = await check_channel_access(scope, send, channel_id)
+    if user is None:
+        return
+
+    # Subscribe before the replay, so nothing falls in between.
+    subscriber = get_hub().subscribe(
+        channel_id,
+        maxsize=QUEUE_SIZE,
+        policy=DISCONNECT
+    )
+    disconnect = asyncio.ensure_future(wait_for_disconnect(receive))
+    touch_presence = database_sync_to_async(presence.touch)
+    try:
+        await database_sync_to_async(presence.connect)(
+            channel_id,
+            user.id,
+            user.username
+        )
+        touched = time.monotonic()
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        await send({
+            'type': 'http.response.body',
+            'body': f'retry: {RETRY_MS}\n\n'.encode(),
+            'more_body': True,
+        })
+
+        cursor = get_last_event_id(scope)
+        if cursor is not None:
+            messages = await get_messages_after_seq(
+                channel_id,
+                cursor,
+                REPLAY_LIMIT
+            )
+            for message in messages:
+                await send({
+                    'type': 'http.response.body',
+                    'body': format_event(
+                        'message.created',
+                        message,
+                        message['seq']
+                    ),
+                    'more_body': True,
+                })
+            if messages:
+                cursor = messages[-1]['seq']
+            if len(messages) == REPLAY_LIMIT:
+                # More history is missing, let the client reconnect
+                # from the last replayed message.
+                subscriber.close()
+
+        # Live events are only checked against the replayed messages:
+        # two commits can be published out of order, so an event with a
+        # lower sequence number than the last one sent is not a repeat.
+        replayed = cursor
+
+        while not disconnect.done() and not subscriber.closed:
+            getter = asyncio.ensure_future(
+                subscriber.get(timeout=HEARTBEAT_INTERVAL)
+            )
+            await asyncio.wait(
+                {getter, disconnect},
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            if not getter.done():
+                getter.cancel()
+                break
+            try:
+                frames = getter.result()
+            except SubscriberEvicted:
+                break
+            now = time.monotonic()
+            if now - touched >= HEARTBEAT_INTERVAL:
+                # The open stream keeps the user online.
+                await touch_presence(channel_id, user.id, user.username)
+                touched = now
+
+            body = []
+            for frame in frames:
+                if frame.event_id is not None and replayed is not None \
+                        and frame.event_id <= replayed:
+                    continue
+                body.append(frame.data)
+            await send({
+                'type': 'http.response.body',
+                'body': b''.join(body) if frames else b': heartbeat\n\n',
+                'more_body': True,
+            })
+
+        if not disconnect.done():
+            await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        disconnect.cancel()
+        subscriber.close()
+        await database_sync_to_async(presence.disconnect)(
+            channel_id,
+            user.id
+        )
@@ -0,0 +1,133 @@
+"""
+Tests for the fan-out hub.
+"""
+
+import asyncio
+
+from django.test import SimpleTestCase
+
+from realtime import fanout, pubsub
+
+
+def message_event(message_id):
+    return {
+        'type': 'message.created',
+        'channel': 1,
+        'message': {
+            'id': message_id,
+            'seq': message_id,
+            'text': f'Message {message_id}',
+        },
+    }
+
+
+class FanoutHubTests(SimpleTestCase):
+    """Test distributing events to subscribers."""
+
+    def run_async(self, coroutine_function):
+        async def main():
+            backend = pubsub.InMemoryPubSub()
+            hub = fanout.FanoutHub(backend)
+            return await coroutine_function(backend, hub)
+
+        return asyncio.run(main())
+
+    def test_event_encoded_once_for_all_subscribers(self):
+        """Test subscribers share the same encoded frame."""
+
+        async def scenario(backend, hub):
+            first = hub.subscribe(1)
+            second = hub.subscribe(1)
+            backend.publish(1, message_event(5))
+            await asyncio.sleep(0)
+            return await first.get(), await second.get(), backend
+
+        first, second, backend = self.run_async(scenario)
+
+        self.assertIs(first[0].data, second[0].data)
+        self.assertIn(b'id: 5\n', first[0].data)
+
+    def test_one_backend_subscription_per_channel(self):
+        """Test the hub subscribes to the backend once per channel."""
+
+        async def scenario(backend, hub):
+            subscribers = [hub.subscribe(1) for _ in range(3)]
+            channels = backend.channels()
+            for subscriber in subscribers:
+                subscriber.close()
+            return channels, backend.channels()
+
+        during, after = self.run_async(scenario)
+
+        self.assertEqual(during, [1])
+        self.assertEqual(after, [])
+
+    def test_burst_coalesced_into_one_batch(self):
+        """Test queued frames are taken in one batch."""
+
+        async def scenario(backend, hub):
+            subscriber = hub.subscribe(1)
+            for message_id in range(3):
+                hub.dispatch(1, message_event(message_id))
+            return await subscriber.get()
+
+        frames = self.run_async(scenario)
+
+        self.assertEqual([frame.event_id for frame in frames], [0, 1, 2])
+
+    def test_drop_oldest_policy(self):
+        """Test a full drop-oldest queue keeps the newest frames."""
+
+        async def scenario(backend, hub):
+            subscriber = hub.subscribe(1, maxsize=2, policy=fanout.DROP_OLDEST)
+            for message_id in range(4):
+                hub.dispatch(1, message_event(message_id))
+            return await subscriber.get(), hub.stats()
+
+        frames, stats = self.run_async(scenario)
+
+        self.assertEqual([frame.event_id for frame in frames], [2, 3])
+        self.assertEqual(stats['dropped'], 2)
+
+    def test_slow_subscriber_evicted_without_stalling_others(self):
+        """Test a full disconnect queue evicts only that subscriber."""
+
+        async def scenario(backend, hub):
+            slow = hub.subscribe(1, maxsize=2, policy=fanout.DISCONNECT)
+            fast = hub.subscribe(1, maxsize=10)
+            for message_id in range(3):
+                hub.dispatch(1, message_event(message_id))
+            with self.assertRaises(fanout.SubscriberEvicted):
+                await slow.get()
+            return await fast.get(), hub.stats()
+
+        frames, stats = self.run_async(scenario)
+
+        self.assertEqual(len(frames), 3)
+        self.assertEqual(stats['evicted'], 1)
+        self.assertEqual(stats['subscribers'], 1)
+
+    def test_get_times_out_empty(self):
+        """Test waiting without events returns an empty batch."""
+
+        async def scenario(backend, hub):
+            return await hub.subscribe(1).get(timeout=0.01)
+
+        self.assertEqual(self.run_async(scenario), [])
+
+    def test_stats_report_queue_depth(self):
+        """Test stats include current queue depths."""
+
+        async def scenario(backend, hub):
+            hub.subscribe(1)
+            busy = hub.subscribe(1)
+            hub.dispatch(1, message_event(1))
+            hub.dispatch(1, message_event(2))
+            busy.offer(fanout.Frame(message_event(3)))
+            return hub.stats()
+
+        stats = self.run_async(scenario)
+
+        self.assertEqual(stats['queue_depth_max'], 3)
+        self.assertEqual(stats['queue_depth_total'], 5)
+        self.assertEqual(stats['events'], 2)
@@ -0,0 +1,129 @@
+"""
+Tests for consistent-hash channel ownership.
+"""
+
+import random
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, override_settings
+
+from realtime import hashring, pubsub
+from realtime.hashring import HashRing
+
+
+CHANNELS = range(1, 2001)
+
+
+def node_event_volume(node, nodes, events):
+    """Run one gateway node and return how many events it received.
+
+    The node subscribes only to the channels it owns, as the streams of
+    every other channel are redirected to their owners."""
+
+    ring = HashRing(nodes)
+    backend = pubsub.InMemoryPubSub()
+    received = []
+    for channel_id in CHANNELS:
+        if ring.node_for(channel_id) == node:
+            backend.subscribe(channel_id, received.append)
+    for channel_id in events:
+        backend.publish(channel_id, {'type': 'message.created'})
+    return len(received)
+
+
+class HashRingTests(SimpleTestCase):
+    """Test assigning channels to nodes."""
+
+    def test_keys_spread_over_nodes(self):
+        """Test every node owns a fair share of the channels."""
+
+        ring = HashRing(['a', 'b', 'c', 'd'])
+
+        owners = Counter(ring.node_for(channel) for channel in CHANNELS)
+
+        self.assertEqual(set(owners), {'a', 'b', 'c', 'd'})
+        for count in owners.values():
+            self.assertGreater(count, len(CHANNELS) * 0.15)
+            self.assertLess(count, len(CHANNELS) * 0.35)
+
+    def test_adding_node_moves_about_one_nth(self):
+        """Test a joining node only takes channels over from others."""
+
+        ring = HashRing(['a', 'b', 'c', 'd'])
+        before = {channel: ring.node_for(channel) for channel in CHANNELS}
+
+        ring.add('e')
+        moved = [
+            channel for channel in CHANNELS
+            if ring.node_for(channel) != before[channel]
+        ]
+
+        self.assertGreater(len(moved), len(CHANNELS) * 0.1)
+        self.assertLess(len(moved), len(CHANNELS) * 0.3)
+        self.assertTrue(all(ring.node_for(c) == 'e' for c in moved))
+
+    def test_removing_node_moves_only_its_channels(self):
+        """Test a leaving node's channels are the only ones moving."""
+
+        ring = HashRing(['a', 'b', 'c'])
+        before = {channel: ring.node_for(channel) for channel in CHANNELS}
+
+        ring.remove('b')
+
+        for channel in CHANNELS:
+            if before[channel] != 'b':
+                self.assertEqual(ring.node_for(channel), before[channel])
+            else:
+                self.assertIn(ring.node_for(channel), {'a', 'c'})
+
+    def test_empty_ring_has_no_owner(self):
+        """Test no node owns anything on an empty ring."""
+
+        self.assertIsNone(HashRing().node_for(1))
+
+    def test_event_volume_per_node_drops_as_nodes_added(self):
+        """Test separate node processes each receive fewer events."""
+
+        rand = random.Random(1)
+        events = [rand.choice(CHANNELS) for _ in range(5000)]
+        busiest = []
+
+        with ProcessPoolExecutor(max_workers=4) as executor:
+            for count in (1, 2, 4):
+                nodes = [f'node-{i}' for i in range(count)]
+                volumes = list(executor.map(
+                    node_event_volume,
+                    nodes,
+                    [nodes] * count,
+                    [events] * count
+                ))
+                self.assertEqual(sum(volumes), len(events))
+                busiest.append(max(volumes))
+
+        self.assertEqual(busiest[0], len(events))
+        self.assertLess(busiest[1], len(events) * 0.65)
+        self.assertLess(busiest[2], len(events) * 0.4)
+
+
+@override_settings(
+    REALTIME_NODE_ID='a',
+    REALTIME_NODES={'a': 'http://a:8000', 'b': 'http://b:8000/'}
+)
+class RedirectLocationTests(SimpleTestCase):
+    """Test redirecting requests to the owning node."""
+
+    def test_remote_channel_redirected_to_owner(self):
+        """Test channels owned elsewhere get the owner's URL."""
+
+        with patch.object(hashring, '_ring', None):
+            ring = hashring.get_ring()
+            local = next(c for c in CHANNELS if ring.node_for(c) == 'a')
+            remote = next(c for c in CHANNELS if ring.node_for(c) == 'b')
+
+            self.assertIsNone(hashring.redirect_location(local, '/x/'))
+            self.assertEqual(
+                hashring.redirect_location(remote, '/x/', 'wait=5'),
+                'http://b:8000/x/?wait=5'
+            )
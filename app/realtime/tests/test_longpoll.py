@@ -0,0 +1,169 @@
+"""
+Tests for the long-poll messages endpoint.
+"""
+
+import asyncio
+import json
+import time
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.test import TransactionTestCase
+
+from rest_framework.authtoken.models import Token
+
+from core.models import Channel, Message
+from realtime import longpoll, pubsub
+from realtime.routing import RealtimeRouter
+
+
+async def fallback_app(scope, receive, send):
+    await send({'type': 'http.response.start', 'status': 299})
+
+
+class LongPollTests(TransactionTestCase):
+    """Test waiting for new messages."""
+
+    databases = '__all__'
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(
+            username='User',
+            email='email@example.com',
+            password='pass123'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.channel = Channel.objects.create(
+            creator=self.user,
+            name='Channel'
+        )
+        self.backend = pubsub.InMemoryPubSub()
+
+    def request(self, query, on_park=None):
+        """Run a messages request and return status and data."""
+
+        messages = []
+        # Servers send the request body first, and only later a
+        # disconnect.
+        received = [{'type': 'http.request', 'body': b''}]
+
+        async def main():
+            async def receive():
+                if received:
+                    return received.pop()
+                await asyncio.sleep(60)
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                messages.append(message)
+
+            scope = {
+                'type': 'http',
+                'method': 'GET',
+                'path': f'/api/channel/channels/{self.channel.id}/messages/',
+                'query_string': query.encode(),
+                'headers': [
+                    (b'authorization', f'Token {self.token.key}'.encode())
+                ],
+            }
+            router = RealtimeRouter(fallback_app)
+            task = asyncio.ensure_future(router(scope, receive, send))
+            if on_park is not None:
+                while not self.backend.channels():
+                    await asyncio.sleep(0.01)
+                on_park()
+            await asyncio.wait_for(task, timeout=5)
+
+        with patch('realtime.fanout.get_pubsub', return_value=self.backend):
+            async_to_sync(main)()
+
+        status = messages[0]['status']
+        data = json.loads(messages[1]['body']) if len(messages) > 1 else None
+        return status, data
+
+    def test_without_wait_goes_to_django(self):
+        """Test requests without wait are served by the DRF view."""
+
+        status, _ = self.request('after_seq=0')
+
+        self.assertEqual(status, 299)
+
+    def test_existing_messages_returned_immediately(self):
+        """Test newer messages are returned without waiting."""
+
+        old = Message.objects.create(
+            sender=self.user,
+            channel=self.channel,
+            text='Old'
+        )
+        new = Message.objects.create(
+            sender=self.user,
+            channel=self.channel,
+            text='New'
+        )
+
+        start = time.monotonic()
+        status, data = self.request(f'after_seq={old.seq}&wait=25')
+
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertEqual(status, 200)
+        self.assertEqual([m['id'] for m in data], [str(new.id)])
+
+    def test_parked_request_woken_by_new_message(self):
+        """Test a parked request returns the message that woke it."""
+
+        def publish():
+            self.backend.publish(self.channel.id, {
+                'type': 'message.created',
+                'channel': self.channel.id,
+                'message': {'id': 99, 'seq': 1, 'text': 'Hello'},
+            })
+
+        status, data = self.request('after_seq=0&wait=25', on_park=publish)
+
+        self.assertEqual(status, 200)
+        self.assertEqual(data, [{'id': 99, 'seq': 1, 'text': 'Hello'}])
+        self.assertEqual(self.backend.channels(), [])
+
+    def test_late_commit_with_lower_id_returned(self):
+        """Test a message with a lower id than the last one seen is
+        returned when it comes later in the channel's sequence."""
+
+        seen = Message.objects.create(
+            sender=self.user,
+            channel=self.channel,
+            text='Seen'
+        )
+
+        def publish():
+            self.backend.publish(self.channel.id, {
+                'type': 'message.created',
+                'channel': self.channel.id,
+                'message': {'id': 1, 'seq': seen.seq + 1, 'text': 'Late'},
+            })
+
+        status, data = self.request(
+            f'after_seq={seen.seq}&wait=25',
+            on_park=publish
+        )
+
+        self.assertEqual(status, 200)
+        self.assertEqual([m['text'] for m in data], ['Late'])
+
+    def test_timeout_returns_empty_list(self):
+        """Test nothing new before the timeout returns an empty list,
+        and the request body message is not taken for a disconnect."""
+
+        with patch.object(longpoll, 'MAX_WAIT', 0.1):
+            status, data = self.request('after_seq=0&wait=25')
+
+        self.assertEqual(status, 200)
+        self.assertEqual(data, [])
+
+    def test_invalid_parameters_error(self):
+        """Test invalid after or wait values return an error."""
+
+        status, _ = self.request('after_seq=abc&wait=5')
+
+        self.assertEqual(status, 400)
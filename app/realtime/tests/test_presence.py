@@ -0,0 +1,155 @@
+"""
+Tests for the presence registry.
+"""
+
+from django.test import SimpleTestCase
+
+from realtime.presence import PresenceRegistry
+
+
+class FakeClock:
+    """Clock that only moves when told to."""
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeTimer:
+
+    def __init__(self, delay, function):
+        self.delay = delay
+        self.function = function
+        self.done = False
+
+    def cancel(self):
+        self.done = True
+
+    def fire(self):
+        self.done = True
+        self.function()
+
+
+class FakeScheduler:
+    """Records timers instead of starting them."""
+
+    def __init__(self):
+        self.timers = []
+
+    def __call__(self, delay, function):
+        timer = FakeTimer(delay, function)
+        self.timers.append(timer)
+        return timer
+
+    @property
+    def pending(self):
+        return [timer for timer in self.timers if not timer.done]
+
+
+class PresenceRegistryTests(SimpleTestCase):
+    """Test tracking presence in memory."""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.events = []
+        self.scheduler = FakeScheduler()
+        self.registry = PresenceRegistry(
+            clock=self.clock,
+            on_change=lambda channel_id, event: self.events.append(event),
+            schedule=self.scheduler
+        )
+
+    def test_touch_marks_user_online_once(self):
+        """Test touching announces a user only when they come online."""
+
+        self.registry.touch(1, 10, 'user', ttl=30)
+        self.registry.touch(1, 10, 'user', ttl=30)
+
+        self.assertEqual(self.registry.online(1), [
+            {'id': 10, 'username': 'user'}
+        ])
+        self.assertEqual(self.events, [
+            {'type': 'presence.online', 'channel': 1, 'user': 10}
+        ])
+
+    def test_entries_expire_after_ttl(self):
+        """Test users go offline when their TTL runs out."""
+
+        self.registry.touch(1, 10, 'user', ttl=30)
+        self.registry.start_typing(1, 10, 'user', ttl=5)
+
+        self.clock.now = 6
+        self.assertEqual(self.registry.typing(1), [])
+        self.assertEqual(len(self.registry.online(1)), 1)
+
+        self.clock.now = 31
+        self.assertEqual(self.registry.online(1), [])
+        self.assertEqual(
+            [event['type'] for event in self.events],
+            ['presence.online', 'typing.started',
+             'typing.stopped', 'presence.offline']
+        )
+
+    def test_renewed_entry_survives_old_deadline(self):
+        """Test touching again pushes the expiry back."""
+
+        self.registry.touch(1, 10, 'user', ttl=30)
+        self.clock.now = 20
+        self.registry.touch(1, 10, 'user', ttl=30)
+
+        self.clock.now = 40
+        self.registry.expire()
+
+        self.assertEqual(len(self.registry.online(1)), 1)
+
+    def test_leave_removes_user_from_channel_only(self):
+        """Test leaving a channel keeps presence in other channels."""
+
+        self.registry.touch(1, 10, 'user')
+        self.registry.touch(2, 10, 'user')
+
+        self.registry.leave(1, 10)
+
+        self.assertEqual(self.registry.online(1), [])
+        self.assertEqual(len(self.registry.online(2)), 1)
+
+    def test_timer_expires_entries_without_other_calls(self):
+        """Test the timer armed for the earliest deadline emits the
+        stop events on its own."""
+
+        self.registry.touch(1, 10, 'user', ttl=30)
+        self.registry.start_typing(1, 10, 'user', ttl=5)
+
+        timer, = self.scheduler.pending
+        self.assertEqual(timer.delay, 5)
+
+        self.clock.now = 5
+        timer.fire()
+
+        self.assertEqual(self.events[-1]['type'], 'typing.stopped')
+        timer, = self.scheduler.pending
+        self.assertEqual(timer.delay, 25)
+
+        self.clock.now = 30
+        timer.fire()
+
+        self.assertEqual(self.events[-1]['type'], 'presence.offline')
+        self.assertEqual(self.scheduler.pending, [])
+
+    def test_user_stays_online_until_last_connection_closes(self):
+        """Test closing one of two connections keeps the user online."""
+
+        self.registry.connect(1, 10, 'user')
+        self.registry.connect(1, 10, 'user')
+
+        self.registry.disconnect(1, 10)
+        self.assertEqual(len(self.registry.online(1)), 1)
+
+        self.registry.disconnect(1, 10)
+        self.assertEqual(self.registry.online(1), [])
+        self.assertEqual(
+            [event['type'] for event in self.events],
+            ['presence.online', 'presence.offline']
+        )
@@ -0,0 +1,189 @@
+"""
+Tests for the pub/sub backends.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import Channel
+from core.sharding import shard_for_channel
+from realtime import pubsub
+
+
+class InMemoryPubSubTests(SimpleTestCase):
+    """Test the in-process backend."""
+
+    def setUp(self):
+        self.backend = pubsub.InMemoryPubSub()
+
+    def test_publish_reaches_channel_subscribers(self):
+        """Test events only reach subscribers of their channel."""
+
+        received = []
+        other = []
+        self.backend.subscribe(1, received.append)
+        self.backend.subscribe(2, other.append)
+
+        self.backend.publish(1, {'type': 'test'})
+
+        self.assertEqual(received, [{'type': 'test'}])
+        self.assertEqual(other, [])
+
+    def test_closed_subscription_receives_nothing(self):
+        """Test closing a subscription stops delivery."""
+
+        received = []
+        subscription = self.backend.subscribe(1, received.append)
+
+        subscription.close()
+        self.backend.publish(1, {'type': 'test'})
+
+        self.assertEqual(received, [])
+        self.assertEqual(self.backend.channels(), [])
+
+    def test_failing_subscriber_does_not_stop_others(self):
+        """Test one failing callback does not block delivery."""
+
+        def failing(event):
+            raise RuntimeError('broken')
+
+        received = []
+        self.backend.subscribe(1, failing)
+        self.backend.subscribe(1, received.append)
+
+        with self.assertLogs('realtime.pubsub', level='ERROR'):
+            self.backend.publish(1, {'type': 'test'})
+
+        self.assertEqual(received, [{'type': 'test'}])
+
+    def test_async_subscriber_gets_events_from_other_threads(self):
+        """Test events published on a thread reach the subscriber's loop."""
+
+        async def consume():
+            queue = asyncio.Queue()
+            self.backend.subscribe(1, queue.put_nowait)
+            publisher = threading.Thread(
+                target=self.backend.publish,
+                args=(1, {'type': 'test'})
+            )
+            publisher.start()
+            event = await asyncio.wait_for(queue.get(), timeout=2)
+            publisher.join()
+            return event
+
+        self.assertEqual(asyncio.run(consume()), {'type': 'test'})
+
+
+class PostgresPubSubEncodeTests(SimpleTestCase):
+    """Test notification payloads."""
+
+    def test_small_event_sent_whole(self):
+        """Test events fitting in a notification are sent as they are."""
+
+        event = {'type': 'message.created', 'message': {'id': 1}}
+
+        payload = pubsub.PostgresPubSub.encode(1, event)
+
+        self.assertEqual(json.loads(payload), event)
+
+    def test_large_event_sent_as_reference(self):
+        """Test oversized events are replaced by a reference."""
+
+        event = {
+            'type': 'message.created',
+            'message': {'id': 7, 'text': 'x' * 10000},
+        }
+
+        payload = pubsub.PostgresPubSub.encode(3, event)
+
+        self.assertLessEqual(
+            len(payload.encode()),
+            pubsub.PostgresPubSub.MAX_PAYLOAD
+        )
+        self.assertEqual(json.loads(payload), {
+            'type': 'message.created',
+            'channel': 3,
+            'id': 7,
+            'truncated': True,
+        })
+
+    def test_reference_fetched_on_receive(self):
+        """Test a truncated notification is completed by fetching."""
+
+        fetched = {'type': 'message.created', 'message': {'id': 7}}
+        backend = pubsub.PostgresPubSub(fetch=lambda event: fetched)
+        received = []
+        with patch.object(backend, 'channel_added'):
+            backend.subscribe(3, received.append)
+
+        backend._handle(
+            'chat_channel_3',
+            json.dumps({'type': 'message.created', 'channel': 3,
+                        'id': 7, 'truncated': True})
+        )
+
+        self.assertEqual(received, [fetched])
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Requires Postgres.')
+class PostgresPubSubTests(TransactionTestCase):
+    """Test delivery through LISTEN/NOTIFY."""
+
+    def test_notify_reaches_listener(self):
+        """Test a published event reaches a subscriber."""
+
+        backend = pubsub.PostgresPubSub()
+        received = []
+        backend.subscribe(5, received.append)
+
+        deadline = time.monotonic() + 5
+        while not received and time.monotonic() < deadline:
+            backend.publish(5, {'type': 'test'})
+            time.sleep(0.2)
+
+        self.assertIn({'type': 'test'}, received)
+
+
+class PublishMessageTests(TestCase):
+    """Test new messages are published."""
+
+    databases = '__all__'
+
+    def test_post_message_publishes_on_channel(self):
+        """Test posting a message publishes it after commit."""
+
+        user = get_user_model().objects.create(
+            username='User',
+            email='email@example.com',
+            password='pass123'
+        )
+        channel = Channel.objects.create(creator=user, name='Channel')
+        client = APIClient()
+        client.force_authenticate(user)
+        received = []
+        backend = pubsub.InMemoryPubSub()
+        backend.subscribe(channel.id, received.append)
+
+        shard = shard_for_channel(channel.id)
+        with patch('realtime.pubsub.get_pubsub', return_value=backend):
+            with self.captureOnCommitCallbacks(using=shard, execute=True):
+                client.post(
+                    reverse('channel:channel-messages', args=[channel.id]),
+                    {'text': 'Hello'},
+                    format='json'
+                )
+
+        self.assertEqual(len(received), 1)
+        self.assertEqual(received[0]['type'], 'message.created')
+        self.assertEqual(received[0]['message']['text'], 'Hello')
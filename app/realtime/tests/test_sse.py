@@ -0,0 +1,224 @@
+"""
+Tests for the channel event stream.
+"""
+
+import asyncio
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.test import TransactionTestCase
+
+from rest_framework.authtoken.models import Token
+
+from core.models import Channel, Message
+from realtime import pubsub
+from realtime.routing import RealtimeRouter
+
+
+async def fallback_app(scope, receive, send):
+    raise AssertionError('Request should not reach Django.')
+
+
+def stream_scope(channel_id, token=None, headers=()):
+    headers = list(headers)
+    if token is not None:
+        headers.append((b'authorization', f'Token {token}'.encode()))
+    return {
+        'type': 'http',
+        'method': 'GET',
+        'path': f'/api/channel/channels/{channel_id}/stream/',
+        'query_string': b'',
+        'headers': headers,
+    }
+
+
+class StreamClient:
+    """Runs a stream request until `stop_when` matches the body."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.messages = []
+
+    @property
+    def status(self):
+        return self.messages[0]['status']
+
+    @property
+    def body(self):
+        return b''.join(
+            m.get('body', b'') for m in self.messages[1:]
+        ).decode()
+
+    def run(self, scope, stop_when=None, on_start=None):
+        async def main():
+            disconnected = asyncio.Event()
+
+            async def receive():
+                await disconnected.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                self.messages.append(message)
+                if message['type'] == 'http.response.start' and on_start:
+                    asyncio.get_running_loop().call_soon(on_start)
+                if stop_when is None or stop_when in self.body:
+                    disconnected.set()
+
+            backend = self.backend
+            with patch('realtime.fanout.get_pubsub', return_value=backend):
+                await asyncio.wait_for(
+                    RealtimeRouter(fallback_app)(scope, receive, send),
+                    timeout=5
+                )
+
+        async_to_sync(main)()
+        return self
+
+
+class ChannelStreamTests(TransactionTestCase):
+    """Test streaming channel events."""
+
+    databases = '__all__'
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(
+            username='User',
+            email='email@example.com',
+            password='pass123'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.channel = Channel.objects.create(
+            creator=self.user,
+            name='Channel'
+        )
+        self.backend = pubsub.InMemoryPubSub()
+
+    def test_auth_required(self):
+        """Test a stream without a token is rejected."""
+
+        client = StreamClient(self.backend).run(stream_scope(self.channel.id))
+
+        self.assertEqual(client.status, 401)
+
+    def test_non_member_forbidden(self):
+        """Test only members can open a channel's stream."""
+
+        other = get_user_model().objects.create(
+            username='Other',
+            email='other@example.com',
+            password='pass123'
+        )
+        channel = Channel.objects.create(creator=other, name='Other')
+
+        client = StreamClient(self.backend).run(
+            stream_scope(channel.id, self.token.key)
+        )
+
+        self.assertEqual(client.status, 403)
+
+    def test_live_event_streamed(self):
+        """Test published messages are sent as events."""
+
+        def publish():
+            self.backend.publish(self.channel.id, {
+                'type': 'message.created',
+                'channel': self.channel.id,
+                'message': {'id': 42, 'seq': 3, 'text': 'Live'},
+            })
+
+        client = StreamClient(self.backend).run(
+            stream_scope(self.channel.id, self.token.key),
+            stop_when='Live',
+            on_start=publish
+        )
+
+        self.assertEqual(client.status, 200)
+        self.assertIn('id: 3\nevent: message.created\n', client.body)
+        self.assertEqual(self.backend.channels(), [])
+
+    def test_live_events_out_of_order_streamed(self):
+        """Test a live event published after one with a higher sequence
+        number is still sent."""
+
+        def publish():
+            for seq, text in [(5, 'Fifth'), (4, 'Fourth')]:
+                self.backend.publish(self.channel.id, {
+                    'type': 'message.created',
+                    'channel': self.channel.id,
+                    'message': {'id': seq, 'seq': seq, 'text': text},
+                })
+
+        client = StreamClient(self.backend).run(
+            stream_scope(self.channel.id, self.token.key),
+            stop_when='Fourth',
+            on_start=publish
+        )
+
+        self.assertIn('id: 5\n', client.body)
+        self.assertIn('id: 4\n', client.body)
+
+    def test_last_event_id_replays_missed_messages(self):
+        """Test a reconnecting client gets the messages it missed."""
+
+        seen = Message.objects.create(
+            sender=self.user,
+            channel=self.channel,
+            text='Seen'
+        )
+        missed = Message.objects.create(
+            sender=self.user,
+            channel=self.channel,
+            text='Missed'
+        )
+
+        client = StreamClient(self.backend).run(
+            stream_scope(
+                self.channel.id,
+                self.token.key,
+                headers=[(b'last-event-id', str(seen.seq).encode())]
+            ),
+            stop_when='Missed'
+        )
+
+        self.assertIn(f'id: {missed.seq}\n', client.body)
+        self.assertNotIn('"Seen"', client.body)
+
+    def test_late_commit_with_lower_id_streamed(self):
+        """Test a message committing after a replayed one with a higher
+        id is still sent, as it comes later in the channel's sequence."""
+
+        seen = Message.objects.create(
+            sender=self.user,
+            channel=self.channel,
+            text='Seen'
+        )
+        replayed = Message.objects.create(
+            sender=self.user,
+            channel=self.channel,
+            text='Replayed'
+        )
+
+        def publish():
+            self.backend.publish(self.channel.id, {
+                'type': 'message.created',
+                'channel': self.channel.id,
+                'message': {
+                    'id': str(replayed.id - 1),
+                    'seq': replayed.seq + 1,
+                    'text': 'Late',
+                },
+            })
+
+        client = StreamClient(self.backend).run(
+            stream_scope(
+                self.channel.id,
+                self.token.key,
+                headers=[(b'last-event-id', str(seen.seq).encode())]
+            ),
+            stop_when='Late',
+            on_start=publish
+        )
+
+        self.assertIn('"Replayed"', client.body)
+        self.assertIn(f'id: {replayed.seq + 1}\n', client.body)
@@ -0,0 +1,14 @@
+"""
+URL mappings for the realtime app.
+"""
+
+from django.urls import path
+
+from realtime import views
+
+
+app_name = 'realtime'
+
+urlpatterns = [
+    path('metrics/', views.FanoutMetricsView.as_view(), name='metrics'),
+]
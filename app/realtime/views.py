@@ -0,0 +1,20 @@
+"""
+Views for the real-time API.
+"""
+
+from rest_framework import views
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+from realtime.fanout import get_stats
+
+
+class FanoutMetricsView(views.APIView):
+    """Report fan-out queue depths and eviction counts of this process."""
+
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(get_stats())
@@ -37,6 +37,15 @@ class UserSerializer(serializers.ModelSerializer):
         return user
 
 
+class UserSearchSerializer(serializers.ModelSerializer):
+    """Serializer for users found by prefix."""
+
+    class Meta:
+        model = get_user_model()
+        fields = ['id', 'username', 'name']
+        read_only_fields = fields
+
+
 class AuthTokenSerializer(serializers.Serializer):
     """Serializer for the user auth token."""
 
@@ -11,6 +11,7 @@ from rest_framework import status
 CREATE_USER_URL = reverse('user:create')
 TOKEN_URL = reverse('user:token')
 ME_URL = reverse('user:me')
+SEARCH_URL = reverse('user:search')
 
 
 def create_user(**params):
@@ -181,3 +182,42 @@ class PrivateUserAPITests(TestCase):
         self.assertEqual(self.user.name, payload['name'])
         self.assertTrue(self.user.check_password(payload['password']))
         self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_search_users_by_prefix(self):
+        """Test usernames match first, then names, each ordered by the
+        matched field ignoring case."""
+
+        for username, name in [
+            ('larisa', 'Larisa'),
+            ('Lara', ''),
+            ('pal', 'Larry'),
+            ('aaron', 'Lars'),
+            ('other', 'Other'),
+        ]:
+            create_user(
+                username=username,
+                email=f'{username}@example.com',
+                name=name
+            )
+        create_user(
+            username='larch',
+            email='larch@example.com',
+            is_active=False
+        )
+
+        res = self.client.get(SEARCH_URL, {'prefix': 'LAR'})
+        limited = self.client.get(SEARCH_URL, {'prefix': 'lar', 'limit': 1})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [user['username'] for user in res.data],
+            ['Lara', 'larisa', 'pal', 'aaron']
+        )
+        self.assertEqual(len(limited.data), 1)
+
+    def test_search_users_requires_prefix(self):
+        """Test searching without a prefix returns an error."""
+
+        res = self.client.get(SEARCH_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -2,21 +2,43 @@
 Views for the user API.
 """
 
+from django.contrib.auth import get_user_model
+from django.db import connections, router
+from django.db.models.functions import Collate, Upper
+
 from rest_framework import (
     generics,
     authentication,
     permissions,
+    status,
 )
 
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
 
 from user.serializers import (
     UserSerializer,
     AuthTokenSerializer,
+    UserSearchSerializer,
 )
 
 
+SEARCH_LIMIT = 10
+MAX_SEARCH_LIMIT = 25
+
+
+def prefix_key(connection, field):
+    """Return the upper-cased field, in the "C" collation on PostgreSQL
+    like its prefix index, so the index serves both the prefix match
+    and the ordering."""
+
+    key = Upper(field)
+    if connection.vendor == 'postgresql':
+        key = Collate(key, 'C')
+    return key
+
+
 class CreateUserView(generics.CreateAPIView):
     """Create new user in the system."""
 
@@ -41,3 +63,55 @@ class ManageUserView(generics.RetrieveUpdateAPIView):
         """Retrieve and return the authenticaated user."""
 
         return self.request.user
+
+
+class SearchUserView(generics.ListAPIView):
+    """Autocomplete usernames for invites and mentions."""
+
+    serializer_class = UserSearchSerializer
+    authentication_classes = [authentication.TokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def list(self, request):
+        """List active users whose username or name starts with
+        `prefix`, ignoring case.
+
+        Usernames starting with the prefix come first, ordered by
+        username, then names starting with it, ordered by name, each
+        ignoring case, so an exact username is always the first result.
+        Both lookups read an index on the upper-cased column and stop
+        after `limit` rows."""
+
+        prefix = request.query_params.get('prefix', '').strip()
+        if not prefix:
+            return Response(
+                {'detail': 'prefix is required.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        limit = request.query_params.get('limit', '')
+        limit = int(limit) if limit.isdigit() else SEARCH_LIMIT
+        limit = max(min(limit, MAX_SEARCH_LIMIT), 1)
+
+        User = get_user_model()
+        connection = connections[router.db_for_read(User) or 'default']
+        users = User.objects.filter(is_active=True).only(
+            'id',
+            'username',
+            'name'
+        ).alias(
+            username_key=prefix_key(connection, 'username'),
+            name_key=prefix_key(connection, 'name')
+        )
+        by_username = list(users.filter(
+            username_key__startswith=prefix.upper()
+        ).order_by('username_key')[:limit])
+        by_name = []
+        if len(by_username) < limit:
+            by_name = list(users.filter(
+                name_key__startswith=prefix.upper()
+            ).exclude(
+                username_key__startswith=prefix.upper()
+            ).order_by('name_key')[:limit - len(by_username)])
+
+        serializer = self.get_serializer(by_username + by_name, many=True)
+        return Response(serializer.data)